@@ -1,18 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import AsyncGenerator
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
 from app.api.deps import get_current_user
-from app.schemas.chat import ChatRequest
-from app.services.chat import generate_chat_response
+from app.core.admission import AdmissionTicket, chat_admission
+from app.core.config import settings
+from app.core.sse import format_retry
+from app.schemas.chat import ChatMessage, ChatRequest
+from app.services.chat import generate_chat_response, generate_chat_text
+from app.services.chat_streams import chat_streams
+from app.services.sessions import session_store
 
 router = APIRouter()
 
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Holds an admission slot for exactly as long as the response is being sent, including when the
+    client is gone before the body is first iterated.
+    """
+
+    def __init__(self, content: AsyncGenerator[str, None], ticket: AdmissionTicket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with self.ticket:
+            await super().__call__(scope, receive, send)
+
+async def stream_until_disconnect(request: Request, chunks: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """
+    Relays chunks to the client and closes the upstream generator as soon as the client goes away,
+    which cancels the in-flight LLM generation.
+    """
+    try:
+        async for chunk in chunks:
+            if await request.is_disconnected():
+                break
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+# Stops proxies such as nginx from buffering the stream
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def event_stream(events: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Prefixes a chat event stream with the client's reconnect delay."""
+    yield format_retry(settings.SSE_RETRY_MILLISECONDS)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await events.aclose()
+
 @router.post("/")
-async def chat_endpoint(request: ChatRequest, current_user: str = Depends(get_current_user)):
+async def chat_endpoint(request: ChatRequest, http_request: Request, current_user: str = Depends(get_current_user)):
     """
     Handles chat messages and streams responses from the LLM.
+    Send `message` (plus `session_id` to continue a conversation); the session ID is returned
+    in the `X-Session-Id` header. Sending the full `messages` history is still supported.
+
+    With `Accept: text/event-stream` the reply is sent as server-sent events, each with an id.
+    Content arrives as `{"content": ...}` events, then a `done` or `error` event, with keepalive comments while idle.
+    Repeating the request with a `Last-Event-ID` header resumes a recent stream after that event
+    instead of generating the reply again. Streams are buffered by the worker that generated them,
+    so resumes need sticky routing; a stream that is unknown here, expired, or another user's
+    gets 410, and the client decides whether to send the message again without the header.
     """
+    wants_event_stream = "text/event-stream" in http_request.headers.get("accept", "")
+    last_event_id = http_request.headers.get("last-event-id")
+    if wants_event_stream and last_event_id:
+        resumed = chat_streams.resume(last_event_id, current_user)
+        if resumed is None:
+            # Generating again here would answer (and, with sessions, record) the same message twice
+            raise HTTPException(status_code=410, detail="Chat stream can no longer be resumed")
+        return StreamingResponse(event_stream(resumed), media_type="text/event-stream", headers=EVENT_STREAM_HEADERS)
+
+    # Fails fast with 429/503 and Retry-After when the user or the server is over its limits
+    ticket = await chat_admission.admit(current_user)
     try:
+        headers = {}
+        session = None
+        if request.message is not None:
+            session = await session_store.get_or_create(request.session_id, current_user)
+            messages = [*session_store.history(session), ChatMessage(role='user', content=request.message)]
+            headers["X-Session-Id"] = session.id
+        else:
+            messages = request.messages
+
+        if wants_event_stream:
+            # Generation runs in the background into a replay buffer; the ticket is released when it ends
+            stream = chat_streams.start(
+                current_user,
+                generate_chat_text(messages=messages, current_user=current_user, session=session),
+                ticket
+            )
+            return StreamingResponse(
+                event_stream(chat_streams.follow(stream)),
+                media_type="text/event-stream",
+                headers={**EVENT_STREAM_HEADERS, **headers}
+            )
+
         # `generate_chat_response` yields text chunks
-        return StreamingResponse(generate_chat_response(messages=request.messages, current_user=current_user), media_type="text/plain")
+        chunks = generate_chat_response(messages=messages, current_user=current_user, session=session)
+        return AdmittedStreamingResponse(
+            stream_until_disconnect(http_request, chunks), ticket, media_type="text/plain", headers=headers
+        )
+    except HTTPException as e:
+        ticket.release()
+        raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat API error: {e}")
\ No newline at end of file
+        ticket.release()
+        raise HTTPException(status_code=500, detail=f"Chat API error: {e}")
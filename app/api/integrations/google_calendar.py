@@ -1,15 +1,27 @@
-import jwt
-from datetime import datetime
-from google_auth_oauthlib.flow import Flow
+import logging
+from typing import Optional
+from datetime import datetime, timezone
 from fastapi.responses import RedirectResponse
-from google.oauth2.credentials import Credentials
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
 
 from app.core.config import settings
 from app.api.deps import get_current_user
 from app.db.supabase_client import supabase
-from app.schemas.integrations.google_calendar import GoogleCalendarAuthUrlResponse
-from app.services.integrations.google_calendar import get_google_calendar_events, get_google_flow, get_google_credentials
+from app.schemas.integrations.google_calendar import GoogleCalendarAuthUrlResponse, GoogleCalendarUnlinkResponse
+from app.services.digests import schedule_digests
+from app.services.integrations.core import invalidate_integration_status
+from app.services.integrations.google_calendar_client import google_calendar_client
+from app.services.integrations.google_calendar_store import calendar_event_store
+from app.services.integrations.google_calendar_watch import google_calendar_watcher
+from app.services.integrations.google_token_refresher import google_token_refresher
+from app.services.integrations.google_calendar import (
+    get_google_calendar_events,
+    get_google_flow,
+    get_google_credentials,
+    invalidate_google_credentials,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -28,8 +40,8 @@ async def get_google_calendar_auth_url(current_user: str = Depends(get_current_u
         )
 
         return GoogleCalendarAuthUrlResponse(auth_url=auth_url)
-    except Exception as e:
-        print("Error generating auth URL:", str(e))
+    except Exception:
+        logger.exception("Error generating auth URL", extra={"user_id": current_user})
         raise HTTPException(
             status_code=500,
             detail="Failed to generate Google Calendar auth URL"
@@ -71,13 +83,15 @@ async def google_calendar_callback(
         if credentials.id_token:
             # Decode the ID token to get user info (email)
             # The ID token is a JWT, its payload contains user claims
+            import jwt
+
             try:
                 id_token_info = jwt.decode(
                     credentials.id_token, options={"verify_signature": False}
                 )
                 linked_google_email = id_token_info.get("email")
             except Exception as e:
-                print(f"Error decoding ID token: {e}")
+                logger.warning("Error decoding ID token", extra={"error": str(e)})
                 # Log error but don't fail the entire process
 
         # Update user's metadata in Supabase using the admin client
@@ -90,18 +104,29 @@ async def google_calendar_callback(
             updated_metadata["google_calendar_linked_email"] = linked_google_email
 
         try:
-            supabase.admin_client.auth.admin.update_user_by_id(
+            await supabase.update_user_by_id(
                 user_id,
                 {
                     "user_metadata": updated_metadata
                 }
             )
-        except Exception as e:
-            print("Error updating user metadata:", str(e))
+        except Exception:
+            logger.exception("Error updating user metadata")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to update user metadata with Google Calendar tokens"
             )
+        finally:
+            # Drop cached metadata/credentials so the next request sees the new tokens
+            invalidate_google_credentials(user_id)
+            # The account may have changed, so start the local event copy over
+            calendar_event_store.evict(user_id)
+            invalidate_integration_status(user_id)
+
+        google_token_refresher.track(user_id, updated_metadata)
+        # Replaces any channels of a previously linked account
+        google_calendar_watcher.watch_in_background(user_id, credentials)
+        schedule_digests.invalidate(user_id)
 
         # Redirect back to frontend with success
         return RedirectResponse(
@@ -109,26 +134,106 @@ async def google_calendar_callback(
         )
 
     except Exception as e:
-        print("Error in callback:", str(e))
+        logger.exception("Error in Google Calendar callback")
         return RedirectResponse(
             url=f"{settings.FRONTEND_URL}/integrations/link-google-calendar?status=error&message={str(e)}"
         )
 
+@router.post("/unlink", response_model=GoogleCalendarUnlinkResponse)
+async def unlink_google_calendar(current_user: str = Depends(get_current_user)):
+    """
+    Disconnects the user's Google Calendar: stops push notification channels while the tokens
+    still work, revokes the grant at Google, then removes the stored tokens and every cached copy
+    of the user's calendar data. The worker running the token refresher drops the user on its own
+    when it finds the stored tokens gone.
+    """
+    try:
+        credentials = await get_google_credentials(current_user)
+    except HTTPException:
+        credentials = None
+    await google_calendar_watcher.unwatch_user(current_user, credentials)
+    if credentials is not None:
+        try:
+            # Also ends any refresh still in flight elsewhere: Google rejects the token from now on
+            await google_calendar_client.revoke_token(credentials.refresh_token or credentials.token)
+        except Exception as e:
+            logger.warning("Error revoking Google token", extra={"user_id": current_user, "error": str(e)})
+
+    try:
+        await supabase.update_user_by_id(
+            current_user,
+            {
+                "user_metadata": {
+                    "google_access_token": None,
+                    "google_token_expiry": None,
+                    "google_refresh_token": None,
+                    "google_calendar_linked_email": None,
+                }
+            }
+        )
+    except Exception:
+        logger.exception("Error removing Google Calendar tokens", extra={"user_id": current_user})
+        raise HTTPException(status_code=500, detail="Failed to unlink Google Calendar")
+    finally:
+        invalidate_google_credentials(current_user)
+        calendar_event_store.evict(current_user)
+        invalidate_integration_status(current_user)
+        google_token_refresher.untrack(current_user)
+        schedule_digests.forget(current_user)
+
+    return GoogleCalendarUnlinkResponse(success=True, message="Google Calendar unlinked")
+
+@router.post("/notifications", include_in_schema=False)
+async def receive_calendar_notification(
+    x_goog_channel_id: str = Header(...),
+    x_goog_resource_id: str = Header(...),
+    x_goog_resource_state: str = Header(...),
+    x_goog_channel_token: Optional[str] = Header(None),
+):
+    """
+    Webhook for Google Calendar push notifications. The body is empty; the headers name the
+    channel, and its token proves the notification comes from a channel this server opened.
+    """
+    await google_calendar_watcher.handle_notification(
+        x_goog_channel_id, x_goog_channel_token, x_goog_resource_id, x_goog_resource_state
+    )
+    return Response(status_code=200)
+
+def _as_aware(value: Optional[datetime]) -> Optional[datetime]:
+    # Query datetimes without an offset are taken as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 @router.get("/events")
-async def get_calendar_events(current_user: str = Depends(get_current_user)):
+async def get_calendar_events(
+    time_min: Optional[datetime] = None,
+    time_max: Optional[datetime] = None,
+    max_results: Optional[int] = Query(None, ge=1),
+    current_user: str = Depends(get_current_user)
+):
     """
-    Fetches Google Calendar events for the authenticated user.
+    Fetches Google Calendar events for the authenticated user across all of their selected calendars.
+    Without a time window, returns the next 10 upcoming events; with one, every event overlapping it.
     """
+    time_min, time_max = _as_aware(time_min), _as_aware(time_max)
+    if time_min and time_max and time_max <= time_min:
+        raise HTTPException(status_code=400, detail="time_max must be after time_min")
+    if max_results is None and time_min is None and time_max is None:
+        max_results = 10
+
     try:
         # Retrieve user's Google Calendar tokens from Supabase metadata
         credentials = await get_google_credentials(current_user)
 
         # Use the credentials to fetch events
-        events = await get_google_calendar_events(credentials)
+        events = await get_google_calendar_events(
+            current_user, credentials, time_min=time_min, time_max=time_max, max_results=max_results
+        )
         return {"events": events}
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Error fetching events for user {current_user}: {e}")
+        logger.exception("Error fetching events", extra={"user_id": current_user})
         raise HTTPException(status_code=500, detail=f"Failed to fetch Google Calendar events: {e}") 
\ No newline at end of file
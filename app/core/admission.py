@@ -0,0 +1,243 @@
+import math
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.lifecycle import is_draining
+from app.core.metrics import metrics
+
+admission_rejections = metrics.counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control.",
+    labels=("reason",)
+)
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, burst: int) -> Tuple[float, float]:
+    """
+    Token bucket step shared by the backends: refills the bucket for the time elapsed, then takes a token.
+    Returns:
+        The tokens left, and 0 if a token was taken or the seconds until one will be available.
+    """
+    tokens = min(float(burst), tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+class RateLimitBackend(ABC):
+    """
+    Storage for per-key token buckets.
+    The in-process backend suits a single worker; the SQLite backend keeps limits consistent
+    across the workers on a host, and another shared store (e.g. Redis) can implement the same method.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Takes one token from the bucket for `key`.
+        Args:
+            rate: Tokens added per second.
+            burst: Bucket capacity.
+        Returns:
+            0 if a token was taken, otherwise the seconds until one will be available.
+        """
+
+    def close(self) -> None:
+        """Releases any connection the backend holds."""
+
+class InProcessRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(burst), now))
+        tokens, wait = refill(tokens, updated_at, now, rate, burst)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # Least recently seen keys have long since refilled to a full bucket anyway
+            self._buckets.popitem(last=False)
+        return wait
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets in a SQLite file shared by the workers on a host. Each take runs in a write
+    transaction, so concurrent requests from any worker draw from the same bucket.
+    """
+
+    # Full buckets are dropped every this many takes; a missing bucket is a full one
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _take(self, key: str, rate: float, burst: int) -> float:
+        # Wall-clock time, which every worker agrees on
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, wait = refill(*(row or (float(burst), now)), now, rate, burst)
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self._takes += 1
+                if self._takes % self.PURGE_EVERY == 0:
+                    conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - burst / rate,))
+        return wait
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+class AdmissionTicket:
+    """
+    Holds a generation slot until released; releasing more than once is a no-op.
+    As an async context manager it releases the slot on exit, however the block ends.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore):
+        self._semaphore = semaphore
+        self._released = False
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._semaphore.release()
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+class AdmissionController:
+    """
+    Admission control for expensive endpoints: a per-user token bucket, then a global
+    concurrency limit with a bounded wait queue. Requests that cannot be admitted fail
+    fast with 429 (user over their rate) or 503 (server at capacity) and a Retry-After header.
+    The concurrency limit and queue are per process; with several workers, pass each one its share.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        rate_per_minute: float,
+        burst: int,
+        max_concurrent: int,
+        max_queued: int,
+        queue_timeout: float,
+    ):
+        self.backend = backend
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._queued = 0
+
+    async def admit(self, user_id: str) -> AdmissionTicket:
+        """
+        Admits a request for `user_id`; the caller must release the returned ticket when done.
+        Raises:
+            HTTPException: 429 or 503 with a Retry-After header when the request is rejected,
+                and 503 while the process is draining for shutdown.
+        """
+        if is_draining():
+            # Shutting down: in-flight streams may finish, but nothing new starts here
+            admission_rejections.inc(reason="draining")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The server is restarting. Please try again shortly.",
+                headers=_retry_after(1),
+            )
+
+        wait = await self.backend.take(user_id, self.rate, self.burst)
+        if wait > 0:
+            admission_rejections.inc(reason="rate_limited")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many chat requests. Please slow down.",
+                headers=_retry_after(wait),
+            )
+
+        if self._semaphore.locked():
+            if self._queued >= self.max_queued:
+                admission_rejections.inc(reason="queue_full")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="The assistant is busy. Please try again shortly.",
+                    headers=_retry_after(self.queue_timeout),
+                )
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                admission_rejections.inc(reason="queue_timeout")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="The assistant is busy. Please try again shortly.",
+                    headers=_retry_after(self.queue_timeout),
+                )
+            finally:
+                self._queued -= 1
+        else:
+            await self._semaphore.acquire()
+        return AdmissionTicket(self._semaphore)
+
+def worker_share(limit: int, workers: int) -> int:
+    """This worker's part of a host-wide limit, so the workers together stay within it."""
+    return max(1, limit // max(1, workers))
+
+chat_admission = AdmissionController(
+    # Buckets are shared when requests from one user can reach several workers
+    backend=(
+        SQLiteRateLimitBackend(settings.RATE_LIMIT_DB_PATH) if settings.WEB_CONCURRENCY > 1
+        else InProcessRateLimitBackend()
+    ),
+    rate_per_minute=settings.CHAT_RATE_LIMIT_PER_MINUTE,
+    burst=settings.CHAT_RATE_LIMIT_BURST,
+    max_concurrent=worker_share(settings.CHAT_MAX_CONCURRENT_GENERATIONS, settings.WEB_CONCURRENCY),
+    max_queued=worker_share(settings.CHAT_MAX_QUEUED_GENERATIONS, settings.WEB_CONCURRENCY),
+    queue_timeout=settings.CHAT_QUEUE_TIMEOUT_SECONDS,
+)
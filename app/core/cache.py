@@ -0,0 +1,87 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """
+    Bounded in-process cache with per-entry expiry and LRU eviction.
+    Hit, miss and eviction counters are kept so the cache can be sized from real traffic.
+    """
+
+    def __init__(self, maxsize: int, default_ttl: float, name: str = "cache"):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used one is evicted.
+            default_ttl: Lifetime in seconds for entries stored without an explicit expiry.
+            name: Label used when reporting stats.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Returns the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """
+        Stores a value.
+        Args:
+            ttl: Lifetime in seconds; falls back to `default_ttl`. Values with a non-positive ttl are not stored.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
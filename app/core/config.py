@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,16 +8,153 @@ class Settings(BaseSettings):
     SUPABASE_SERVICE_KEY: str
     SUPABASE_JWT_SECRET: str
 
+    # Verified JWT cache
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_MAX_ENTRIES: int = 10000
+    JWT_CACHE_MAX_TTL_SECONDS: float = 300.0
+
+    # Supabase HTTP client tuning
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    SUPABASE_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    SUPABASE_MAX_CONNECTIONS: int = 100
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # User metadata / credentials cache
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 300.0
+
     # Google settings
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_API_KEY: str
     GOOGLE_CALENDAR_REDIRECT_URI: str
 
+    # Google Calendar API client
+    GOOGLE_CALENDAR_API_BASE_URL: str = "https://www.googleapis.com/calendar/v3"
+    GOOGLE_TOKEN_URI: str = "https://oauth2.googleapis.com/token"
+    GOOGLE_TOKEN_REVOKE_URI: str = "https://oauth2.googleapis.com/revoke"
+    GOOGLE_CALENDAR_TIMEOUT_SECONDS: float = 10.0
+    GOOGLE_CALENDAR_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    GOOGLE_CALENDAR_MAX_RETRIES: int = 2
+    GOOGLE_CALENDAR_RETRY_BACKOFF_SECONDS: float = 0.25
+    GOOGLE_CALENDAR_MAX_CONNECTIONS: int = 100
+    GOOGLE_CALENDAR_MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+    # Worker processes
+    # How many serve this host; set by serve.py (and read by uvicorn's own --workers)
+    WEB_CONCURRENCY: int = 1
+    # Directory for the lock that elects one worker per deployment to run background jobs (token refresh, channel
+    # renewal); by default a lock in the temp directory scoped to the working directory
+    PROCESS_LOCK_DIR: Optional[str] = None
+
+    # Background Google token refresh
+    GOOGLE_TOKEN_REFRESH_ENABLED: bool = True
+    GOOGLE_TOKEN_REFRESH_LEAD_SECONDS: float = 300.0
+    GOOGLE_TOKEN_REFRESH_JITTER_SECONDS: float = 120.0
+    GOOGLE_TOKEN_REFRESH_RETRY_SECONDS: float = 60.0
+    GOOGLE_TOKEN_REFRESH_WORKERS: int = 8
+    GOOGLE_TOKEN_REFRESH_FLUSH_SECONDS: float = 2.0
+
+    # Google Calendar local event store
+    GOOGLE_CALENDAR_SYNC_INTERVAL_SECONDS: float = 30.0
+    GOOGLE_CALENDAR_SYNC_WINDOW_DAYS: int = 14
+    GOOGLE_CALENDAR_STORE_MAX_USERS: int = 5000
+    GOOGLE_CALENDAR_LIST_REFRESH_SECONDS: float = 900.0
+
+    # Google Calendar push notifications (events.watch); disabled until a public HTTPS webhook URL is set,
+    # e.g. https://api.example.com/api/v1/integrations/google-calendar/notifications
+    GOOGLE_CALENDAR_WEBHOOK_URL: Optional[str] = None
+    # Requested channel lifetime; Google caps it (currently at 7 days for events)
+    GOOGLE_CALENDAR_WATCH_TTL_SECONDS: int = 604800
+    GOOGLE_CALENDAR_WATCH_RENEW_BEFORE_SECONDS: float = 86400.0
+    GOOGLE_CALENDAR_WATCH_RENEW_CHECK_SECONDS: float = 300.0
+    GOOGLE_CALENDAR_WATCH_WORKERS: int = 8
+    # Channels are shared by the workers on a host, which pick up each other's notifications
+    GOOGLE_CALENDAR_CHANNEL_DB_PATH: str = "calendar_channels.db"
+    GOOGLE_CALENDAR_NOTIFICATION_POLL_SECONDS: float = 1.0
+    # Safety-net sync interval for users whose calendars are watched; changes otherwise arrive by push
+    GOOGLE_CALENDAR_PUSH_SYNC_INTERVAL_SECONDS: float = 900.0
+
+    # Calendar context injected into prompts
+    CALENDAR_CONTEXT_TOKEN_BUDGET: int = 1500
+    CALENDAR_CONTEXT_MAX_DESCRIPTION_CHARS: int = 200
+
+    # Chat admission control; the concurrency and queue limits are for the whole host, split across its workers
+    CHAT_RATE_LIMIT_PER_MINUTE: float = 20.0
+    CHAT_RATE_LIMIT_BURST: int = 5
+    CHAT_MAX_CONCURRENT_GENERATIONS: int = 50
+    CHAT_MAX_QUEUED_GENERATIONS: int = 100
+    # Per-user buckets shared by a host's workers, used when there is more than one
+    RATE_LIMIT_DB_PATH: str = "rate_limits.db"
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 5.0
+
+    # Chat preparation stage deadlines
+    CHAT_CREDENTIALS_TIMEOUT_SECONDS: float = 2.0
+    CHAT_CALENDAR_TIMEOUT_SECONDS: float = 3.0
+
+    # Server-sent events chat streams
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_RETRY_MILLISECONDS: int = 2000
+    SSE_COALESCE_MAX_CHARS: int = 256
+    SSE_COALESCE_MAX_DELAY_SECONDS: float = 0.05
+    SSE_REPLAY_TTL_SECONDS: float = 60.0
+    SSE_REPLAY_MAX_STREAMS: int = 1000
+    SSE_RESUME_GRACE_SECONDS: float = 15.0
+    # Generation pauses while this many events are published but not yet sent to any connection
+    SSE_MAX_UNREAD_EVENTS: int = 32
+
+    # Conversation sessions
+    SESSION_DB_PATH: str = "sessions.db"
+    SESSION_CACHE_MAX_ENTRIES: int = 1000
+    SESSION_RECENT_TURNS: int = 20
+    SESSION_MAX_CONTEXT_TOKENS: int = 4000
+
+    # LLM response cache
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+    RESPONSE_CACHE_MAX_TTL_SECONDS: float = 900.0
+
+    # Greetings and schedule questions, for any window, are rendered by the server instead of the model
+    SCHEDULE_RENDERER_ENABLED: bool = True
+    # Streams a short model-written note after the rendered schedule, in place of the fixed closing line
+    SCHEDULE_RENDERER_LLM_GREETING: bool = False
+
+    # Precomputed daily schedule digests, served to greetings that open a conversation; written by the
+    # schedule renderer while it is enabled, otherwise by the model, and computed by one worker per host
+    DIGESTS_ENABLED: bool = True
+    DIGEST_DB_PATH: str = "digests.db"
+    DIGEST_WORKERS: int = 4
+    # How often a digest is re-checked against the calendar; the LLM only runs again if the events changed
+    DIGEST_REFRESH_SECONDS: float = 300.0
+
+    # Gemini LLM client
+    GEMINI_API_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta"
+    GEMINI_MODEL: str = "models/gemini-1.5-flash-latest"
+    GEMINI_TIMEOUT_SECONDS: float = 60.0
+    GEMINI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    GEMINI_MAX_CONNECTIONS: int = 100
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+    # Startup warm-up
+    WARMUP_TIMEOUT_SECONDS: float = 10.0
+
+    # Integration status checks
+    INTEGRATION_STATUS_CACHE_TTL_SECONDS: float = 60.0
+    INTEGRATION_STATUS_CHECK_TIMEOUT_SECONDS: float = 5.0
+    INTEGRATION_STATUS_PROBE_TIMEOUT_SECONDS: float = 2.0
+
+    # Observability
+    INSTRUMENTATION_ENABLED: bool = True
+    # Directory where each worker publishes its metrics for the others to merge; set by serve.py with several workers
+    METRICS_MULTIPROCESS_DIR: Optional[str] = None
+    METRICS_FLUSH_SECONDS: float = 1.0
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+
     # Frontend settings
     FRONTEND_URL: str
 
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings() 
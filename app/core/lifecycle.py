@@ -0,0 +1,55 @@
+import os
+import time
+import hashlib
+import tempfile
+from typing import Dict, IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process is its own leader
+    fcntl = None
+
+# Process-wide lifecycle state shared by the server entry point and the app.
+
+_drain_started_at: Optional[float] = None
+_held_locks: Dict[str, IO] = {}
+
+def begin_drain() -> None:
+    """Marks the process as shutting down: readiness fails and new chats are turned away."""
+    global _drain_started_at
+    if _drain_started_at is None:
+        _drain_started_at = time.monotonic()
+
+def is_draining() -> bool:
+    return _drain_started_at is not None
+
+def process_lock_path(name: str, directory: Optional[str] = None) -> str:
+    """
+    Where the lock named `name` lives. Without a configured directory the file name is scoped to
+    the working directory, which holds the SQLite state the workers share by default, so separate
+    deployments on one host each elect their own leader instead of contending for one /tmp file.
+    """
+    if directory:
+        return os.path.join(directory, f"zeno-{name}.lock")
+    scope = hashlib.sha256(os.getcwd().encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"zeno-{name}-{scope}.lock")
+
+def acquire_process_lock(name: str, directory: Optional[str] = None) -> bool:
+    """
+    Takes a host-wide advisory lock without blocking, held until the process exits.
+    Used to elect one worker for singleton background jobs when several workers share a host.
+    Returns:
+        True if this process holds the lock.
+    """
+    if name in _held_locks:
+        return True
+    if fcntl is None:
+        return True
+    handle = open(process_lock_path(name, directory), "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _held_locks[name] = handle
+    return True
@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import glob
+import asyncio
+import logging
+import threading
+import contextlib
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Minimal in-process metrics registry. Metric names follow Prometheus conventions.
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, snapshot: List[list]) -> None:
+        """Adds another process's values, as returned by `snapshot`."""
+        with self._lock:
+            for key, value in snapshot:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0.0) + value
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: (bucket counts, +Inf count is the total, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = entry
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [[list(key), list(counts), total, count] for key, (counts, total, count) in self._values.items()]
+
+    def merge(self, snapshot: List[list]) -> None:
+        """Adds another process's observations, as returned by `snapshot`."""
+        with self._lock:
+            for key, counts, total, count in snapshot:
+                entry = self._values.setdefault(tuple(key), [[0] * len(self.buckets), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+
+    def samples(self) -> Dict[LabelValues, Tuple[List[int], float, int]]:
+        """Returns cumulative bucket counts, sum and count per label set."""
+        with self._lock:
+            result = {}
+            for key, (counts, total, count) in self._values.items():
+                cumulative, running = [], 0
+                for c in counts:
+                    running += c
+                    cumulative.append(running)
+                result[key] = (cumulative, total, count)
+            return result
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, description, labels)
+            return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, labels, buckets)
+            return self._metrics[name]
+
+    def metrics(self) -> List[object]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Every metric's definition and values, as JSON-serializable data."""
+        result = {}
+        for metric in self.metrics():
+            entry = {"description": metric.description, "labels": list(metric.labels), "values": metric.snapshot()}
+            if isinstance(metric, Histogram):
+                entry.update(type="histogram", buckets=list(metric.buckets))
+            else:
+                entry["type"] = "counter"
+            result[metric.name] = entry
+        return result
+
+    def merge(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        """Adds the values of another registry's `snapshot`, registering metrics missing here."""
+        for name, entry in snapshot.items():
+            if entry["type"] == "histogram":
+                metric = self.histogram(name, entry["description"], entry["labels"], entry["buckets"])
+            else:
+                metric = self.counter(name, entry["description"], entry["labels"])
+            metric.merge(entry["values"])
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_string(names: Sequence[str], values: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def render_prometheus(registry: "MetricsRegistry") -> str:
+    """Renders every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for metric in registry.metrics():
+        # HELP text escapes backslashes and newlines only
+        help_text = metric.description.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {help_text}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {metric.name} counter")
+            for values, total in metric.samples().items():
+                lines.append(f"{metric.name}{_label_string(metric.labels, values)} {_format_value(total)}")
+        elif isinstance(metric, Histogram):
+            lines.append(f"# TYPE {metric.name} histogram")
+            for values, (cumulative, total, count) in metric.samples().items():
+                for bound, bucket_count in zip(metric.buckets, cumulative):
+                    labels = _label_string(metric.labels, values, [("le", _format_value(bound))])
+                    lines.append(f"{metric.name}_bucket{labels} {bucket_count}")
+                labels = _label_string(metric.labels, values, [("le", "+Inf")])
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+                lines.append(f"{metric.name}_sum{_label_string(metric.labels, values)} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{_label_string(metric.labels, values)} {count}")
+    return "\n".join(lines) + "\n"
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class WorkerMetrics:
+    """
+    Cross-worker view of the metrics, in the manner of prometheus_client's multiprocess mode:
+    every worker writes its registry, plus a dict of debug stats, to its own file in a directory
+    shared by the host's workers, and a scrape on any worker merges every file.
+
+    Files are rewritten every `flush_interval` seconds, and by the scraping worker just before
+    it reads them. Files of exited workers are kept so counters never go backwards; the
+    directory is cleared when the server starts.
+    """
+
+    def __init__(self, directory: str, registry: MetricsRegistry, flush_interval: float):
+        self.directory = directory
+        self.registry = registry
+        self.flush_interval = flush_interval
+        # Unique per process start, so a reused pid does not overwrite an exited worker's counters
+        self.path = os.path.join(directory, f"worker-{os.getpid()}-{time.time_ns()}.json")
+        self._stats: Optional[Callable[[], Dict[str, Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def write(self) -> None:
+        data = {
+            "pid": os.getpid(),
+            "metrics": self.registry.snapshot(),
+            "stats": self._stats() if self._stats else None,
+        }
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(data, f, default=str)
+        # Readers never see a partly written file
+        os.replace(temporary, self.path)
+
+    def _read(self) -> List[Dict[str, Any]]:
+        workers = []
+        for path in glob.glob(os.path.join(self.directory, "worker-*.json")):
+            try:
+                with open(path) as f:
+                    workers.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return workers
+
+    def collect(self) -> MetricsRegistry:
+        """Every worker's metrics merged into one registry, with this worker's up to date."""
+        self.write()
+        merged = MetricsRegistry()
+        for worker in self._read():
+            merged.merge(worker["metrics"])
+        return merged
+
+    def stats(self) -> Dict[str, Any]:
+        """The debug stats of each running worker, by pid, with this worker's up to date."""
+        self.write()
+        return {
+            str(worker["pid"]): worker["stats"]
+            for worker in self._read() if _process_alive(worker["pid"])
+        }
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning("Error writing worker metrics", extra={"error": str(e)})
+
+    def start(self, stats: Optional[Callable[[], Dict[str, Any]]] = None) -> None:
+        self._stats = stats
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # Final counts of this worker stay in the merged totals
+        self._stats = None
+        self.write()
+
+def clear_worker_metrics(directory: str) -> None:
+    """Removes the files of a previous server run; called before workers start."""
+    for path in glob.glob(os.path.join(directory, "worker-*.json*")):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+# Shared registry for the whole app
+metrics = MetricsRegistry()
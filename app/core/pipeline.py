@@ -0,0 +1,120 @@
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from app.core.metrics import metrics
+from app.core.tracing import record_timing
+
+stage_duration = metrics.histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of each pipeline stage.",
+    labels=("pipeline", "stage", "status")
+)
+
+@dataclass
+class Stage:
+    """
+    A unit of work in a Pipeline.
+    Args:
+        name: Unique stage name; results are looked up by it.
+        run: Coroutine function receiving a dict of its dependencies' values.
+        depends_on: Names of stages whose results this stage needs.
+        timeout: Deadline in seconds for this stage alone.
+        fallback: Value used when the stage fails, times out, or a dependency did not succeed.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Sequence[str] = ()
+    timeout: Optional[float] = None
+    fallback: Any = None
+
+@dataclass
+class StageResult:
+    value: Any
+    status: str  # "ok", "timeout", "error" or "skipped"
+    started_at: float
+    finished_at: float
+    error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+@dataclass
+class PipelineRun:
+    results: Dict[str, StageResult] = field(default_factory=dict)
+    stages: Dict[str, Stage] = field(default_factory=dict)
+
+    def value(self, name: str) -> Any:
+        return self.results[name].value
+
+    def timings(self) -> Dict[str, float]:
+        """Stage durations in milliseconds."""
+        return {name: round(result.duration * 1000, 3) for name, result in self.results.items()}
+
+    def critical_path(self) -> List[str]:
+        """The chain of stages, following the latest-finishing dependency, that determined total latency."""
+        if not self.results:
+            return []
+        name = max(self.results, key=lambda n: self.results[n].finished_at)
+        path = [name]
+        while self.stages[name].depends_on:
+            name = max(self.stages[name].depends_on, key=lambda n: self.results[n].finished_at)
+            path.append(name)
+        return list(reversed(path))
+
+class Pipeline:
+    """
+    Runs dependency-ordered async stages, starting each one as soon as its dependencies finish,
+    so independent stages overlap. A stage that errors or misses its deadline yields its
+    fallback value instead of failing the whole run.
+    """
+
+    def __init__(self, name: str, stages: Sequence[Stage]):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.depends_on if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    async def run(self) -> PipelineRun:
+        pipeline_run = PipelineRun(stages=self.stages)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> StageResult:
+            deps = {}
+            for dep in stage.depends_on:
+                deps[dep] = await tasks[dep]
+            started = time.perf_counter()
+            if any(not result.ok for result in deps.values()):
+                result = StageResult(stage.fallback, "skipped", started, time.perf_counter())
+            else:
+                try:
+                    value = await asyncio.wait_for(
+                        stage.run({dep: result.value for dep, result in deps.items()}),
+                        stage.timeout
+                    )
+                    result = StageResult(value, "ok", started, time.perf_counter())
+                except asyncio.TimeoutError as e:
+                    result = StageResult(stage.fallback, "timeout", started, time.perf_counter(), e)
+                except Exception as e:
+                    result = StageResult(stage.fallback, "error", started, time.perf_counter(), e)
+            pipeline_run.results[stage.name] = result
+            stage_duration.observe(result.duration, pipeline=self.name, stage=stage.name, status=result.status)
+            record_timing(f"{self.name}.{stage.name}", result.duration)
+            return result
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return pipeline_run
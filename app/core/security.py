@@ -1,22 +1,53 @@
+import time
+import hashlib
 from fastapi import HTTPException, status
-from jose import jwt
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.tracing import span
 
-def verify_supabase_token(token: str) -> dict:
+# Verified payloads keyed by a digest of the token, so raw tokens are never kept in memory.
+# Entries never outlive the token's own `exp` claim.
+verified_token_cache: TTLCache[dict] = TTLCache(
+    maxsize=settings.JWT_CACHE_MAX_ENTRIES,
+    default_ttl=settings.JWT_CACHE_MAX_TTL_SECONDS,
+    name="verified_jwt"
+)
+
+def verify_supabase_token(token: str, use_cache: bool = settings.JWT_CACHE_ENABLED) -> dict:
     """
     Verify a Supabase JWT token and return the payload.
+    Args:
+        token: The bearer token.
+        use_cache: Serve previously verified, unexpired tokens from the in-process cache.
     """
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],  # Supabase uses HS256 (HMAC with SHA-256) for JWT signing.
-            audience="authenticated"  # Supabase specific audience
-        )
+    with span("jwt", "verify") as timing:
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        if use_cache:
+            payload = verified_token_cache.get(key)
+            # Re-check expiry against the wall clock; the cache TTL is measured on a monotonic clock
+            if payload is not None and payload.get("exp", 0) > time.time():
+                timing.status = "cached"
+                return payload
+
+        # Loaded on first use (or by the lifespan preload), not when the app is imported
+        from jose import jwt
+
+        try:
+            payload = jwt.decode(
+                token,
+                settings.SUPABASE_JWT_SECRET,
+                algorithms=["HS256"],  # Supabase uses HS256 (HMAC with SHA-256) for JWT signing.
+                audience="authenticated"  # Supabase specific audience
+            )
+        except jwt.JWTError:
+            timing.status = "invalid"
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        exp = payload.get("exp")
+        if use_cache and exp is not None:
+            verified_token_cache.set(key, payload, ttl=min(exp - time.time(), settings.JWT_CACHE_MAX_TTL_SECONDS))
         return payload
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token",
-            headers={"WWW-Authenticate": "Bearer"},
-        ) 
\ No newline at end of file
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+singleflight_calls = metrics.counter(
+    "singleflight_calls_total",
+    "Calls through a single-flight group, by whether they led or joined an in-flight call.",
+    labels=("group", "role")
+)
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one in-flight call.
+    The leader's result, or its exception, is shared with every caller that joined it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.collapsed += 1
+            singleflight_calls.inc(group=self.name, role="collapsed")
+            # Shield so a cancelled waiter does not cancel the shared call for everyone else
+            return await asyncio.shield(future)
+
+        self.leaders += 1
+        singleflight_calls.inc(group=self.name, role="leader")
+        future = asyncio.ensure_future(fn())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return await asyncio.shield(future)
+
+    def forget(self, key: Hashable) -> None:
+        """Makes later calls with `key` start a new call instead of joining the one in flight."""
+        self._in_flight.pop(key, None)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        # A forgotten call must not remove the one that replaced it
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,63 @@
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, List, Optional
+
+# Server-sent events framing: https://html.spec.whatwg.org/multipage/server-sent-events.html
+
+HEARTBEAT = ": keepalive\n\n"
+
+def format_event(data: str, id: Optional[str] = None, event: Optional[str] = None) -> str:
+    """Formats one event; multi-line data is split across `data:` fields as the spec requires."""
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+def format_retry(milliseconds: int) -> str:
+    """Tells the client how long to wait before reconnecting."""
+    return f"retry: {milliseconds}\n\n"
+
+async def coalesce(chunks: AsyncIterator[str], max_chars: int, max_delay: float) -> AsyncGenerator[str, None]:
+    """
+    Merges small text chunks into fewer, larger ones.
+    A merged chunk is emitted once it reaches `max_chars`, or once its oldest part has waited
+    `max_delay` seconds, so coalescing never holds text back for longer than that.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    pending: List[str] = []
+    pending_chars = 0
+    deadline = None
+    next_chunk: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            # Waiting on the future rather than with wait_for keeps a timeout from cancelling the source
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                yield "".join(pending)
+                pending, pending_chars, deadline = [], 0, None
+                continue
+            future, next_chunk = next_chunk, None
+            try:
+                chunk = future.result()
+            except StopAsyncIteration:
+                break
+            pending.append(chunk)
+            pending_chars += len(chunk)
+            if deadline is None:
+                deadline = loop.time() + max_delay
+            if pending_chars >= max_chars:
+                yield "".join(pending)
+                pending, pending_chars, deadline = [], 0, None
+        if pending:
+            yield "".join(pending)
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+            # Let the source settle so it can be closed; wait() does not re-raise its outcome
+            await asyncio.wait({next_chunk})
@@ -0,0 +1,141 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Timing spans for upstream calls. Each span feeds a latency histogram and, while a request
+# is being handled, an entry in that request's Server-Timing header. Only spans that finish
+# before the response headers are sent can appear in the header; streamed work such as
+# LLM generation shows up in the histograms only.
+
+MAX_SERVER_TIMING_ENTRIES = 32
+
+upstream_duration = metrics.histogram(
+    "upstream_request_duration_seconds",
+    "Duration of calls to upstream services (Supabase, Google, Gemini) and local verification work.",
+    labels=("upstream", "operation", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending its response headers.",
+    labels=("method", "route", "status")
+)
+
+# (name, seconds) entries for the current request; None outside a request
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+def record_timing(name: str, seconds: float) -> None:
+    """Adds an entry to the current request's Server-Timing header, if there is one."""
+    timings = _request_timings.get()
+    if timings is not None and len(timings) < MAX_SERVER_TIMING_ENTRIES:
+        timings.append((name, seconds))
+
+class Span:
+    """
+    Times a block of work. Usable with both `with` and `async with`.
+    Set `status` inside the block (e.g. to an HTTP status code) to label the observation;
+    it defaults to "ok", or "error" if the block raises without setting one.
+    """
+
+    __slots__ = ("upstream", "operation", "status", "_started")
+
+    def __init__(self, upstream: str, operation: str):
+        self.upstream = upstream
+        self.operation = operation
+        self.status = "ok"
+        self._started = 0.0
+
+    def __enter__(self) -> "Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self._started
+        if exc_type is not None and self.status == "ok":
+            self.status = "error"
+        upstream_duration.observe(duration, upstream=self.upstream, operation=self.operation, status=self.status)
+        record_timing(f"{self.upstream}.{self.operation}", duration)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+class _NoopSpan:
+    """Stand-in returned when instrumentation is disabled; entering and exiting does nothing."""
+
+    __slots__ = ()
+    status = "ok"
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    async def __aenter__(self) -> "_NoopSpan":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(upstream: str, operation: str):
+    """
+    Starts a timing span.
+    Args:
+        upstream: The service called, e.g. "supabase"; a low-cardinality metric label.
+        operation: The call made, e.g. "admin.get_user"; never include IDs.
+    """
+    if not settings.INSTRUMENTATION_ENABLED:
+        return _NOOP_SPAN
+    return Span(upstream, operation)
+
+def _server_timing(timings: List[Tuple[str, float]], total: float) -> bytes:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+class ServerTimingMiddleware:
+    """
+    Collects the spans recorded while handling a request into a `Server-Timing` header,
+    and records the request latency by route.
+    Written as plain ASGI middleware so streaming responses pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, elapsed)))
+                message = {**message, "headers": headers}
+                route = getattr(scope.get("route"), "path", "unmatched")
+                http_request_duration.observe(
+                    elapsed, method=scope["method"], route=route, status=str(message["status"])
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -1,27 +1,143 @@
-from supabase import create_client, Client
+import httpx
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException
 from app.core.config import settings
+from app.core.tracing import span
 
-# Python Supabase documentation: https://supabase.com/docs/reference/python/introduction
+# Async adapter over the Supabase Auth (GoTrue) REST API.
+# The Python SDK performs blocking HTTP calls, which would stall the event loop
+# for every in-flight request, so we talk to the REST API directly through one
+# pooled, keep-alive httpx.AsyncClient instead.
+# Auth API reference: https://supabase.com/docs/reference/self-hosting-auth/introduction
 
-class SupabaseClient:
-    def __init__(self):
-        self.client: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_KEY
+class SupabaseAuthError(Exception):
+    """Raised when the Supabase Auth API returns an error response."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+@dataclass
+class SupabaseUser:
+    id: str
+    email: Optional[str] = None
+    user_metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SupabaseUser":
+        return cls(
+            id=data["id"],
+            email=data.get("email"),
+            user_metadata=data.get("user_metadata") or {},
         )
-        self.admin_client: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_KEY
+
+@dataclass
+class SupabaseSession:
+    access_token: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SupabaseSession":
+        return cls(
+            access_token=data["access_token"],
+            refresh_token=data.get("refresh_token"),
+            expires_in=data.get("expires_in"),
+        )
+
+@dataclass
+class SupabaseAuthResponse:
+    user: Optional[SupabaseUser] = None
+    session: Optional[SupabaseSession] = None
+
+class SupabaseClient:
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            transport: Optional httpx transport, used to point the client at a local fake.
+        """
+        self.auth_url = f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1"
+        self.transport = transport
+
+    @cached_property
+    def http(self) -> httpx.AsyncClient:
+        # Built on first use (the lifespan warm-up) rather than at import
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.SUPABASE_TIMEOUT_SECONDS,
+                connect=settings.SUPABASE_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            transport=self.transport,
         )
 
+    def _headers(self, admin: bool = False) -> Dict[str, str]:
+        key = settings.SUPABASE_SERVICE_KEY if admin else settings.SUPABASE_KEY
+        return {"apikey": key, "Authorization": f"Bearer {key}"}
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        operation: str,
+        admin: bool = False,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Sends a request to the Supabase Auth API and returns the decoded JSON body.
+        Args:
+            operation: Name of the call for timing spans, e.g. "admin.get_user".
+            timeout: Per-call timeout in seconds, overriding the client default.
+        Raises:
+            SupabaseAuthError: If the API responds with an error status.
+        """
+        async with span("supabase", operation) as timing:
+            response = await self.http.request(
+                method,
+                f"{self.auth_url}{path}",
+                headers=self._headers(admin),
+                json=json,
+                params=params,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            timing.status = str(response.status_code)
+        if response.is_error:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            message = (
+                body.get("msg")
+                or body.get("error_description")
+                or body.get("message")
+                or body.get("error")
+                or response.text
+            )
+            raise SupabaseAuthError(str(message), response.status_code)
+        return response.json()
+
     async def login(self, email: str, password: str):
         try:
-            response = self.client.auth.sign_in_with_password({
-                "email": email,
-                "password": password
-            })
-            return response
+            data = await self._request(
+                "POST",
+                "/token",
+                "token",
+                params={"grant_type": "password"},
+                json={"email": email, "password": password},
+            )
+            return SupabaseAuthResponse(
+                user=SupabaseUser.from_dict(data["user"]),
+                session=SupabaseSession.from_dict(data),
+            )
         except Exception as e:
             error_message = str(e)
             if "Invalid login credentials" in error_message:
@@ -34,21 +150,30 @@ class SupabaseClient:
                     status_code=500,
                     detail="An error occurred during login"
                 )
-    
+
     async def signup(self, email: str, password: str, first_name: str, last_name: str):
         try:
-            response = self.client.auth.sign_up({
-                "email": email,
-                "password": password,
-                "options": {
+            data = await self._request(
+                "POST",
+                "/signup",
+                "signup",
+                json={
+                    "email": email,
+                    "password": password,
                     "data": {
                         "first_name": first_name,
                         "last_name": last_name,
                         "email": email,
                     }
-                }
-            })
-            return response
+                },
+            )
+            # When email confirmation is enabled the API returns only the user, without a session
+            if "access_token" in data:
+                return SupabaseAuthResponse(
+                    user=SupabaseUser.from_dict(data["user"]),
+                    session=SupabaseSession.from_dict(data),
+                )
+            return SupabaseAuthResponse(user=SupabaseUser.from_dict(data))
         except Exception as e:
             error_message = str(e)
             if "User already registered" in error_message:
@@ -67,5 +192,62 @@ class SupabaseClient:
                     detail="An error occurred during signup"
                 )
 
+    async def get_user_by_id(self, user_id: str, timeout: Optional[float] = None) -> SupabaseAuthResponse:
+        """
+        Fetches a user through the admin API.
+        Args:
+            user_id: The Supabase user ID.
+            timeout: Optional per-call timeout in seconds.
+        Returns:
+            A SupabaseAuthResponse whose `user` holds the user's metadata.
+        """
+        data = await self._request("GET", f"/admin/users/{user_id}", "admin.get_user", admin=True, timeout=timeout)
+        return SupabaseAuthResponse(user=SupabaseUser.from_dict(data))
+
+    async def list_users(self, page: int = 1, per_page: int = 50, timeout: Optional[float] = None) -> List[SupabaseUser]:
+        """
+        Lists users through the admin API, one page at a time.
+        Args:
+            page: 1-based page number.
+            per_page: Number of users per page.
+            timeout: Optional per-call timeout in seconds.
+        Returns:
+            The users on the requested page; an empty list past the last page.
+        """
+        data = await self._request(
+            "GET",
+            "/admin/users",
+            "admin.list_users",
+            admin=True,
+            params={"page": str(page), "per_page": str(per_page)},
+            timeout=timeout,
+        )
+        return [SupabaseUser.from_dict(user) for user in data.get("users", [])]
+
+    async def update_user_by_id(
+        self,
+        user_id: str,
+        attributes: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> SupabaseAuthResponse:
+        """
+        Updates a user through the admin API. `user_metadata` keys are merged into the existing metadata.
+        Args:
+            user_id: The Supabase user ID.
+            attributes: The attributes to update, e.g. {"user_metadata": {...}}.
+            timeout: Optional per-call timeout in seconds.
+        """
+        data = await self._request("PUT", f"/admin/users/{user_id}", "admin.update_user", admin=True, json=attributes, timeout=timeout)
+        return SupabaseAuthResponse(user=SupabaseUser.from_dict(data))
+
+    async def warm_up(self, timeout: Optional[float] = None) -> None:
+        """Opens a pooled connection to the Auth API via its health endpoint."""
+        await self._request("GET", "/health", "health", timeout=timeout)
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections, if any were opened."""
+        if "http" in self.__dict__:
+            await self.http.aclose()
+
 # Create a singleton instance
-supabase = SupabaseClient() 
\ No newline at end of file
+supabase = SupabaseClient()
@@ -1,11 +1,103 @@
-from fastapi import FastAPI
+import logging
+import asyncio
+import importlib
+from typing import Tuple
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import api_router
+from app.core.admission import chat_admission
+from app.core.config import settings
+from app.core.lifecycle import acquire_process_lock, is_draining
+from app.core.logging_config import configure_logging
+from app.core.metrics import WorkerMetrics, metrics, render_prometheus
+from app.core.tracing import ServerTimingMiddleware
+from app.db.supabase_client import supabase
+from app.services.users import user_lookup_flight, user_metadata_cache
+from app.services.integrations.google_calendar import calendar_fetch_flight, credentials_cache, get_google_client_config
+from app.services.integrations.google_calendar_store import calendar_event_store
+from app.services.integrations.google_calendar_client import google_calendar_client
+from app.services.integrations.google_token_refresher import google_token_refresher
+from app.services.integrations.google_calendar_watch import google_calendar_watcher
+from app.services.llm import gemini_client
+from app.services.sessions import session_store
+from app.services.chat_streams import chat_streams
+from app.services.digests import schedule_digests
+from app.services.response_cache import response_cache
+from app.services.integrations.core import integration_status_cache
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Libraries the request path imports on first use, so importing the app stays fast.
+# Loaded during startup so the first requests do not pay for them.
+PRELOADED_MODULES = ("jose.jwt", "google.oauth2.credentials")
+
+# Set when several workers serve this host, so a scrape on any of them covers all
+worker_metrics = (
+    WorkerMetrics(settings.METRICS_MULTIPROCESS_DIR, metrics, settings.METRICS_FLUSH_SECONDS)
+    if settings.METRICS_MULTIPROCESS_DIR else None
+)
+
+async def _warm_up(name: str, warm_up) -> Tuple[str, bool]:
+    try:
+        await asyncio.wait_for(warm_up(), settings.WARMUP_TIMEOUT_SECONDS)
+        return name, True
+    except Exception as e:
+        # A slow or failing upstream should not keep the worker out of rotation; its calls fail on their own
+        logger.warning("Warm-up failed", extra={"upstream": name, "error": str(e)})
+        return name, False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+    get_google_client_config()
+    results = await asyncio.gather(
+        _warm_up("supabase", supabase.warm_up),
+        _warm_up("google_calendar", google_calendar_client.warm_up),
+        _warm_up("gemini", gemini_client.warm_up),
+    )
+    app.state.warm_up = dict(results)
+    # With several workers on a host, one of them (the leader) runs the background jobs; every worker
+    # still writes back tokens it refreshed on the request path
+    leader = acquire_process_lock("background-jobs", settings.PROCESS_LOCK_DIR)
+    if settings.GOOGLE_TOKEN_REFRESH_ENABLED and leader:
+        google_token_refresher.start()
+    # Every worker follows calendar notifications; the leader renews channels for the users the refresher tracks
+    google_calendar_watcher.start(renew=leader)
+    if settings.DIGESTS_ENABLED and leader:
+        schedule_digests.start()
+    if worker_metrics is not None:
+        worker_metrics.start(stats=cache_stats)
+    app.state.ready = True
+
+    yield
+
+    # Stop taking traffic before tearing down shared clients
+    app.state.ready = False
+    await google_token_refresher.stop()
+    await google_calendar_watcher.stop()
+    await schedule_digests.stop()
+    if worker_metrics is not None:
+        await worker_metrics.stop()
+    # Release pooled upstream connections on shutdown
+    await asyncio.gather(
+        supabase.aclose(),
+        google_calendar_client.aclose(),
+        gemini_client.aclose(),
+        return_exceptions=True
+    )
+    session_store.close()
+    chat_admission.backend.close()
 
 app = FastAPI(
     title="Zeno Server",
     description="AI Productivity Assistant API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -17,12 +109,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request Server-Timing header and request latency histogram
+if settings.INSTRUMENTATION_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Zeno Server API"}
 
+# Liveness: the process is up and serving requests
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive"}
+
+# Readiness: shared clients are built and warmed, so the load balancer may route traffic here
+@app.get("/health/ready")
+async def health_ready(request: Request):
+    ready = getattr(request.app.state, "ready", False) and not is_draining()
+    body = {
+        "status": "ready" if ready else ("draining" if is_draining() else "starting"),
+        "warm_up": getattr(request.app.state, "warm_up", {}),
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    registry = worker_metrics.collect() if worker_metrics is not None else metrics
+    return PlainTextResponse(render_prometheus(registry), media_type="text/plain; version=0.0.4")
+
 # Allows you to check existing routes
 @app.get("/debug/routes")
 async def debug_routes():
@@ -34,3 +151,21 @@ async def debug_routes():
             "methods": route.methods
         })
     return {"routes": routes}
+
+def cache_stats():
+    return {
+        "caches": [user_metadata_cache.stats(), credentials_cache.stats(), response_cache.stats(), integration_status_cache.stats()],
+        "calendar_event_store": calendar_event_store.stats(),
+        "google_token_refresher": google_token_refresher.stats(),
+        "google_calendar_watcher": google_calendar_watcher.stats(),
+        "schedule_digests": schedule_digests.stats(),
+        "single_flight": [user_lookup_flight.stats(), calendar_fetch_flight.stats()],
+        "chat_streams": chat_streams.stats(),
+    }
+
+# Hit/miss counters for sizing the in-process caches; per worker when there are several
+@app.get("/debug/cache-stats")
+async def debug_cache_stats():
+    if worker_metrics is not None:
+        return {"workers": worker_metrics.stats()}
+    return cache_stats()
@@ -1,9 +1,17 @@
-from typing import List, Literal
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
 
 class ChatMessage(BaseModel):
     role: Literal['user', 'assistant'] = Field(..., description="The role of the message sender.")
     content: str = Field(..., description="The content of the message.")
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage] = Field(..., description="A list of chat messages in the conversation history.")
\ No newline at end of file
+    session_id: Optional[str] = Field(None, description="Server-side conversation session to continue. A new session is created when omitted.")
+    message: Optional[str] = Field(None, description="The new user message for the session.")
+    messages: Optional[List[ChatMessage]] = Field(None, description="Legacy: the full conversation history, resent on every turn.")
+
+    @model_validator(mode="after")
+    def check_message_or_history(self):
+        if self.message is None and not self.messages:
+            raise ValueError("Either `message` or a non-empty `messages` list is required.")
+        return self
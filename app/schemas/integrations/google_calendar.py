@@ -3,6 +3,10 @@ from datetime import datetime
 
 class GoogleCalendarAuthUrlResponse(BaseModel):
     auth_url: str
+
+class GoogleCalendarUnlinkResponse(BaseModel):
+    success: bool
+    message: str
  
 class GoogleCalendarTokenResponse(BaseModel):
     access_token: str
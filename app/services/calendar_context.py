@@ -0,0 +1,161 @@
+import json
+import math
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Only these fields are referenced by CALENDAR_SCHEDULE_PROMPT
+PROMPT_EVENT_FIELDS = ("summary", "start", "end", "location", "description")
+
+SIZE_BUCKETS = (0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+context_bytes_saved = metrics.histogram(
+    "calendar_context_bytes_saved",
+    "Bytes removed from the injected calendar context per request by projection and budgeting.",
+    buckets=SIZE_BUCKETS
+)
+context_tokens_saved = metrics.histogram(
+    "calendar_context_tokens_saved",
+    "Estimated prompt tokens removed from the injected calendar context per request.",
+    buckets=SIZE_BUCKETS
+)
+
+# Triggers that select their own window in `calendar_window`; anything else gets the default one
+WINDOW_TRIGGERS = ("today", "tomorrow", "this week", "next week")
+
+def _start_of_day(moment: datetime) -> datetime:
+    return datetime.combine(moment.date(), time.min, tzinfo=moment.tzinfo)
+
+def calendar_window(triggers: Iterable[str], tz: tzinfo, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    The time window a calendar question needs, from the intent triggers it matched.
+    "today", "tomorrow", "this week" and "next week" select their own window (weeks start on Monday)
+    and several of them widen to cover all; anything else gets the rest of today and tomorrow,
+    which is what CALENDAR_SCHEDULE_PROMPT looks at.
+    Args:
+        triggers: Triggers matched by the intent router.
+        tz: The user's calendar time zone; day and week boundaries are local.
+        now: Current time, for tests.
+    Returns:
+        (start, end) as aware datetimes; `start` is truncated to the minute.
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(tz).replace(second=0, microsecond=0)
+    today = _start_of_day(now)
+    tomorrow = today + timedelta(days=1)
+    next_monday = today + timedelta(days=7 - today.weekday())
+    windows = {
+        "today": (now, tomorrow),
+        "tomorrow": (tomorrow, tomorrow + timedelta(days=1)),
+        "this week": (now, next_monday),
+        "next week": (next_monday, next_monday + timedelta(days=7)),
+    }
+    selected = [windows[trigger] for trigger in set(triggers) if trigger in WINDOW_TRIGGERS]
+    if not selected:
+        return now, tomorrow + timedelta(days=1)
+    return min(start for start, _ in selected), max(end for _, end in selected)
+
+@dataclass
+class CalendarContext:
+    text: str
+    events_included: int
+    events_total: int
+    raw_bytes: int
+    compact_bytes: int
+    raw_tokens: int
+    compact_tokens: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.raw_bytes - self.compact_bytes
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.compact_tokens
+
+    @property
+    def truncated(self) -> bool:
+        return self.events_included < self.events_total
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Gemini models (~4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
+def _event_time(value: Optional[Dict[str, str]]) -> Optional[str]:
+    if not value:
+        return None
+    return value.get("dateTime") or value.get("date")
+
+def project_event(event: Dict[str, Any], max_description_chars: int) -> Dict[str, str]:
+    """
+    Reduces a Google Calendar event resource to the fields the prompt uses.
+    Times are flattened to their ISO string and long descriptions are truncated.
+    """
+    projected = {}
+    for key in PROMPT_EVENT_FIELDS:
+        value = event.get(key)
+        if key in ("start", "end"):
+            value = _event_time(value)
+        if not value:
+            continue
+        if key == "description":
+            value = " ".join(value.split())
+            if len(value) > max_description_chars:
+                value = value[:max_description_chars].rstrip() + "…"
+        projected[key] = value
+    return projected
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def build_calendar_context(
+    events: List[Dict[str, Any]],
+    token_budget: int = settings.CALENDAR_CONTEXT_TOKEN_BUDGET,
+    max_description_chars: int = settings.CALENDAR_CONTEXT_MAX_DESCRIPTION_CHARS,
+) -> CalendarContext:
+    """
+    Builds the compact calendar JSON injected into CALENDAR_SCHEDULE_PROMPT.
+    Events are kept in their given (chronological) order until the token budget is spent.
+    Args:
+        events: Raw Google Calendar event resources.
+        token_budget: Maximum estimated tokens for the serialized context.
+        max_description_chars: Descriptions longer than this are truncated.
+    Returns:
+        A CalendarContext with the serialized text and the bytes/tokens saved.
+    """
+    raw_text = json.dumps(events)
+
+    included = []
+    # Account for the enclosing brackets
+    used_tokens = estimate_tokens("[]")
+    for event in events:
+        serialized = _compact_json(project_event(event, max_description_chars))
+        # +1 for the separating comma
+        cost = estimate_tokens(serialized) + 1
+        if used_tokens + cost > token_budget:
+            break
+        included.append(serialized)
+        used_tokens += cost
+
+    text = "[" + ",".join(included) + "]"
+    context = CalendarContext(
+        text=text,
+        events_included=len(included),
+        events_total=len(events),
+        raw_bytes=len(raw_text.encode("utf-8")),
+        compact_bytes=len(text.encode("utf-8")),
+        raw_tokens=estimate_tokens(raw_text),
+        compact_tokens=estimate_tokens(text),
+    )
+    context_bytes_saved.observe(context.bytes_saved)
+    context_tokens_saved.observe(context.tokens_saved)
+    return context
+
+def describe_events(events: List[Dict[str, Any]]) -> str:
+    """The `calendar_info` for CALENDAR_SCHEDULE_PROMPT: the compact event JSON, or a note that there is none."""
+    if not events:
+        return "No events found on your Google Calendar for the requested period."
+    # Project events to the fields the prompt uses, within the context token budget
+    return build_calendar_context(events).text
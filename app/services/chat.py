@@ -1,85 +1,211 @@
+import logging
 import json
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from fastapi import HTTPException
-import google.generativeai as genai
 
 from app.core.config import settings
+from app.core.pipeline import Pipeline, PipelineRun, Stage
 from app.schemas.chat import ChatMessage
-from app.core.prompts import CALENDAR_SCHEDULE_PROMPT
-from app.services.integrations.google_calendar import get_google_calendar_events, get_google_credentials
+from app.services.llm import gemini_client, to_gemini_content
+from app.services.sessions import ConversationSession, session_store
+from app.services.response_cache import response_cache, response_cache_key, ttl_until_next_event_boundary
+from app.core.prompts import CALENDAR_REQUEST_PROMPT, CALENDAR_SCHEDULE_PROMPT
+from app.services.calendar_context import WINDOW_TRIGGERS, calendar_window, describe_events
+from app.services.digests import schedule_digests
+from app.services.schedule_renderer import stream_rendered_schedule
+from app.services.intents import CALENDAR_INTENT, GREETING_INTENT, intent_router, is_calendar_action
+from app.services.integrations.google_calendar import (
+    get_google_calendar_events,
+    get_google_calendar_time_zone,
+    get_google_credentials,
+)
+
+logger = logging.getLogger(__name__)
 
 def is_greeting_or_calendar_query(query: str) -> bool:
     """
     Checks if the query is a greeting or a general calendar-related question.
     """
-    normalized_query = query.lower()
-    greetings = ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"]
-    calendar_keywords = ["calendar", "schedule", "events", "what's on", "what is on", "appointments", "today", "tomorrow", "this week", "next week"]
-
-    if any(greeting in normalized_query for greeting in greetings):
-        return True
-    
-    # Check for general calendar queries (excluding specific date/time questions that LLM should handle)
-    if any(keyword in normalized_query for keyword in calendar_keywords):
-        return True
-        
-    return False
+    top = intent_router.top_intent(query)
+    return top is not None and top.intent in (GREETING_INTENT, CALENDAR_INTENT)
+
+def calendar_error_message(preparation: PipelineRun) -> str:
+    """Describes why calendar data is missing, so the model can tell the user."""
+    failed = next(
+        result for result in (
+            preparation.results["credentials"], preparation.results["time_zone"], preparation.results["calendar"]
+        )
+        if not result.ok and result.status != "skipped"
+    )
+    if failed.status == "timeout":
+        return "Calendar data is temporarily unavailable. Answer without it."
+    if isinstance(failed.error, HTTPException):
+        return f"Error fetching calendar events: {failed.error.detail}"
+    return f"An unexpected error occurred while fetching calendar events: {failed.error}"
 
-async def generate_chat_response(messages: list[ChatMessage], current_user: str) -> AsyncGenerator[str, None]:
+async def generate_chat_text(
+    messages: list[ChatMessage],
+    current_user: str,
+    session: Optional[ConversationSession] = None
+) -> AsyncGenerator[str, None]:
     """
-    Generates a streaming chat response using the Gemini 1.5 Flash model.
+    Generates a streaming chat reply using the Gemini 1.5 Flash model.
     Args:
         messages: A list of chat messages, each with 'role' and 'content'.
+        session: Optional server-side session; the new user message and the reply are appended to it once the reply completes.
     Yields:
-        Chunks of the streamed response content.
+        Raw text chunks of the reply, unframed.
+    Raises:
+        Exception: Any error from the model; the session is left unchanged.
     """
-    genai.configure(api_key=settings.GOOGLE_API_KEY)
-    model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
-
-    # Convert messages to the format expected by start_chat
-    # Note: Gemini API typically expects alternating roles, starting with 'user'.
-    chat_history = []
-    # All messages except the last one are history
-    for msg in messages[:-1]:
-        chat_history.append({
-            'role': msg.role,
-            'parts': [{'text': msg.content}]
-        })
-
     # Get the last message
     last_message = messages[-1]
     last_message_content = last_message.content
+    is_calendar_query = is_greeting_or_calendar_query(last_message_content)
+    calendar_triggers = next(
+        (match.triggers for match in intent_router.route(last_message_content) if match.intent == CALENDAR_INTENT),
+        ()
+    )
+
+    # Greetings and schedule questions without a specific window get the rest of today and tomorrow
+    default_window = is_calendar_query and not set(calendar_triggers) & set(WINDOW_TRIGGERS)
+    # Only a request to see the schedule is answered with the schedule itself; one to act on it,
+    # e.g. "help me schedule a meeting with Sam tomorrow", goes to the model with the events as context
+    is_schedule_lookup = is_calendar_query and not is_calendar_action(last_message_content)
+    renders_schedule = settings.SCHEDULE_RENDERER_ENABLED and is_schedule_lookup and current_user
+
+    # A greeting that opens a conversation asks for the default window, which the background digest answers
+    if settings.DIGESTS_ENABLED and default_window and is_schedule_lookup and current_user and len(messages) == 1:
+        digest = await schedule_digests.lookup(current_user)
+        if digest is not None:
+            yield digest.text
+            if session is not None:
+                await session_store.append(session, [
+                    ChatMessage(role='user', content=last_message.content),
+                    ChatMessage(role='assistant', content=digest.text),
+                ])
+            return
+
+    async def convert_history(_):
+        # Convert messages to the Gemini content format
+        # Note: Gemini API typically expects alternating roles, starting with 'user'.
+        # All messages except the last one are history
+        return [to_gemini_content(msg.role, msg.content) for msg in messages[:-1]]
+
+    async def fetch_credentials(_):
+        return await get_google_credentials(current_user)
+
+    async def fetch_time_zone(deps):
+        return await get_google_calendar_time_zone(current_user, deps["credentials"])
+
+    async def fetch_events(deps):
+        # Only fetch the window the question is about, e.g. "tomorrow" or "next week"
+        time_min, time_max = calendar_window(calendar_triggers, deps["time_zone"])
+        # A failed fetch fails the stage, so the reply explains it instead of reporting a free calendar
+        return await get_google_calendar_events(
+            current_user, deps["credentials"], time_min=time_min, time_max=time_max, max_results=None,
+            raise_errors=True
+        )
+
+    # Independent stages run concurrently, each bounded by its own deadline
+    stages = [Stage("history", convert_history)]
+    if is_calendar_query and current_user:
+        stages += [
+            Stage("credentials", fetch_credentials, timeout=settings.CHAT_CREDENTIALS_TIMEOUT_SECONDS),
+            Stage("time_zone", fetch_time_zone, depends_on=("credentials",), timeout=settings.CHAT_CALENDAR_TIMEOUT_SECONDS),
+            Stage(
+                "calendar", fetch_events,
+                depends_on=("credentials", "time_zone"), timeout=settings.CHAT_CALENDAR_TIMEOUT_SECONDS
+            ),
+        ]
+    preparation = await Pipeline("chat_preparation", stages).run()
+    chat_history = preparation.value("history")
+
+    # The server formats the schedule itself, but only from a successful fetch: a failed one fails the
+    # calendar stage (see fetch_events) and the model explains what went wrong
+    if renders_schedule and preparation.results["calendar"].ok:
+        reply_parts = []
+        async for chunk in stream_rendered_schedule(
+            preparation.value("calendar"), preparation.value("time_zone"), calendar_triggers
+        ):
+            reply_parts.append(chunk)
+            yield chunk
+        if session is not None:
+            await session_store.append(session, [
+                ChatMessage(role='user', content=last_message.content),
+                ChatMessage(role='assistant', content="".join(reply_parts)),
+            ])
+        return
+
+    # Set only when the prompt is built from successfully fetched calendar data, which makes the reply
+    # cacheable; a reply explaining a failed fetch must not be served again once Google recovers
+    cache_key = None
+    cache_ttl = None
 
     # Check if the last message is a greeting or general calendar query
-    if is_greeting_or_calendar_query(last_message_content):
+    if is_calendar_query:
         calendar_info = ""
         if current_user:
-            try:
-                credentials = await get_google_credentials(current_user)
-                # TODO: Fileter based on time
-                # today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                # today_end = today_start + timedelta(days=1)
-                events = await get_google_calendar_events(credentials)
-                if events is None or len(events) == 0:
-                    calendar_info = "No events found on your Google Calendar for today."
-                calendar_info = json.dumps(events)
-            except HTTPException as e:
-                calendar_info = f"Error fetching calendar events: {e.detail}"
-            except Exception as e:
-                calendar_info = f"An unexpected error occurred while fetching calendar events: {e}"
+            calendar = preparation.results["calendar"]
+            if calendar.ok:
+                events = calendar.value
+                calendar_info = describe_events(events)
+                cache_ttl = ttl_until_next_event_boundary(events, tz=preparation.value("time_zone"))
+            else:
+                calendar_info = calendar_error_message(preparation)
         else:
             calendar_info = "User not authenticated. Please log in to fetch calendar events."
         
         # Override last_message_content with the generated calendar query
-        last_message_content = CALENDAR_SCHEDULE_PROMPT.format(calendar_info=calendar_info)
-    try:
-        # Create the chat session
-        chat = model.start_chat(history=chat_history)
+        if is_schedule_lookup:
+            last_message_content = CALENDAR_SCHEDULE_PROMPT.format(calendar_info=calendar_info)
+        else:
+            last_message_content = CALENDAR_REQUEST_PROMPT.format(calendar_info=calendar_info, request=last_message.content)
+        if cache_ttl is not None:
+            cache_key = response_cache_key(current_user, gemini_client.model, chat_history, last_message_content)
+
+    cached_reply = response_cache.get(cache_key) if cache_key else None
+    if cached_reply is not None:
+        # Replay the cached answer chunk by chunk, like a live stream
+        for chunk in cached_reply:
+            yield chunk
+        reply_parts = cached_reply
+    else:
+        response_chunks = gemini_client.stream_chat(chat_history, last_message_content)
+        reply_parts = []
+        try:
+            async for chunk in response_chunks:
+                reply_parts.append(chunk)
+                yield chunk
+        finally:
+            # Stops upstream generation if the client went away mid-stream
+            await response_chunks.aclose()
 
-        # Send the last message
-        response_chunks = chat.send_message(last_message_content, stream=True)
-        for chunk in response_chunks:
-            yield f"{json.dumps({'content': chunk.text})}\n\n"
+        if cache_key:
+            response_cache.set(cache_key, reply_parts, ttl=cache_ttl)
+
+    if session is not None:
+        # Store the user's original message, not the calendar prompt it may have been expanded into
+        await session_store.append(session, [
+            ChatMessage(role='user', content=last_message.content),
+            ChatMessage(role='assistant', content="".join(reply_parts)),
+        ])
+
+async def generate_chat_response(
+    messages: list[ChatMessage],
+    current_user: str,
+    session: Optional[ConversationSession] = None
+) -> AsyncGenerator[str, None]:
+    """
+    Streams a chat reply in the plain-text framing: one `{"content": ...}` JSON object per chunk,
+    separated by blank lines. Errors are reported in-band as a final content frame.
+    """
+    chunks = generate_chat_text(messages, current_user, session)
+    try:
+        async for chunk in chunks:
+            yield f"{json.dumps({'content': chunk})}\n\n"
     except Exception as e:
-        print(f"Error generating content from Gemini: {e}")
-        yield f"{json.dumps({'content': f'Error: {e}'})}\n\n" 
\ No newline at end of file
+        logger.exception("Error generating content from Gemini", extra={"user_id": current_user})
+        yield f"{json.dumps({'content': f'Error: {e}'})}\n\n"
+    finally:
+        await chunks.aclose()
@@ -0,0 +1,234 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from app.core.admission import AdmissionTicket
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.sse import HEARTBEAT, coalesce, format_event
+
+logger = logging.getLogger(__name__)
+
+stream_resumes = metrics.counter(
+    "chat_stream_resumes_total",
+    "Reconnects carrying a Last-Event-ID, by whether the stream could be resumed from this worker's replay buffer.",
+    labels=("outcome",)
+)
+stream_events = metrics.counter(
+    "chat_stream_events_total",
+    "Content events published on chat event streams, after coalescing model chunks."
+)
+
+class ChatStream:
+    """
+    One generation, decoupled from the connection that started it.
+    The reply is produced in a background task into an append-only list of formatted
+    events; any number of connections follow it, each from its own position.
+    The producer only runs a bounded number of events ahead of the furthest follower, so a slow
+    or absent client slows generation down instead of growing the buffer.
+    """
+
+    def __init__(self, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.events: List[str] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        # Events sent by the furthest follower so far
+        self.delivered = 0
+        self._changed = asyncio.Event()
+        self._demand = asyncio.Event()
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    def publish(self, data: Dict[str, Any], event: Optional[str] = None) -> None:
+        self.events.append(format_event(json.dumps(data), id=self.event_id(len(self.events)), event=event))
+        self._notify()
+
+    def finish(self) -> None:
+        if not self.done:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _delivered(self, count: int) -> None:
+        if count > self.delivered:
+            self.delivered = count
+            self._demand.set()
+
+    async def wait_for_reader(self, max_unread: int) -> None:
+        """Waits until fewer than `max_unread` published events are still unsent to every follower."""
+        while len(self.events) - self.delivered >= max_unread:
+            self._demand.clear()
+            await self._demand.wait()
+
+    async def follow(self, after: int, heartbeat: float, resume_grace: float) -> AsyncGenerator[str, None]:
+        """
+        Yields the events after sequence number `after`, then new ones as they are published,
+        with a keepalive comment whenever the stream has been idle for `heartbeat` seconds.
+        When the last follower leaves an unfinished stream, generation continues for
+        `resume_grace` seconds so a reconnect can pick it up, then is cancelled.
+        """
+        self.subscribers += 1
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        index = after + 1
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    # Resumed only once the response asks for the next event, i.e. this one was sent
+                    index += 1
+                    self._delivered(index)
+                if self.done:
+                    return
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.abandon_later(resume_grace)
+
+    def abandon_later(self, delay: float) -> None:
+        """Cancels generation after `delay` seconds unless a follower connects in the meantime."""
+        self._abandon_handle = asyncio.get_running_loop().call_later(delay, self._cancel_if_abandoned)
+
+    def _cancel_if_abandoned(self) -> None:
+        self._abandon_handle = None
+        if self.subscribers == 0 and self.task is not None and not self.task.done():
+            self.task.cancel()
+
+def parse_event_id(value: str) -> Optional[Tuple[str, int]]:
+    """Splits a `Last-Event-ID` of the form "<stream id>:<sequence>"."""
+    stream_id, _, seq = value.strip().rpartition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+class ChatStreamRegistry:
+    """
+    Short-lived replay buffer of recent chat streams, so a client that drops mid-reply can
+    reconnect with `Last-Event-ID` and resume without the reply being generated again.
+    Finished streams are kept for `ttl` seconds; at most `max_streams` finished ones are kept.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_streams: int,
+        heartbeat: float,
+        resume_grace: float,
+        coalesce_max_chars: int,
+        coalesce_max_delay: float,
+        max_unread: int,
+    ):
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self.heartbeat = heartbeat
+        self.resume_grace = resume_grace
+        self.coalesce_max_chars = coalesce_max_chars
+        self.coalesce_max_delay = coalesce_max_delay
+        self.max_unread = max_unread
+        self._streams: "OrderedDict[str, ChatStream]" = OrderedDict()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        finished = [stream for stream in self._streams.values() if stream.done]
+        excess = len(finished) - self.max_streams
+        for stream in finished:
+            # Oldest first, since streams are kept in creation order
+            if excess > 0 or now - stream.finished_at >= self.ttl:
+                self._streams.pop(stream.id, None)
+                excess -= 1
+
+    def start(self, user_id: str, chunks: AsyncGenerator[str, None], ticket: AdmissionTicket) -> ChatStream:
+        """
+        Starts generating into a new stream. The admission ticket is held until generation ends,
+        whether or not anyone is still connected.
+        """
+        self._purge()
+        stream = ChatStream(user_id)
+        stream.task = asyncio.create_task(self._produce(stream, chunks))
+        # Runs even if the task is cancelled before it first runs, when its finally block would not
+        stream.task.add_done_callback(lambda _: ticket.release())
+        # A stream nobody ever follows would wait for a reader forever
+        stream.abandon_later(self.resume_grace)
+        self._streams[stream.id] = stream
+        return stream
+
+    async def _produce(self, stream: ChatStream, chunks: AsyncGenerator[str, None]) -> None:
+        merged = coalesce(chunks, self.coalesce_max_chars, self.coalesce_max_delay)
+        try:
+            async for text in merged:
+                stream_events.inc()
+                stream.publish({"content": text})
+                # Stop pulling from the model while no connection keeps up
+                await stream.wait_for_reader(self.max_unread)
+            stream.publish({}, event="done")
+        except asyncio.CancelledError:
+            logger.info("Chat stream abandoned, generation cancelled", extra={"user_id": stream.user_id})
+            raise
+        except Exception as e:
+            logger.exception("Error generating content from Gemini", extra={"user_id": stream.user_id})
+            stream.publish({"message": str(e)}, event="error")
+        finally:
+            try:
+                await merged.aclose()
+                await chunks.aclose()
+            finally:
+                stream.finish()
+
+    def get(self, stream_id: str, user_id: str) -> Optional[ChatStream]:
+        self._purge()
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.user_id != user_id:
+            return None
+        return stream
+
+    def follow(self, stream: ChatStream, after: int = -1) -> AsyncGenerator[str, None]:
+        return stream.follow(after, self.heartbeat, self.resume_grace)
+
+    def resume(self, last_event_id: str, user_id: str) -> Optional[AsyncGenerator[str, None]]:
+        """
+        Returns the events after `last_event_id` for a reconnecting client,
+        or None if the stream is unknown, expired, or belongs to another user.
+        """
+        parsed = parse_event_id(last_event_id)
+        stream = self.get(parsed[0], user_id) if parsed else None
+        if stream is None:
+            stream_resumes.inc(outcome="expired")
+            return None
+        stream_resumes.inc(outcome="resumed")
+        return self.follow(stream, after=parsed[1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": len(self._streams),
+            "active": sum(not stream.done for stream in self._streams.values()),
+        }
+
+chat_streams = ChatStreamRegistry(
+    ttl=settings.SSE_REPLAY_TTL_SECONDS,
+    max_streams=settings.SSE_REPLAY_MAX_STREAMS,
+    heartbeat=settings.SSE_HEARTBEAT_SECONDS,
+    resume_grace=settings.SSE_RESUME_GRACE_SECONDS,
+    coalesce_max_chars=settings.SSE_COALESCE_MAX_CHARS,
+    coalesce_max_delay=settings.SSE_COALESCE_MAX_DELAY_SECONDS,
+    max_unread=settings.SSE_MAX_UNREAD_EVENTS,
+)
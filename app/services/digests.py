@@ -0,0 +1,339 @@
+import json
+import time
+import heapq
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import contextlib
+from dataclasses import dataclass, field
+from datetime import datetime, time as day_time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.prompts import CALENDAR_SCHEDULE_PROMPT
+from app.services.calendar_context import calendar_window, describe_events
+from app.services.llm import gemini_client
+from app.services.schedule_renderer import stream_rendered_schedule
+from app.services.integrations.google_calendar import get_google_calendar_time_zone, get_google_credentials
+from app.services.integrations.google_calendar_store import calendar_event_store, event_bounds
+from app.services.integrations.google_calendar_watch import google_calendar_watcher
+from app.services.integrations.google_token_refresher import google_token_refresher
+
+logger = logging.getLogger(__name__)
+
+digest_lookups = metrics.counter(
+    "schedule_digest_lookups_total",
+    "Greetings looked up in the precomputed schedule digests, by outcome.",
+    labels=("outcome",)
+)
+digest_generations = metrics.counter(
+    "schedule_digest_generations_total",
+    "Schedule digest refreshes, by whether the LLM had to run again.",
+    labels=("outcome",)
+)
+
+# Written in place of a model name when the digest comes from the schedule renderer
+RENDERER_SOURCE = "schedule_renderer"
+
+def digest_source() -> str:
+    """
+    What writes digests under the current settings: the schedule renderer, with or without a model-written
+    note, or the model alone. Digests written under other settings are not served.
+    """
+    if not settings.SCHEDULE_RENDERER_ENABLED:
+        return gemini_client.model
+    if settings.SCHEDULE_RENDERER_LLM_GREETING:
+        return f"{RENDERER_SOURCE}+{gemini_client.model}"
+    return RENDERER_SOURCE
+
+@dataclass
+class ScheduleDigest:
+    """
+    The reply to CALENDAR_SCHEDULE_PROMPT for one user's default window (rest of today and tomorrow),
+    valid until the next event ends or the user's local day ends, whichever comes first.
+    """
+    user_id: str
+    text: str
+    # The `digest_source` that wrote it
+    model: str
+    # Digest of the prompt it answers, so an unchanged calendar does not cost another LLM call
+    prompt_hash: str
+    computed_at: float
+    valid_until: float
+
+class SQLiteDigestBackend:
+    """Digests shared by the workers on a host. Calls are blocking and are run off the event loop."""
+
+    COLUMNS = "user_id, text, model, prompt_hash, computed_at, valid_until"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS digests (
+                    user_id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    computed_at REAL NOT NULL,
+                    valid_until REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def get(self, user_id: str) -> Optional[ScheduleDigest]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {self.COLUMNS} FROM digests WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return ScheduleDigest(*row) if row else None
+
+    def put(self, digest: ScheduleDigest) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO digests ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest.user_id, digest.text, digest.model, digest.prompt_hash, digest.computed_at, digest.valid_until)
+            )
+            conn.commit()
+
+    def expire(self, user_id: str) -> None:
+        """Stops serving a digest but keeps it, so an unchanged prompt does not cost another LLM call."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE digests SET valid_until = 0 WHERE user_id = ?", (user_id,))
+            conn.commit()
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM digests WHERE user_id = ?", (user_id,))
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+@dataclass(order=True)
+class _ScheduledDigest:
+    due_at: float
+    user_id: str = field(compare=False)
+    version: int = field(compare=False)
+
+def digest_valid_until(events: List[Dict[str, Any]], now: datetime, tz) -> datetime:
+    """
+    When a "remaining today" answer stops being accurate: the next event end (events in progress
+    are listed until they end, so starts do not change it), or local midnight.
+    """
+    local_now = now.astimezone(tz)
+    until = datetime.combine(local_now.date() + timedelta(days=1), day_time.min, tzinfo=tz)
+    for event in events:
+        end = event_bounds(event, tz)[1]
+        if end is not None and now < end < until:
+            until = end
+    return until
+
+class ScheduleDigestService:
+    """
+    Precomputes each linked user's schedule digest in the background, so a greeting can be
+    answered without touching Supabase, Google or the LLM on the request path.
+
+    One worker per host schedules users on a heap, like the token refresher: each user is due
+    again when their digest expires (in their own time zone), every `refresh_interval` as a
+    check for calendar changes, and right away when a push notification reports a change.
+    Refreshes run on a bounded worker pool; the LLM only runs when the prompt changed.
+    While the schedule renderer is enabled the digest is its output, so greetings skip the
+    calendar fetch as well and read exactly as a live rendered reply would.
+    Every worker serves digests from the shared table.
+    """
+
+    def __init__(self, backend: SQLiteDigestBackend, workers: int, refresh_interval: float):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+        self._semaphore = asyncio.Semaphore(workers)
+        self._heap: List[_ScheduledDigest] = []
+        self._versions: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Set[asyncio.Task] = set()
+        self.generated = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    async def lookup(self, user_id: str) -> Optional[ScheduleDigest]:
+        """Returns the user's digest if it is still valid and was written under the current settings."""
+        digest = await asyncio.to_thread(self.backend.get, user_id)
+        if digest is None:
+            digest_lookups.inc(outcome="miss")
+            return None
+        if digest.valid_until <= time.time() or digest.model != digest_source():
+            digest_lookups.inc(outcome="expired")
+            return None
+        digest_lookups.inc(outcome="hit")
+        return digest
+
+    def schedule(self, user_id: str, due_at: float) -> None:
+        version = self._versions.get(user_id, -1) + 1
+        self._versions[user_id] = version
+        heapq.heappush(self._heap, _ScheduledDigest(due_at=due_at, user_id=user_id, version=version))
+        self._wakeup.set()
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Stops serving the user's digest and, in the worker running the scheduler, recomputes it now.
+        Used as a listener for calendar change notifications.
+        """
+        self._spawn(asyncio.to_thread(self.backend.expire, user_id))
+        if self._tasks:
+            self.schedule(user_id, time.time())
+
+    def forget(self, user_id: str) -> None:
+        """Drops a user entirely, e.g. after unlinking."""
+        self._versions.pop(user_id, None)
+        self._spawn(asyncio.to_thread(self.backend.delete, user_id))
+
+    async def refresh(self, user_id: str) -> float:
+        """
+        Recomputes the user's digest if the calendar or the source changed since it was written.
+        Returns:
+            When the digest expires (unix time).
+        """
+        credentials = await get_google_credentials(user_id)
+        tz = await get_google_calendar_time_zone(user_id, credentials)
+        now = datetime.now(timezone.utc)
+        time_min, time_max = calendar_window((), tz, now)
+        token_before, refresh_token_before = credentials.token, credentials.refresh_token
+        # Straight from the store: a failed fetch must not be mistaken for an empty calendar
+        events = await calendar_event_store.get_events(user_id, credentials, time_min=time_min, time_max=time_max)
+        if credentials.token != token_before:
+            google_token_refresher.record_refreshed(user_id, credentials, refresh_token_before)
+        source = digest_source()
+        if settings.SCHEDULE_RENDERER_ENABLED:
+            # The renderer sees every event, not just the ones that fit the prompt's context budget
+            prompt = None
+            rendered_from = json.dumps(events, sort_keys=True)
+        else:
+            prompt = rendered_from = CALENDAR_SCHEDULE_PROMPT.format(calendar_info=describe_events(events))
+        # The local date is part of the answer ("Remaining Today – Monday, ...")
+        prompt_hash = hashlib.sha256(f"{time_min.date().isoformat()}\n{rendered_from}".encode("utf-8")).hexdigest()
+        valid_until = digest_valid_until(events, now, tz).timestamp()
+
+        current = await asyncio.to_thread(self.backend.get, user_id)
+        if current is not None and current.prompt_hash == prompt_hash and current.model == source:
+            self.unchanged += 1
+            digest_generations.inc(outcome="unchanged")
+            if current.valid_until != valid_until:
+                current.valid_until = valid_until
+                await asyncio.to_thread(self.backend.put, current)
+            return valid_until
+
+        if prompt is None:
+            chunks = stream_rendered_schedule(events, tz)
+        else:
+            chunks = gemini_client.stream_chat([], prompt)
+        try:
+            text = "".join([chunk async for chunk in chunks])
+        finally:
+            await chunks.aclose()
+        await asyncio.to_thread(self.backend.put, ScheduleDigest(
+            user_id=user_id,
+            text=text,
+            model=source,
+            prompt_hash=prompt_hash,
+            computed_at=time.time(),
+            valid_until=valid_until,
+        ))
+        self.generated += 1
+        digest_generations.inc(outcome="generated")
+        return valid_until
+
+    async def _refresh(self, user_id: str, version: int) -> None:
+        async with self._semaphore:
+            # Superseded while queued for a worker
+            if self._versions.get(user_id) != version:
+                return
+            try:
+                valid_until = await self.refresh(user_id)
+            except HTTPException:
+                # The Google account is no longer linked
+                self.forget(user_id)
+                return
+            except Exception as e:
+                self.failed += 1
+                digest_generations.inc(outcome="failed")
+                logger.warning("Error computing schedule digest", extra={"user_id": user_id, "error": str(e)})
+                valid_until = None
+        if self._versions.get(user_id) == version:
+            next_check = time.time() + self.refresh_interval
+            self.schedule(user_id, min(valid_until, next_check) if valid_until else next_check)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0].due_at <= now:
+                entry = heapq.heappop(self._heap)
+                if self._versions.get(entry.user_id) == entry.version:
+                    self._spawn(self._refresh(entry.user_id, entry.version))
+            timeout = self._heap[0].due_at - now if self._heap else None
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    async def _discover_loop(self) -> None:
+        # Linked users are found by the token refresher; start scheduling the ones seen since the last pass
+        while True:
+            for user_id in google_token_refresher.tracked_users():
+                if user_id not in self._versions:
+                    self.schedule(user_id, time.time())
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._discover_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, *self._in_flight]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._in_flight, return_exceptions=True)
+        self._tasks = []
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._tasks),
+            "scheduled_users": len(self._versions),
+            "generated": self.generated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+        }
+
+schedule_digests = ScheduleDigestService(
+    backend=SQLiteDigestBackend(settings.DIGEST_DB_PATH),
+    workers=settings.DIGEST_WORKERS,
+    refresh_interval=settings.DIGEST_REFRESH_SECONDS,
+)
+
+google_calendar_watcher.subscribe(schedule_digests.invalidate)
@@ -1,12 +1,31 @@
-from typing import Dict, Any
+import logging
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
 from datetime import datetime, timezone
 
+from fastapi import HTTPException
+
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.schemas.integrations.core import IntegrationStatus
+from app.services.users import get_user_metadata
+from app.services.integrations.google_calendar import get_google_credentials
+from app.services.integrations.google_calendar_client import GoogleCalendarAPIError, google_calendar_client
+from app.services.integrations.google_token_refresher import google_token_refresher
+
+logger = logging.getLogger(__name__)
+
+StatusCheck = Callable[[str, Dict[str, Any]], Awaitable[IntegrationStatus]]
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
 
-async def check_google_calendar_integration_status(user_metadata: Dict[str, Any]) -> IntegrationStatus:
+async def check_google_calendar_integration_status(user_id: str, user_metadata: Dict[str, Any]) -> IntegrationStatus:
     """
-    Checks the status of the Google Calendar integration based on user metadata.
+    Checks the status of the Google Calendar integration.
+    When a refresh token is present, a cheap live call to Google confirms it has not been revoked.
     Args:
+        user_id: The Supabase user ID.
         user_metadata: The user's metadata dictionary from Supabase.
     Returns:
         An IntegrationStatus object for Google Calendar.
@@ -19,12 +38,84 @@ async def check_google_calendar_integration_status(user_metadata: Dict[str, Any]
 
     if google_refresh_token:
         is_connected = True
+        try:
+            credentials = await get_google_credentials(user_id)
+            token_before, refresh_token_before = credentials.token, credentials.refresh_token
+            await asyncio.wait_for(
+                google_calendar_client.get_calendar(credentials),
+                settings.INTEGRATION_STATUS_PROBE_TIMEOUT_SECONDS
+            )
+            if credentials.token != token_before:
+                google_token_refresher.record_refreshed(user_id, credentials, refresh_token_before)
+        except GoogleCalendarAPIError as e:
+            # A 403 for a rate limit or quota is transient and falls through to the generic message below
+            if e.status_code in (400, 401, 403) and not e.rate_limited:
+                # invalid_grant / unauthorized: the user revoked access or the scope is gone
+                is_connected = False
+                error_message = "Google Calendar access was revoked. Please re-link your account."
+            else:
+                error_message = f"Could not verify the Google Calendar connection: {e.message}"
+        except HTTPException as e:
+            is_connected = False
+            error_message = e.detail
+        except Exception:
+            # Timeouts and network errors say nothing about the token itself
+            error_message = "Could not verify the Google Calendar connection right now."
     else:
         error_message = "Missing Google Calendar refresh token. Please re-link your account."
 
     return IntegrationStatus(
         is_connected=is_connected,
-        last_checked_at=datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        last_checked_at=_now_iso(),
         error_message=error_message,
         linked_google_calendar_email=linked_google_calendar_email
-    ) 
\ No newline at end of file
+    )
+
+# Registry of integration status check functions
+# Add new integration check functions here as you create them
+INTEGRATION_STATUS_CHECKS: Dict[str, StatusCheck] = {
+    "google_calendar": check_google_calendar_integration_status,
+    # "microsoft_calendar": check_microsoft_calendar_integration_status, # Example for future
+    # "slack": check_slack_integration_status, # Example for future
+}
+
+integration_status_cache: TTLCache[Dict[str, IntegrationStatus]] = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    default_ttl=settings.INTEGRATION_STATUS_CACHE_TTL_SECONDS,
+    name="integration_status"
+)
+
+async def _run_check(name: str, check: StatusCheck, user_id: str, user_metadata: Dict[str, Any]) -> IntegrationStatus:
+    try:
+        return await asyncio.wait_for(check(user_id, user_metadata), settings.INTEGRATION_STATUS_CHECK_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        error_message = "Status check timed out."
+    except Exception as e:
+        logger.warning("Integration status check failed", extra={"integration": name, "user_id": user_id, "error": str(e)})
+        error_message = f"Status check failed: {e}"
+    return IntegrationStatus(is_connected=False, last_checked_at=_now_iso(), error_message=error_message)
+
+async def get_integration_statuses(user_id: str) -> Dict[str, IntegrationStatus]:
+    """
+    Runs all registered status checks concurrently, each with its own timeout.
+    Results are cached per user so frequent polling does not probe providers every time.
+    Args:
+        user_id: The Supabase user ID.
+    Returns:
+        A mapping of integration name to its IntegrationStatus.
+    """
+    cached = integration_status_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user_metadata = await get_user_metadata(user_id)
+    names = list(INTEGRATION_STATUS_CHECKS)
+    results = await asyncio.gather(
+        *(_run_check(name, INTEGRATION_STATUS_CHECKS[name], user_id, user_metadata) for name in names)
+    )
+    statuses = dict(zip(names, results))
+    integration_status_cache.set(user_id, statuses)
+    return statuses
+
+def invalidate_integration_status(user_id: str) -> None:
+    integration_status_cache.invalidate(user_id)
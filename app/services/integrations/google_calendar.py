@@ -1,11 +1,28 @@
-from datetime import datetime
+import logging
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 from fastapi import HTTPException
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.db.supabase_client import supabase
+from app.core.singleflight import SingleFlight
+from app.services.integrations.google_calendar_store import calendar_event_store
+from app.services.integrations.google_token_refresher import google_token_refresher
+from app.services.users import (
+    get_user_metadata,
+    invalidate_user_metadata,
+    seconds_until_token_expiry,
+    token_expiry_from_metadata,
+)
+
+if TYPE_CHECKING:
+    # The Google auth libraries load on first use: the OAuth flow only when an account is linked,
+    # credentials on the first calendar request (or the lifespan preload)
+    from google_auth_oauthlib.flow import Flow
+    from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
 
 # Google Calendar API scope
 SCOPES = [
@@ -14,49 +31,103 @@ SCOPES = [
     'openid'
 ]
 
-async def get_google_calendar_events(credentials: Credentials):
+calendar_fetch_flight = SingleFlight("google_calendar_events")
+
+credentials_cache: TTLCache["Credentials"] = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    default_ttl=settings.USER_CACHE_TTL_SECONDS,
+    name="google_credentials"
+)
+
+def _record_token_change(user_id: str, credentials: "Credentials", before: Tuple[Optional[str], str]) -> None:
+    # The client refreshed an expired token on the request path; persist it so later requests reuse it
+    token_before, refresh_token_before = before
+    if credentials.token != token_before:
+        google_token_refresher.record_refreshed(user_id, credentials, refresh_token_before)
+
+async def get_google_calendar_events(
+    user_id: str,
+    credentials: "Credentials",
+    time_min: Optional[datetime] = None,
+    time_max: Optional[datetime] = None,
+    max_results: Optional[int] = 10,
+    raise_errors: bool = False,
+):
     """
-    Fetches events from the user's Google Calendar.
+    Fetches events from all of the user's selected Google Calendars, ordered by start time.
+    Events are read from the local event store, which only asks Google for deltas when a sync is due.
     Args:
+        user_id: The ID of the user whose events to fetch.
         credentials: Google OAuth2 credentials object.
+        time_min: Start of the time window (aware); defaults to now.
+        time_max: End of the time window (aware); defaults to the end of the synced range.
+        max_results: Maximum number of events to return; None returns the whole window.
+        raise_errors: Re-raise a failed fetch instead of returning no events, for callers that
+            must not mistake a failure for an empty calendar.
     Returns:
         A list of calendar events.
     """
+    before = (credentials.token, credentials.refresh_token)
     try:
-        service = build('calendar', 'v3', credentials=credentials)
-
-        now = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
-        events_result = service.events().list(calendarId='primary', timeMin=now,
-                                                maxResults=10, singleEvents=True,
-                                                orderBy='startTime').execute()
-        events = events_result.get('items', [])
-
-        return events
+        # Concurrent identical fetches for the same user share one in-flight call
+        return await calendar_fetch_flight.do(
+            (user_id, time_min, time_max, max_results),
+            lambda: calendar_event_store.get_events(
+                user_id, credentials, time_min=time_min, time_max=time_max, max_results=max_results
+            )
+        )
 
-    except Exception as e:
-        print(f"Error fetching Google Calendar events: {e}")
+    except Exception:
+        logger.exception("Error fetching Google Calendar events", extra={"user_id": user_id})
+        if raise_errors:
+            raise
         # In a real application, you might want to re-raise a specific exception
         # or return an error status.
         return []
+    finally:
+        _record_token_change(user_id, credentials, before)
+
+async def get_google_calendar_time_zone(user_id: str, credentials: "Credentials") -> tzinfo:
+    """
+    The time zone of the user's primary calendar, used to resolve "today" or "next week".
+    Raises:
+        Exception: If the user's calendars have never been synced and Google cannot be reached.
+    """
+    before = (credentials.token, credentials.refresh_token)
+    try:
+        return await calendar_event_store.time_zone(user_id, credentials)
+    finally:
+        _record_token_change(user_id, credentials, before)
+
+@lru_cache(maxsize=1)
+def get_google_client_config() -> Dict[str, Any]:
+    """OAuth client config, built once and shared by every flow."""
+    return {
+        "web": {
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": settings.GOOGLE_TOKEN_URI,
+        }
+    }
+
+def get_google_flow() -> "Flow":
+    """
+    Get configured Google OAuth flow.
+    A Flow carries per-authorization state (PKCE verifier, fetched token), so each request gets its own.
+    """
+    from google_auth_oauthlib.flow import Flow
 
-def get_google_flow() -> Flow:
-    """Get configured Google OAuth flow."""
     return Flow.from_client_config(
-        {
-            "web": {
-                "client_id": settings.GOOGLE_CLIENT_ID,
-                "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
+        get_google_client_config(),
         scopes=SCOPES,
         redirect_uri=settings.GOOGLE_CALENDAR_REDIRECT_URI
     )
 
-async def get_google_credentials(user_id: str) -> Credentials:
+async def get_google_credentials(user_id: str) -> "Credentials":
     """
     Retrieves Google Calendar credentials from Supabase user metadata.
+    Built credentials are cached per user until their access token expires.
     Args:
         user_id: The ID of the user whose credentials to retrieve.
     Returns:
@@ -64,8 +135,11 @@ async def get_google_credentials(user_id: str) -> Credentials:
     Raises:
         HTTPException: If Google Calendar integration is not found for the user.
     """
-    response = supabase.admin_client.auth.admin.get_user_by_id(user_id)
-    user_metadata = response.user.user_metadata
+    cached = credentials_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user_metadata = await get_user_metadata(user_id)
 
     google_access_token = user_metadata.get("google_access_token")
     google_token_expiry = user_metadata.get("google_token_expiry")
@@ -77,14 +151,25 @@ async def get_google_credentials(user_id: str) -> Credentials:
             detail="Google Calendar integration not found for this user. Please link your account."
         )
 
+    from google.oauth2.credentials import Credentials
+
     # Create Google Credentials object
     credentials = Credentials(
         token=google_access_token,
         refresh_token=google_refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
+        token_uri=settings.GOOGLE_TOKEN_URI,
         client_id=settings.GOOGLE_CLIENT_ID,
         client_secret=settings.GOOGLE_CLIENT_SECRET,
         scopes=SCOPES,
-        expiry=datetime.fromisoformat(google_token_expiry.replace('Z', '+00:00')) if google_token_expiry else None
+        expiry=token_expiry_from_metadata(user_metadata)
     )
-    return credentials 
\ No newline at end of file
+    credentials_cache.set(user_id, credentials, ttl=seconds_until_token_expiry(user_metadata))
+    google_token_refresher.track(user_id, user_metadata)
+    return credentials
+
+def invalidate_google_credentials(user_id: str) -> None:
+    """Drops the cached metadata and credentials for a user, e.g. after new tokens are stored."""
+    credentials_cache.invalidate(user_id)
+    invalidate_user_metadata(user_id)
+
+google_token_refresher.subscribe(invalidate_google_credentials)
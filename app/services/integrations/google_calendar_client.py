@@ -0,0 +1,277 @@
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import quote
+
+import httpx
+
+from app.core.config import settings
+from app.core.tracing import span
+
+if TYPE_CHECKING:
+    # google-auth is only needed at runtime once credentials are built for a request
+    from google.oauth2.credentials import Credentials
+
+# Google Calendar REST reference: https://developers.google.com/calendar/api/v3/reference
+# Talking to the REST API through one pooled httpx.AsyncClient avoids parsing the discovery
+# document per call and keeps the event loop free while requests are in flight.
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Retryable even when repeating the request could repeat its effect: Google did not act on it
+REJECTED_STATUS_CODES = {429}
+
+# Reasons Google gives for a 403 that is a quota or rate limit, not a lack of access
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+class GoogleCalendarAPIError(Exception):
+    """
+    Raised when the Google Calendar or OAuth token endpoint returns an error response.
+    `reason` is the Calendar API's error reason (e.g. "rateLimitExceeded") or the OAuth error code
+    (e.g. "invalid_grant"), when the body has one.
+    """
+
+    def __init__(self, message: str, status_code: int, reason: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.reason = reason
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status_code == 429 or (self.status_code == 403 and self.reason in RATE_LIMIT_REASONS)
+
+class GoogleCalendarClient:
+    """
+    Long-lived async client for the Google Calendar API.
+    Args:
+        base_url: API root; point it at a local fake to load-test offline.
+        token_uri: OAuth token endpoint used to refresh expired access tokens.
+        revoke_uri: OAuth endpoint that revokes a grant when an account is unlinked.
+        transport: Optional httpx transport, e.g. an httpx.MockTransport.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.GOOGLE_CALENDAR_API_BASE_URL,
+        token_uri: str = settings.GOOGLE_TOKEN_URI,
+        revoke_uri: str = settings.GOOGLE_TOKEN_REVOKE_URI,
+        timeout: float = settings.GOOGLE_CALENDAR_TIMEOUT_SECONDS,
+        max_retries: int = settings.GOOGLE_CALENDAR_MAX_RETRIES,
+        retry_backoff: float = settings.GOOGLE_CALENDAR_RETRY_BACKOFF_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.token_uri = token_uri
+        self.revoke_uri = revoke_uri
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.transport = transport
+
+    @cached_property
+    def http(self) -> httpx.AsyncClient:
+        # Built on first use (the lifespan warm-up) rather than at import
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=settings.GOOGLE_CALENDAR_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.GOOGLE_CALENDAR_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GOOGLE_CALENDAR_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            transport=self.transport,
+        )
+
+    async def _send(
+        self, method: str, url: str, operation: str, idempotent: Optional[bool] = None, **kwargs
+    ) -> httpx.Response:
+        """
+        Sends a request, retrying transport errors and retryable statuses with jittered backoff.
+        Each attempt is timed as its own span, labelled with `operation`.
+        Args:
+            idempotent: Whether sending the request twice is harmless; defaults to True for GET only.
+                Other requests are only retried when they never reached Google or were rejected
+                with 429, since a 5xx or a dropped connection may follow a request that took effect.
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+        retryable_status_codes = RETRYABLE_STATUS_CODES if idempotent else REJECTED_STATUS_CODES
+        attempt = 0
+        while True:
+            try:
+                async with span("google", operation) as timing:
+                    response = await self.http.request(method, url, **kwargs)
+                    timing.status = str(response.status_code)
+                if response.status_code not in retryable_status_codes or attempt >= self.max_retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # Never sent
+                if attempt >= self.max_retries:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        if not response.is_error:
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        error = body.get("error")
+        if isinstance(error, dict):
+            message = error.get("message")
+            reason = next((item.get("reason") for item in error.get("errors") or [] if item.get("reason")), None)
+        else:
+            message = body.get("error_description") or error
+            reason = error if isinstance(error, str) else None
+        raise GoogleCalendarAPIError(str(message or response.text), response.status_code, reason)
+
+    async def refresh_credentials(self, credentials: "Credentials") -> "Credentials":
+        """
+        Exchanges the refresh token for a new access token, updating `credentials` in place.
+        Returns:
+            The same credentials object, now holding a fresh token and expiry, and the new
+            refresh token if Google rotated it.
+        """
+        # Exchanging the same refresh token twice just issues another access token
+        response = await self._send(
+            "POST",
+            self.token_uri,
+            "token.refresh",
+            idempotent=True,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": credentials.refresh_token,
+                "client_id": credentials.client_id,
+                "client_secret": credentials.client_secret,
+            },
+        )
+        self._raise_for_status(response)
+        data = response.json()
+        credentials.token = data["access_token"]
+        # Google may rotate the refresh token; `refresh_token` is read-only, and google-auth's own
+        # refresh() updates the same attribute
+        credentials._refresh_token = data.get("refresh_token", credentials.refresh_token)
+        # google-auth compares expiry against naive UTC datetimes
+        credentials.expiry = (
+            datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=int(data.get("expires_in", 3600)))
+        )
+        return credentials
+
+    async def revoke_token(self, token: str) -> None:
+        """
+        Revokes a grant. Revoking the refresh token also invalidates the access tokens issued from it.
+        A token that is already revoked or expired is not an error.
+        """
+        response = await self._send("POST", self.revoke_uri, "token.revoke", idempotent=True, data={"token": token})
+        if response.status_code != 400:
+            self._raise_for_status(response)
+
+    async def _call(
+        self,
+        credentials: "Credentials",
+        method: str,
+        path: str,
+        operation: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if not credentials.token or credentials.expired:
+            await self.refresh_credentials(credentials)
+
+        response = await self._send(
+            method,
+            f"{self.base_url}{path}",
+            operation,
+            params=params,
+            json=json,
+            headers={"Authorization": f"Bearer {credentials.token}"},
+        )
+        if response.status_code == 401 and credentials.refresh_token:
+            # The token was revoked or expired early; refresh once and retry
+            await self.refresh_credentials(credentials)
+            response = await self._send(
+                method,
+                f"{self.base_url}{path}",
+                operation,
+                params=params,
+                json=json,
+                headers={"Authorization": f"Bearer {credentials.token}"},
+            )
+        self._raise_for_status(response)
+        # channels.stop answers 204 No Content
+        return response.json() if response.content else {}
+
+    async def _get(
+        self, credentials: "Credentials", path: str, operation: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        return await self._call(credentials, "GET", path, operation, params=params)
+
+    async def list_events(self, credentials: "Credentials", calendar_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fetches one page of `events.list`.
+        Args:
+            credentials: Google OAuth2 credentials object.
+            calendar_id: The calendar to read, e.g. 'primary'.
+            params: Query parameters such as syncToken, pageToken, timeMin.
+        Returns:
+            The decoded events list response.
+        """
+        return await self._get(credentials, f"/calendars/{quote(calendar_id, safe='')}/events", "events.list", params=params)
+
+    async def list_calendars(self, credentials: "Credentials", params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Fetches one page of the user's `calendarList`.
+        Args:
+            credentials: Google OAuth2 credentials object.
+            params: Query parameters such as pageToken, minAccessRole.
+        Returns:
+            The decoded calendar list response.
+        """
+        return await self._get(credentials, "/users/me/calendarList", "calendar_list.list", params=params)
+
+    async def get_calendar(self, credentials: "Credentials", calendar_id: str = 'primary') -> Dict[str, Any]:
+        """
+        Fetches calendar metadata; a cheap call that proves the credentials still work.
+        """
+        return await self._get(credentials, f"/calendars/{quote(calendar_id, safe='')}", "calendars.get")
+
+    async def watch_events(self, credentials: "Credentials", calendar_id: str, channel: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Opens a push notification channel for changes to a calendar's events (`events.watch`).
+        Args:
+            credentials: Google OAuth2 credentials object.
+            calendar_id: The calendar to watch.
+            channel: The channel resource: id, type "web_hook", address, token and optional expiration (ms).
+        Returns:
+            The created channel, including its resourceId and expiration.
+        """
+        return await self._call(
+            credentials, "POST", f"/calendars/{quote(calendar_id, safe='')}/events/watch", "events.watch", json=channel
+        )
+
+    async def stop_channel(self, credentials: "Credentials", channel_id: str, resource_id: str) -> None:
+        """Stops a push notification channel (`channels.stop`)."""
+        await self._call(
+            credentials, "POST", "/channels/stop", "channels.stop", json={"id": channel_id, "resourceId": resource_id}
+        )
+
+    async def warm_up(self, timeout: Optional[float] = None) -> None:
+        """Opens pooled connections to the API and token hosts; any HTTP response counts as warm."""
+        await asyncio.gather(
+            self.http.head(self.base_url, timeout=timeout or httpx.USE_CLIENT_DEFAULT),
+            self.http.head(self.token_uri, timeout=timeout or httpx.USE_CLIENT_DEFAULT),
+        )
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections, if any were opened."""
+        if "http" in self.__dict__:
+            await self.http.aclose()
+
+# Shared client, reused by every request
+google_calendar_client = GoogleCalendarClient()
@@ -0,0 +1,436 @@
+import hmac
+import time
+import uuid
+import asyncio
+import logging
+import secrets
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.integrations.google_calendar import get_google_credentials
+from app.services.integrations.google_calendar_client import google_calendar_client
+from app.services.integrations.google_calendar_store import calendar_event_store, list_selected_calendars
+from app.services.integrations.google_token_refresher import google_token_refresher
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+# Push notifications reference: https://developers.google.com/calendar/api/guides/push
+
+calendar_notifications = metrics.counter(
+    "google_calendar_notifications_total",
+    "Google Calendar push notifications received, by outcome.",
+    labels=("outcome",)
+)
+
+# Resource ID of a channel that is recorded but not yet confirmed by Google
+PENDING_RESOURCE_ID = ""
+
+@dataclass
+class WatchChannel:
+    """One `events.watch` channel: notifications about `calendar_id` of `user_id`."""
+    id: str
+    user_id: str
+    calendar_id: str
+    resource_id: str
+    token: str
+    expires_at: float
+    notified_at: float = 0.0
+
+    @property
+    def pending(self) -> bool:
+        return self.resource_id == PENDING_RESOURCE_ID
+
+class SQLiteChannelBackend:
+    """
+    Open channels, shared by the workers on a host: a notification may reach any worker,
+    and the worker that renews channels is not necessarily the one that opened them.
+    Calls are blocking and are run off the event loop by the watcher.
+    """
+
+    COLUMNS = "id, user_id, calendar_id, resource_id, token, expires_at, notified_at"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS channels (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    calendar_id TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    notified_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS channels_user ON channels (user_id);
+                CREATE INDEX IF NOT EXISTS channels_expiry ON channels (expires_at);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def insert(self, channel: WatchChannel) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT INTO channels ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (channel.id, channel.user_id, channel.calendar_id, channel.resource_id,
+                 channel.token, channel.expires_at, channel.notified_at)
+            )
+            conn.commit()
+
+    def activate(self, channel: WatchChannel) -> bool:
+        """
+        Records the resource ID and expiry Google confirmed for a pending channel.
+        Returns:
+            False if the channel was deleted in the meantime, e.g. by an unlink on another worker.
+        """
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE channels SET resource_id = ?, expires_at = ? WHERE id = ?",
+                (channel.resource_id, channel.expires_at, channel.id)
+            )
+            conn.commit()
+        return cursor.rowcount > 0
+
+    def get(self, channel_id: str) -> Optional[WatchChannel]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {self.COLUMNS} FROM channels WHERE id = ?", (channel_id,)
+            ).fetchone()
+        return WatchChannel(*row) if row else None
+
+    def for_user(self, user_id: str) -> List[WatchChannel]:
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {self.COLUMNS} FROM channels WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return [WatchChannel(*row) for row in rows]
+
+    def expiring(self, before: float) -> List[str]:
+        """Users with a channel that expires before `before` (unix time)."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT DISTINCT user_id FROM channels WHERE expires_at < ?", (before,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def watched_users(self, now: float) -> Dict[str, float]:
+        """Users with a live channel, mapped to their latest notification time."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT user_id, MAX(notified_at) FROM channels WHERE expires_at > ? GROUP BY user_id", (now,)
+            ).fetchall()
+        return dict(rows)
+
+    def touch(self, channel_id: str, notified_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE channels SET notified_at = ? WHERE id = ?", (notified_at, channel_id))
+            conn.commit()
+
+    def delete(self, channel_ids: List[str]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("DELETE FROM channels WHERE id = ?", [(channel_id,) for channel_id in channel_ids])
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class GoogleCalendarWatcher:
+    """
+    Keeps `events.watch` channels open on every selected calendar of linked users, so the
+    event store only asks Google for deltas after a calendar actually changed.
+
+    Every worker polls the shared channel table and marks users stale in its own event store
+    when any worker received a notification for them. One worker per host (the leader) renews
+    channels before they expire and opens channels for linked users that have none.
+    """
+
+    def __init__(
+        self,
+        backend: SQLiteChannelBackend,
+        webhook_url: Optional[str],
+        ttl_seconds: int,
+        renew_before: float,
+        renew_check: float,
+        poll_interval: float,
+        workers: int,
+    ):
+        self.backend = backend
+        self.webhook_url = webhook_url
+        self.ttl_seconds = ttl_seconds
+        self.renew_before = renew_before
+        self.renew_check = renew_check
+        self.poll_interval = poll_interval
+        self._semaphore = asyncio.Semaphore(workers)
+        self._notified: Dict[str, float] = {}
+        self._polled = False
+        # Users a watch was attempted for, so a failing user is retried once per renewal pass at most
+        self._attempted: Dict[str, float] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._listeners: List[Callable[[str], None]] = []
+        self.opened = 0
+        self.stopped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook_url)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        """Registers a callback invoked with the user ID whenever a user's calendars changed."""
+        self._listeners.append(listener)
+
+    def _changed(self, user_id: str) -> None:
+        calendar_event_store.mark_stale(user_id)
+        for listener in self._listeners:
+            listener(user_id)
+
+    async def _open(self, user_id: str, credentials: "Credentials", calendar_id: str) -> WatchChannel:
+        # Recorded as pending first: Google may send the channel's first notification before
+        # `events.watch` returns, and a channel Google created must never go unrecorded
+        channel = WatchChannel(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            calendar_id=calendar_id,
+            resource_id=PENDING_RESOURCE_ID,
+            token=secrets.token_urlsafe(32),
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        await asyncio.to_thread(self.backend.insert, channel)
+        try:
+            created = await google_calendar_client.watch_events(credentials, calendar_id, {
+                "id": channel.id,
+                "type": "web_hook",
+                "address": self.webhook_url,
+                "token": channel.token,
+                "params": {"ttl": str(self.ttl_seconds)},
+            })
+        except Exception:
+            await asyncio.to_thread(self.backend.delete, [channel.id])
+            raise
+        channel.resource_id = created["resourceId"]
+        # Google reports the expiration in milliseconds since the epoch
+        channel.expires_at = int(created.get("expiration") or 0) / 1000 or channel.expires_at
+        if not await asyncio.to_thread(self.backend.activate, channel):
+            # Unwatched while the watch was in flight
+            await self._stop([channel], credentials)
+            return channel
+        self.opened += 1
+        return channel
+
+    async def _stop(self, channels: List[WatchChannel], credentials: Optional["Credentials"]) -> None:
+        """
+        Stops channels at Google when credentials are available, and forgets them either way.
+        Pending channels are only forgotten; the worker opening one stops it once it finds the row gone.
+        """
+        confirmed = [channel for channel in channels if not channel.pending]
+        if credentials is not None:
+            results = await asyncio.gather(
+                *(google_calendar_client.stop_channel(credentials, channel.id, channel.resource_id) for channel in confirmed),
+                return_exceptions=True
+            )
+            for channel, result in zip(confirmed, results):
+                if isinstance(result, Exception):
+                    # The channel expires on its own; its notifications are rejected once it is forgotten
+                    logger.warning("Error stopping Google Calendar channel", extra={"channel_id": channel.id, "error": str(result)})
+                else:
+                    self.stopped += 1
+        await asyncio.to_thread(self.backend.delete, [channel.id for channel in channels])
+
+    async def watch_user(self, user_id: str, credentials: "Credentials") -> int:
+        """
+        Opens a channel on each of the user's selected calendars, then stops the user's previous channels.
+        Returns:
+            The number of channels opened.
+        """
+        self._attempted[user_id] = time.monotonic()
+        previous = await asyncio.to_thread(self.backend.for_user, user_id)
+        calendar_ids, _ = await list_selected_calendars(credentials)
+        results = await asyncio.gather(
+            *(self._open(user_id, credentials, calendar_id) for calendar_id in calendar_ids or ['primary']),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            self.failed += len(errors)
+            logger.warning(
+                "Error opening Google Calendar channels",
+                extra={"user_id": user_id, "failed_calendars": len(errors), "error": str(errors[0])}
+            )
+        if previous:
+            await self._stop(previous, credentials)
+        # Whatever changed while no channel was open is picked up by the next read
+        calendar_event_store.mark_stale(user_id)
+        return len(results) - len(errors)
+
+    def watch_in_background(self, user_id: str, credentials: "Credentials") -> None:
+        """Starts `watch_user` without waiting for it, e.g. right after an account is linked."""
+        if not self.enabled or user_id in self._in_flight:
+            return
+        task = asyncio.create_task(self._watch_logged(user_id, credentials))
+        self._in_flight[user_id] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(user_id, None))
+
+    async def _watch_logged(self, user_id: str, credentials: "Credentials") -> None:
+        async with self._semaphore:
+            try:
+                await self.watch_user(user_id, credentials)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Error watching Google Calendars", extra={"user_id": user_id, "error": str(e)})
+
+    async def unwatch_user(self, user_id: str, credentials: Optional["Credentials"] = None) -> None:
+        """Stops and forgets every channel of a user, e.g. when the account is unlinked."""
+        task = self._in_flight.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        channels = await asyncio.to_thread(self.backend.for_user, user_id)
+        if channels:
+            await self._stop(channels, credentials)
+        self._attempted.pop(user_id, None)
+
+    async def handle_notification(
+        self, channel_id: str, token: Optional[str], resource_id: str, resource_state: str
+    ) -> None:
+        """
+        Validates a notification against the channel it claims to come from and marks the user's
+        calendars stale, so the next read fetches deltas.
+        Raises:
+            HTTPException: 404 for an unknown or stopped channel, 403 when the token or resource does not match.
+        """
+        channel = await asyncio.to_thread(self.backend.get, channel_id)
+        if channel is None:
+            calendar_notifications.inc(outcome="unknown_channel")
+            raise HTTPException(status_code=404, detail="Unknown notification channel")
+        # A pending channel's resource ID is not known yet; its secret token identifies it
+        if not hmac.compare_digest(channel.token, token or "") or (not channel.pending and channel.resource_id != resource_id):
+            calendar_notifications.inc(outcome="invalid_token")
+            raise HTTPException(status_code=403, detail="Invalid notification channel token")
+        if resource_state == "sync":
+            # Sent once when the channel is opened; nothing changed yet
+            calendar_notifications.inc(outcome="sync")
+            return
+
+        now = time.time()
+        await asyncio.to_thread(self.backend.touch, channel_id, now)
+        self._notified[channel.user_id] = now
+        self._changed(channel.user_id)
+        calendar_notifications.inc(outcome="changed")
+
+    async def poll(self) -> None:
+        """Picks up notifications other workers received, and which users are watched at all."""
+        watched = await asyncio.to_thread(self.backend.watched_users, time.time())
+        # The first poll only learns the current state; nothing is cached yet that could be stale
+        if self._polled:
+            for user_id, notified_at in watched.items():
+                if notified_at > self._notified.get(user_id, 0.0):
+                    self._changed(user_id)
+        self._polled = True
+        self._notified = watched
+        calendar_event_store.set_pushed_users(watched)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning("Error reading Google Calendar channels", extra={"error": str(e)})
+            await asyncio.sleep(self.poll_interval)
+
+    async def renew(self) -> None:
+        """
+        Re-watches users whose channels expire within `renew_before`, and users with a linked
+        account but no channel yet (linked before push notifications were enabled, or whose last
+        attempt failed).
+        """
+        # Know which users already have channels, also on the first pass after a restart
+        await self.poll()
+        due = set(await asyncio.to_thread(self.backend.expiring, time.time() + self.renew_before))
+        retry_before = time.monotonic() - self.renew_check
+        due.update(
+            user_id for user_id in google_token_refresher.tracked_users()
+            if user_id not in self._notified and self._attempted.get(user_id, float("-inf")) <= retry_before
+        )
+        await asyncio.gather(*(self._renew_user(user_id) for user_id in due))
+
+    async def _renew_user(self, user_id: str) -> None:
+        async with self._semaphore:
+            try:
+                credentials = await get_google_credentials(user_id)
+            except HTTPException:
+                # No longer linked: nothing to renew, and the channels cannot be stopped without tokens
+                await self.unwatch_user(user_id)
+                return
+            except Exception as e:
+                logger.warning("Error loading Google credentials to renew channels", extra={"user_id": user_id, "error": str(e)})
+                return
+            try:
+                await self.watch_user(user_id, credentials)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Error renewing Google Calendar channels", extra={"user_id": user_id, "error": str(e)})
+
+    async def _renew_loop(self) -> None:
+        while True:
+            try:
+                await self.renew()
+            except Exception:
+                logger.exception("Error renewing Google Calendar channels")
+            await asyncio.sleep(self.renew_check)
+
+    def start(self, renew: bool) -> None:
+        """Starts polling for notifications; `renew` also runs channel renewal in this worker."""
+        if self._tasks or not self.enabled:
+            return
+        self._tasks = [asyncio.create_task(self._poll_loop())]
+        if renew:
+            self._tasks.append(asyncio.create_task(self._renew_loop()))
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, *self._in_flight.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._in_flight.values(), return_exceptions=True)
+        self._tasks = []
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "watched_users": len(self._notified),
+            "opened": self.opened,
+            "stopped": self.stopped,
+            "failed": self.failed,
+        }
+
+google_calendar_watcher = GoogleCalendarWatcher(
+    backend=SQLiteChannelBackend(settings.GOOGLE_CALENDAR_CHANNEL_DB_PATH),
+    webhook_url=settings.GOOGLE_CALENDAR_WEBHOOK_URL,
+    ttl_seconds=settings.GOOGLE_CALENDAR_WATCH_TTL_SECONDS,
+    renew_before=settings.GOOGLE_CALENDAR_WATCH_RENEW_BEFORE_SECONDS,
+    renew_check=settings.GOOGLE_CALENDAR_WATCH_RENEW_CHECK_SECONDS,
+    poll_interval=settings.GOOGLE_CALENDAR_NOTIFICATION_POLL_SECONDS,
+    workers=settings.GOOGLE_CALENDAR_WATCH_WORKERS,
+)
@@ -0,0 +1,291 @@
+import logging
+import time
+import heapq
+import random
+import asyncio
+import contextlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.supabase_client import SupabaseAuthError, supabase
+from app.services.integrations.google_calendar_client import GoogleCalendarAPIError, google_calendar_client
+from app.services.users import invalidate_user_metadata, token_expiry_from_metadata
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+@dataclass(order=True)
+class _ScheduledRefresh:
+    due_at: float
+    user_id: str = field(compare=False)
+    version: int = field(compare=False)
+
+@dataclass
+class _TrackedUser:
+    refresh_token: str
+    expiry: datetime
+    version: int = 0
+
+@dataclass
+class _PendingWrite:
+    # The refresh token the new access token was obtained with; the write is dropped once it is no longer stored
+    refreshed_with: str
+    user_metadata: Dict[str, Any]
+
+def _epoch(expiry: datetime) -> float:
+    """Converts a naive UTC expiry to a unix timestamp."""
+    return expiry.replace(tzinfo=timezone.utc).timestamp()
+
+class GoogleTokenRefresher:
+    """
+    Refreshes linked users' Google access tokens shortly before they expire.
+    Refreshes are spread out with jitter and run on a bounded worker pool; refreshed
+    tokens are buffered and written back to Supabase in batches.
+    Another worker may unlink or relink an account at any time, so the stored refresh token
+    is read again before each refresh and each write-back, and unlinked users are dropped.
+    """
+
+    def __init__(
+        self,
+        lead_seconds: float,
+        jitter_seconds: float,
+        retry_seconds: float,
+        workers: int,
+        flush_seconds: float,
+    ):
+        self.lead_seconds = lead_seconds
+        self.jitter_seconds = jitter_seconds
+        self.retry_seconds = retry_seconds
+        self.flush_seconds = flush_seconds
+        self._semaphore = asyncio.Semaphore(workers)
+        self._tracked: Dict[str, _TrackedUser] = {}
+        self._heap: List[_ScheduledRefresh] = []
+        self._pending_writes: Dict[str, _PendingWrite] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: set = set()
+        self.refreshed = 0
+        self.failed = 0
+        self.written = 0
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        """Registers a callback invoked with the user ID after refreshed tokens are written back."""
+        self._listeners.append(listener)
+
+    def track(self, user_id: str, user_metadata: Dict[str, Any]) -> None:
+        """Schedules a refresh for a user whose metadata holds a linked Google account."""
+        refresh_token = user_metadata.get("google_refresh_token")
+        expiry = token_expiry_from_metadata(user_metadata)
+        if not refresh_token or expiry is None:
+            return
+        tracked = self._tracked.get(user_id)
+        if tracked and tracked.refresh_token == refresh_token and tracked.expiry == expiry:
+            return
+        self._schedule(user_id, refresh_token, expiry, _epoch(expiry) - self._lead())
+
+    def tracked_users(self) -> List[str]:
+        """Users with a linked Google account; only the worker running the refresh loop tracks any."""
+        return list(self._tracked)
+
+    def untrack(self, user_id: str) -> None:
+        self._tracked.pop(user_id, None)
+        self._pending_writes.pop(user_id, None)
+
+    def _lead(self) -> float:
+        return self.lead_seconds + random.uniform(0, self.jitter_seconds)
+
+    def _schedule(self, user_id: str, refresh_token: str, expiry: datetime, due_at: float) -> None:
+        # Only the worker running the loop keeps a schedule; elsewhere nothing would ever drain the heap
+        if not self._tasks:
+            return
+        previous = self._tracked.get(user_id)
+        version = previous.version + 1 if previous else 0
+        self._tracked[user_id] = _TrackedUser(refresh_token=refresh_token, expiry=expiry, version=version)
+        heapq.heappush(self._heap, _ScheduledRefresh(due_at=due_at, user_id=user_id, version=version))
+        self._wakeup.set()
+
+    def record_refreshed(self, user_id: str, credentials: "Credentials", refreshed_with: str) -> None:
+        """
+        Queues refreshed credentials for write-back and reschedules the next refresh.
+        Also used when a request path had to refresh a token itself.
+        Args:
+            refreshed_with: The refresh token held before the refresh; Google may have rotated it since.
+        """
+        self._pending_writes[user_id] = _PendingWrite(
+            refreshed_with=refreshed_with,
+            user_metadata={
+                "google_access_token": credentials.token,
+                "google_refresh_token": credentials.refresh_token,
+                "google_token_expiry": credentials.expiry.isoformat(),
+            },
+        )
+        self._schedule(user_id, credentials.refresh_token, credentials.expiry, _epoch(credentials.expiry) - self._lead())
+        if not self._tasks:
+            # No background flush loop running, write back right away
+            self._spawn(self.flush())
+
+    async def _stored_refresh_token(self, user_id: str) -> Optional[str]:
+        """The refresh token in the user's Supabase metadata right now, past every cache; None once unlinked."""
+        try:
+            response = await supabase.get_user_by_id(user_id)
+        except SupabaseAuthError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return response.user.user_metadata.get("google_refresh_token")
+
+    async def _refresh(self, user_id: str, tracked: _TrackedUser) -> None:
+        from google.oauth2.credentials import Credentials
+
+        async with self._semaphore:
+            try:
+                refresh_token = await self._stored_refresh_token(user_id)
+                if refresh_token is None:
+                    logger.info("Google Calendar unlinked, no longer tracking", extra={"user_id": user_id})
+                    self.untrack(user_id)
+                    return
+                # A relinked account carries a new refresh token
+                credentials = Credentials(
+                    token=None,
+                    refresh_token=refresh_token,
+                    token_uri=settings.GOOGLE_TOKEN_URI,
+                    client_id=settings.GOOGLE_CLIENT_ID,
+                    client_secret=settings.GOOGLE_CLIENT_SECRET,
+                )
+                await google_calendar_client.refresh_credentials(credentials)
+            except GoogleCalendarAPIError as e:
+                self.failed += 1
+                if e.status_code in (400, 401):
+                    # invalid_grant: the user revoked access, nothing left to refresh
+                    logger.warning("Google refresh token rejected, no longer tracking", extra={"user_id": user_id, "error": str(e)})
+                    self.untrack(user_id)
+                else:
+                    self._schedule(user_id, tracked.refresh_token, tracked.expiry, time.time() + self.retry_seconds)
+                return
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Error refreshing Google token", extra={"user_id": user_id, "error": str(e)})
+                self._schedule(user_id, tracked.refresh_token, tracked.expiry, time.time() + self.retry_seconds)
+                return
+        self.refreshed += 1
+        self.record_refreshed(user_id, credentials, refresh_token)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0].due_at <= now:
+                entry = heapq.heappop(self._heap)
+                tracked = self._tracked.get(entry.user_id)
+                # Skip entries superseded by a later reschedule
+                if tracked is not None and tracked.version == entry.version:
+                    self._spawn(self._refresh(entry.user_id, tracked))
+            timeout = self._heap[0].due_at - now if self._heap else None
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    async def flush(self) -> None:
+        """Writes all buffered tokens back to Supabase in one concurrent batch."""
+        if not self._pending_writes:
+            return
+        writes, self._pending_writes = self._pending_writes, {}
+        user_ids = list(writes)
+        done: set = set()
+
+        async def write_back(user_id: str) -> None:
+            await self._write_back(user_id, writes[user_id])
+            done.add(user_id)
+
+        try:
+            results = await asyncio.gather(*(write_back(user_id) for user_id in user_ids), return_exceptions=True)
+        except asyncio.CancelledError:
+            # Cancelled mid-batch, e.g. by stop(): requeue what was not written so the final flush retries it
+            for user_id in user_ids:
+                if user_id not in done:
+                    self._pending_writes.setdefault(user_id, writes[user_id])
+            raise
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                logger.warning("Error writing refreshed Google token", extra={"user_id": user_id, "error": str(result)})
+                # Keep the newest value for the next flush unless a newer one is already queued
+                self._pending_writes.setdefault(user_id, writes[user_id])
+
+    async def _write_back(self, user_id: str, write: _PendingWrite) -> None:
+        async with self._semaphore:
+            stored = await self._stored_refresh_token(user_id)
+            if stored != write.refreshed_with:
+                # Unlinked or relinked since the refresh; writing would resurrect or overwrite the integration
+                logger.info("Google Calendar tokens changed since the refresh, dropping write-back", extra={"user_id": user_id})
+                if stored is None:
+                    self.untrack(user_id)
+                return
+            await supabase.update_user_by_id(user_id, {"user_metadata": write.user_metadata})
+        self.written += 1
+        invalidate_user_metadata(user_id)
+        for listener in self._listeners:
+            listener(user_id)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    async def discover_linked_users(self, per_page: int = 200) -> None:
+        """Pages through all users once and starts tracking those with a linked Google account."""
+        page = 1
+        while True:
+            users = await supabase.list_users(page=page, per_page=per_page)
+            for user in users:
+                self.track(user.id, user.user_metadata)
+            if len(users) < per_page:
+                return
+            page += 1
+
+    async def _discover(self) -> None:
+        try:
+            await self.discover_linked_users()
+        except Exception:
+            logger.exception("Error discovering linked Google Calendar users")
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._discover()),
+        ]
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, *self._in_flight]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._in_flight, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_users": len(self._tracked),
+            "pending_writes": len(self._pending_writes),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "written": self.written,
+        }
+
+google_token_refresher = GoogleTokenRefresher(
+    lead_seconds=settings.GOOGLE_TOKEN_REFRESH_LEAD_SECONDS,
+    jitter_seconds=settings.GOOGLE_TOKEN_REFRESH_JITTER_SECONDS,
+    retry_seconds=settings.GOOGLE_TOKEN_REFRESH_RETRY_SECONDS,
+    workers=settings.GOOGLE_TOKEN_REFRESH_WORKERS,
+    flush_seconds=settings.GOOGLE_TOKEN_REFRESH_FLUSH_SECONDS,
+)
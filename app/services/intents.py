@@ -0,0 +1,119 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intent: str
+    score: float
+    triggers: Tuple[str, ...]
+
+@dataclass
+class _Intent:
+    name: str
+    weight: float
+    order: int
+
+def normalize_message(message: str) -> str:
+    """Lowercases and folds typographic apostrophes so "what’s on" matches "what's on"."""
+    return message.lower().replace("’", "'")
+
+class IntentRouter:
+    """
+    Matches messages against registered intent triggers in a single pass.
+    All triggers are compiled into one alternation anchored on word boundaries,
+    so "hi" matches "hi there" but not "this" or "which".
+    """
+
+    def __init__(self):
+        self._intents: Dict[str, _Intent] = {}
+        self._trigger_intents: Dict[str, str] = {}
+        self._pattern: Optional[Pattern[str]] = None
+        self._lock = threading.Lock()
+
+    def register(self, intent: str, triggers: Iterable[str], weight: float = 1.0) -> None:
+        """
+        Registers (or extends) an intent.
+        Args:
+            intent: Intent name returned by `route`.
+            triggers: Words or phrases that signal the intent.
+            weight: Score added per matched trigger; higher weights rank first.
+        """
+        with self._lock:
+            if intent not in self._intents:
+                self._intents[intent] = _Intent(name=intent, weight=weight, order=len(self._intents))
+            else:
+                self._intents[intent].weight = weight
+            for trigger in triggers:
+                self._trigger_intents[normalize_message(trigger).strip()] = intent
+            self._pattern = None
+
+    def _compiled(self) -> Pattern[str]:
+        pattern = self._pattern
+        if pattern is None:
+            with self._lock:
+                if self._pattern is None:
+                    # Longest triggers first so "good morning" wins over any shorter overlapping trigger
+                    alternatives = sorted(self._trigger_intents, key=len, reverse=True)
+                    body = "|".join(re.escape(trigger).replace(r"\ ", r"\s+") for trigger in alternatives)
+                    self._pattern = re.compile(rf"(?<!\w)(?:{body or '(?!)'})(?!\w)")
+                pattern = self._pattern
+        return pattern
+
+    def route(self, message: str) -> List[IntentMatch]:
+        """
+        Returns all matching intents, best first.
+        Args:
+            message: The raw user message.
+        """
+        matched: Dict[str, List[str]] = {}
+        for match in self._compiled().finditer(normalize_message(message)):
+            trigger = " ".join(match.group(0).split())
+            matched.setdefault(self._trigger_intents[trigger], []).append(trigger)
+
+        results = [
+            IntentMatch(intent=name, score=self._intents[name].weight * len(triggers), triggers=tuple(triggers))
+            for name, triggers in matched.items()
+        ]
+        results.sort(key=lambda m: (-m.score, self._intents[m.intent].order))
+        return results
+
+    def top_intent(self, message: str) -> Optional[IntentMatch]:
+        matches = self.route(message)
+        return matches[0] if matches else None
+
+# Shared router; integrations register their triggers at import time
+intent_router = IntentRouter()
+
+GREETING_INTENT = "greeting"
+CALENDAR_INTENT = "calendar"
+
+intent_router.register(
+    GREETING_INTENT,
+    ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"],
+)
+intent_router.register(
+    CALENDAR_INTENT,
+    ["calendar", "schedule", "events", "what's on", "what is on", "appointments", "today", "tomorrow", "this week", "next week"],
+    # A calendar mention is a stronger signal than a greeting
+    weight=1.5,
+)
+
+CALENDAR_ACTION_INTENT = "calendar_action"
+
+# Requests to change the calendar or get help with it, as opposed to seeing it. Kept out of the shared
+# router: they only matter alongside a calendar intent and must not outrank it.
+calendar_action_router = IntentRouter()
+calendar_action_router.register(
+    CALENDAR_ACTION_INTENT,
+    [
+        "schedule a", "schedule an", "schedule the", "schedule my", "schedule some", "schedule time",
+        "reschedule", "book", "move", "cancel", "add", "create", "set up", "arrange", "invite",
+        "remind me", "find time", "find a time", "help me", "prepare", "draft", "should i", "when can",
+    ],
+)
+
+def is_calendar_action(message: str) -> bool:
+    """True when the message asks to act on the calendar, e.g. "help me schedule a meeting with Sam"."""
+    return calendar_action_router.top_intent(message) is not None
@@ -0,0 +1,176 @@
+import json
+import time
+import asyncio
+from functools import cached_property
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tracing import record_timing, span
+
+# Gemini REST reference: https://ai.google.dev/api/generate-content#method:-models.streamgeneratecontent
+# Streaming goes through one pooled httpx.AsyncClient so waiting for a chunk never blocks the
+# event loop. Chunks are pulled from the upstream response only as fast as the caller consumes
+# them, so a slow reader applies backpressure instead of buffering, and closing the generator
+# closes the upstream connection, which stops generation.
+
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+
+time_to_first_token = metrics.histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a prompt to receiving the first streamed chunk."
+)
+tokens_per_second = metrics.histogram(
+    "llm_tokens_per_second",
+    "Output tokens per second after the first chunk.",
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+output_tokens = metrics.counter("llm_output_tokens_total", "Output tokens generated.")
+streams_cancelled = metrics.counter("llm_streams_cancelled_total", "Streams closed before generation finished.")
+
+class GeminiAPIError(Exception):
+    """Raised when the Gemini API returns an error response."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+# Gemini names the assistant role 'model'
+ROLE_MAP = {"user": "user", "assistant": "model", "model": "model"}
+
+def to_gemini_content(role: str, text: str) -> Dict[str, Any]:
+    return {"role": ROLE_MAP.get(role, role), "parts": [{"text": text}]}
+
+def _chunk_text(payload: Dict[str, Any]) -> str:
+    candidates = payload.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+class GeminiClient:
+    """
+    Async streaming client for Gemini models.
+    Args:
+        base_url: API root; point it at a local fake to test offline.
+        transport: Optional httpx transport, e.g. an httpx.MockTransport.
+    """
+
+    def __init__(
+        self,
+        api_key: str = settings.GOOGLE_API_KEY,
+        model: str = settings.GEMINI_MODEL,
+        base_url: str = settings.GEMINI_API_BASE_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport
+
+    @cached_property
+    def http(self) -> httpx.AsyncClient:
+        # Built on first use (the lifespan warm-up) rather than at import; creating the TLS context is not free
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS, connect=settings.GEMINI_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            transport=self.transport,
+        )
+
+    async def stream_chat(self, history: List[Dict[str, Any]], message: str) -> AsyncGenerator[str, None]:
+        """
+        Streams a model reply to `message` given the prior conversation.
+        Args:
+            history: Prior turns in Gemini content format (see `to_gemini_content`).
+            message: The new user message.
+        Yields:
+            Text chunks as they arrive.
+        Raises:
+            GeminiAPIError: If the API responds with an error status.
+        """
+        body = {"contents": [*history, to_gemini_content("user", message)]}
+        url = f"{self.base_url}/{self.model}:streamGenerateContent"
+        started = time.perf_counter()
+        first_chunk_at = None
+        token_count = None
+        char_count = 0
+        finished = False
+        timing = span("gemini", "stream_generate")
+        timing.__enter__()
+
+        try:
+            async with self.http.stream(
+                "POST",
+                url,
+                params={"alt": "sse"},
+                headers={"x-goog-api-key": self.api_key},
+                json=body,
+            ) as response:
+                timing.status = str(response.status_code)
+                if response.is_error:
+                    await response.aread()
+                    try:
+                        message_text = response.json().get("error", {}).get("message")
+                    except ValueError:
+                        message_text = None
+                    raise GeminiAPIError(message_text or response.text, response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = json.loads(line[len("data:"):].strip())
+                    usage = payload.get("usageMetadata") or {}
+                    token_count = usage.get("candidatesTokenCount", token_count)
+                    text = _chunk_text(payload)
+                    if not text:
+                        continue
+                    if first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+                        time_to_first_token.observe(first_chunk_at - started)
+                        record_timing("gemini.ttft", first_chunk_at - started)
+                    char_count += len(text)
+                    yield text
+            finished = True
+        except (GeneratorExit, asyncio.CancelledError):
+            streams_cancelled.inc()
+            timing.status = "cancelled"
+            raise
+        except Exception:
+            # Keep an HTTP error status; failures before the response or mid-stream count as errors
+            if timing.status in ("ok", "200"):
+                timing.status = "error"
+            raise
+        finally:
+            # The span covers the whole stream, so it is closed by hand rather than around the yields
+            timing.__exit__(None, None, None)
+            if first_chunk_at is not None:
+                # Fall back to a ~4 characters per token estimate when usage metadata is missing
+                tokens = token_count if token_count is not None else char_count / 4
+                output_tokens.inc(tokens)
+                elapsed = time.perf_counter() - first_chunk_at
+                if finished and elapsed > 0:
+                    tokens_per_second.observe(tokens / elapsed)
+
+    async def warm_up(self, timeout: Optional[float] = None) -> None:
+        """Opens a pooled connection and checks that the API key and model are usable."""
+        response = await self.http.get(
+            f"{self.base_url}/{self.model}",
+            headers={"x-goog-api-key": self.api_key},
+            timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+        )
+        if response.is_error:
+            raise GeminiAPIError(response.text, response.status_code)
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections, if any were opened."""
+        if "http" in self.__dict__:
+            await self.http.aclose()
+
+# Shared client, reused by every request
+gemini_client = GeminiClient()
@@ -0,0 +1,53 @@
+import json
+import hashlib
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.integrations.google_calendar_store import event_bounds
+
+# Cached replies are stored as the list of streamed text chunks so a hit can be
+# replayed to the client in the same chunk format as a live generation.
+response_cache: TTLCache[List[str]] = TTLCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    default_ttl=settings.RESPONSE_CACHE_MAX_TTL_SECONDS,
+    name="llm_responses"
+)
+
+def response_cache_key(user_id: str, model: str, history: List[Dict[str, Any]], message: str) -> Tuple[str, str]:
+    """
+    Builds the cache key for a generation.
+    The user ID is kept outside the digest so entries are never shared across users.
+    Args:
+        history: The windowed history sent to the model, in Gemini content format.
+        message: The final prompt, including any injected calendar data.
+    """
+    payload = json.dumps(
+        {"model": model, "history": history, "message": message},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return user_id, hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def ttl_until_next_event_boundary(
+    events: List[Dict[str, Any]],
+    max_ttl: float = settings.RESPONSE_CACHE_MAX_TTL_SECONDS,
+    now: Optional[datetime] = None,
+    tz: tzinfo = timezone.utc,
+) -> float:
+    """
+    Seconds until the next event starts or ends, or the local day ends, when a schedule answer
+    stops being accurate. Capped at `max_ttl`.
+    Args:
+        tz: The user's calendar time zone, in which all-day events and the day start and end.
+    """
+    now = now or datetime.now(timezone.utc)
+    midnight = datetime.combine(now.astimezone(tz).date() + timedelta(days=1), time.min, tzinfo=tz)
+    ttl = min(max_ttl, (midnight - now).total_seconds())
+    for event in events:
+        for boundary in event_bounds(event, tz):
+            if boundary is not None and boundary > now:
+                ttl = min(ttl, (boundary - now).total_seconds())
+    return ttl
@@ -0,0 +1,224 @@
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.prompts import SCHEDULE_GREETING_PROMPT
+from app.services.calendar_context import WINDOW_TRIGGERS, calendar_window
+from app.services.integrations.google_calendar_store import event_bounds
+from app.services.llm import gemini_client
+
+logger = logging.getLogger(__name__)
+
+# Fixed text of a rendered schedule, following CALENDAR_SCHEDULE_PROMPT
+OPENING = "Hi there! Let me check your schedule."
+NOTHING_LEFT_TODAY = "You have nothing else on your calendar today."
+FREE_TOMORROW = "Tomorrow is free too, so here are a few ideas:"
+# "Your calendar is clear {period}, ..." for a window the user asked about
+FREE_WINDOW = "Your calendar is clear {period}, so here are a few ideas:"
+WINDOW_PERIODS = {
+    "today": "for the rest of today",
+    "tomorrow": "tomorrow",
+    "this week": "for the rest of this week",
+    "next week": "next week",
+}
+CLOSING = "Let me know if you want to adjust anything."
+FREE_DAY_TIPS = (
+    "Review your goals and pick one thing to move forward.",
+    "Read something inspiring for twenty minutes.",
+    "Block out focus time before your next busy day.",
+)
+
+MAX_TOMORROW_EVENTS = 3
+MAX_DETAIL_CHARS = 80
+
+@dataclass
+class ScheduledEvent:
+    """A calendar event reduced to what the schedule shows, with times in the user's zone."""
+    title: str
+    start: datetime
+    end: datetime
+    all_day: bool
+    detail: Optional[str] = None
+
+def event_detail(event: Dict[str, Any], max_chars: int = MAX_DETAIL_CHARS) -> Optional[str]:
+    """The one-line summary shown after the title: the location, or else the start of the description."""
+    detail = " ".join((event.get("location") or event.get("description") or "").split())
+    if len(detail) > max_chars:
+        detail = detail[:max_chars].rstrip() + "…"
+    return detail or None
+
+def to_scheduled_event(event: Dict[str, Any], tz: tzinfo) -> Optional[ScheduledEvent]:
+    """Converts a Google Calendar event resource; events without a start are dropped."""
+    start, end = event_bounds(event, tz)
+    if start is None:
+        return None
+    if end is None or end < start:
+        end = start
+    return ScheduledEvent(
+        title=" ".join((event.get("summary") or "").split()) or "(No title)",
+        start=start.astimezone(tz),
+        end=end.astimezone(tz),
+        all_day="date" in (event.get("start") or {}),
+        detail=event_detail(event),
+    )
+
+def group_overlaps(events: List[ScheduledEvent]) -> List[List[ScheduledEvent]]:
+    """
+    Groups timed events that overlap, directly or through a chain of overlaps, into blocks.
+    Args:
+        events: Timed events sorted by start.
+    Returns:
+        The blocks in order; an event that overlaps nothing is a block of one.
+    """
+    blocks: List[List[ScheduledEvent]] = []
+    block_end = None
+    for event in events:
+        if blocks and event.start < block_end:
+            blocks[-1].append(event)
+            block_end = max(block_end, event.end)
+        else:
+            blocks.append([event])
+            block_end = event.end
+    return blocks
+
+def format_time(moment: datetime) -> str:
+    """12-hour clock without a leading zero, e.g. "9:05 AM", independent of the locale."""
+    return f"{moment.hour % 12 or 12}:{moment.minute:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+def format_day(day: date) -> str:
+    """E.g. "Monday, October 18"."""
+    return f"{day:%A}, {day:%B} {day.day}"
+
+def format_event(event: ScheduledEvent, bullet: str = "•") -> str:
+    when = "All day" if event.all_day else f"{format_time(event.start)} – {format_time(event.end)}"
+    line = f"{bullet} [{when}] {event.title}"
+    return f"{line} – {event.detail}" if event.detail else line
+
+def format_block(block: List[ScheduledEvent]) -> str:
+    if len(block) == 1:
+        return format_event(block[0])
+    end = max(event.end for event in block)
+    header = f"• [{format_time(block[0].start)} – {format_time(end)}] {len(block)} overlapping events"
+    return "\n".join([header, *(format_event(event, bullet="  ◦") for event in block)])
+
+def format_day_events(header: str, events: List[ScheduledEvent]) -> str:
+    """A day's section: all-day events first, then timed events with overlapping ones grouped."""
+    lines = [header]
+    lines += [format_event(item) for item in events if item.all_day]
+    lines += [format_block(block) for block in group_overlaps([item for item in events if not item.all_day])]
+    return "\n".join(lines)
+
+def format_tips(intro: str) -> str:
+    return "\n".join([intro, *(f"• {tip}" for tip in FREE_DAY_TIPS)])
+
+def render_schedule(
+    events: List[Dict[str, Any]],
+    tz: tzinfo,
+    now: Optional[datetime] = None,
+    triggers: Iterable[str] = ()
+) -> List[str]:
+    """
+    Renders the answer to "what's on my schedule" without the model, following steps 2–6 of
+    CALENDAR_SCHEDULE_PROMPT: the events that have not ended yet today, with overlapping ones grouped;
+    if there are none, up to three of tomorrow's events; if tomorrow is free as well, a few tips.
+    A question about a specific window ("today", "tomorrow", "this week", "next week") gets that window
+    instead, day by day, without looking past it.
+    Args:
+        events: Google Calendar event resources covering the window, as fetched for `triggers`.
+        tz: The user's calendar time zone; day boundaries and times are local.
+        now: Current time, for tests.
+        triggers: Calendar triggers matched by the intent router; they select the window like `calendar_window`.
+    Returns:
+        The sections of the reply in order, starting with a greeting and without the closing line.
+    """
+    now = now or datetime.now(timezone.utc)
+    scheduled = [
+        item for item in (to_scheduled_event(event, tz) for event in events) if item is not None
+    ]
+    scheduled.sort(key=lambda item: (not item.all_day, item.start, item.end))
+
+    windows = {trigger for trigger in triggers if trigger in WINDOW_TRIGGERS}
+    if windows:
+        return [OPENING, *render_window(scheduled, tz, now, windows)]
+
+    today = now.astimezone(tz).date()
+    tomorrow_start = datetime.combine(today + timedelta(days=1), time.min, tzinfo=tz)
+    tomorrow_end = tomorrow_start + timedelta(days=1)
+
+    sections = [OPENING]
+    # Events in progress count as remaining
+    remaining = [item for item in scheduled if item.end > now and item.start < tomorrow_start]
+    if remaining:
+        sections.append(format_day_events(f"🗓️ Remaining Today – {format_day(today)}", remaining))
+        return sections
+
+    sections.append(NOTHING_LEFT_TODAY)
+    upcoming = [item for item in scheduled if item.start < tomorrow_end and item.end > tomorrow_start]
+    if upcoming:
+        lines = [f"🔮 Coming Up Tomorrow – {format_day(tomorrow_start.date())}"]
+        lines += [format_event(item) for item in upcoming[:MAX_TOMORROW_EVENTS]]
+        if len(upcoming) > MAX_TOMORROW_EVENTS:
+            lines.append(f"…and {len(upcoming) - MAX_TOMORROW_EVENTS} more.")
+        sections.append("\n".join(lines))
+    else:
+        sections.append(format_tips(FREE_TOMORROW))
+    return sections
+
+def render_window(scheduled: List[ScheduledEvent], tz: tzinfo, now: datetime, windows: Set[str]) -> List[str]:
+    """
+    One section per day of the requested window that has events; events that span days are listed on each.
+    Args:
+        scheduled: Events sorted like `render_schedule` sorts them.
+        windows: The window triggers matched, at least one.
+    """
+    window_start, window_end = calendar_window(windows, tz, now)
+    today = now.astimezone(tz).date()
+    sections = []
+    day = window_start.date()
+    while day < window_end.date():
+        day_start = max(window_start, datetime.combine(day, time.min, tzinfo=tz))
+        day_end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+        # Events in progress count as remaining
+        events = [item for item in scheduled if item.end > max(day_start, now) and item.start < day_end]
+        if events:
+            if day == today:
+                header = f"🗓️ Remaining Today – {format_day(day)}"
+            elif day == today + timedelta(days=1):
+                header = f"🔮 Tomorrow – {format_day(day)}"
+            else:
+                header = f"📅 {format_day(day)}"
+            sections.append(format_day_events(header, events))
+        day += timedelta(days=1)
+
+    if not sections:
+        period = WINDOW_PERIODS[next(iter(windows))] if len(windows) == 1 else "for that period"
+        sections.append(format_tips(FREE_WINDOW.format(period=period)))
+    return sections
+
+async def stream_rendered_schedule(events: list, tz, triggers: Iterable[str] = ()) -> AsyncGenerator[str, None]:
+    """
+    Answers a schedule question without waiting on the model: the rendered schedule is streamed at once,
+    followed by a short model-written note if SCHEDULE_RENDERER_LLM_GREETING is set, or the fixed closing line.
+    """
+    sections = render_schedule(events, tz, triggers=triggers)
+    for section in sections:
+        yield section + "\n\n"
+    if not settings.SCHEDULE_RENDERER_LLM_GREETING:
+        yield CLOSING
+        return
+
+    note_chunks = gemini_client.stream_chat([], SCHEDULE_GREETING_PROMPT.format(schedule="\n\n".join(sections)))
+    noted = False
+    try:
+        async for chunk in note_chunks:
+            noted = True
+            yield chunk
+    except Exception as e:
+        # The schedule has been delivered; a failed greeting must not turn it into an error
+        logger.warning("Error generating schedule greeting", extra={"error": str(e)})
+        if not noted:
+            yield CLOSING
+    finally:
+        await note_chunks.aclose()
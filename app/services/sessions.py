@@ -0,0 +1,220 @@
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.schemas.chat import ChatMessage
+from app.services.calendar_context import estimate_tokens
+
+@dataclass
+class ConversationSession:
+    id: str
+    user_id: str
+    # Only the most recent turns are kept in memory; the full history lives in SQLite
+    turns: List[ChatMessage] = field(default_factory=list)
+    next_seq: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+class SQLiteSessionBackend:
+    """Persistent session tier. Calls are blocking and are run off the event loop by the store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS turns (
+                    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def create(self, session_id: str, user_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO sessions (id, user_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, user_id, now, now)
+            )
+            conn.commit()
+
+    def load(self, session_id: str, recent_turns: int) -> Optional[Tuple[str, List[Tuple[int, str, str]]]]:
+        """Returns the owner and the most recent turns as (seq, role, content), oldest first."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT user_id FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            turns = conn.execute(
+                "SELECT seq, role, content FROM turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, recent_turns)
+            ).fetchall()
+        return row[0], list(reversed(turns))
+
+    def last_seq(self, session_id: str) -> Optional[int]:
+        """The seq of the session's latest turn, or None if it has none."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MAX(seq) FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def append(self, session_id: str, turns: List[Tuple[str, str]]) -> int:
+        """
+        Appends (role, content) turns after the session's latest one. The seqs are assigned inside a
+        write transaction, so workers appending to the same session never collide.
+        Returns:
+            The seq of the first appended turn.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                first = conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO turns (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, first + i, role, content, now) for i, (role, content) in enumerate(turns)]
+                )
+                conn.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+        return first
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def window_history(turns: List[ChatMessage], recent_turns: int, max_tokens: int) -> List[ChatMessage]:
+    """
+    Selects the history sent to the model: the latest `recent_turns` turns, verbatim,
+    dropping the oldest ones until the estimated size fits in `max_tokens`.
+    """
+    selected: List[ChatMessage] = []
+    used = 0
+    for turn in reversed(turns[-recent_turns:]):
+        cost = estimate_tokens(turn.content)
+        if used + cost > max_tokens:
+            break
+        selected.append(turn)
+        used += cost
+    selected.reverse()
+    # Gemini expects the history to start with a user turn
+    while selected and selected[0].role != 'user':
+        selected.pop(0)
+    return selected
+
+class SessionStore:
+    """
+    Server-side conversation sessions with an in-memory LRU tier in front of SQLite.
+    Clients send a session ID plus the new message; turns are appended incrementally.
+    Workers share the SQLite file, so a cached copy is checked against it before use.
+    """
+
+    def __init__(self, backend: SQLiteSessionBackend, max_cached: int, recent_turns: int, max_context_tokens: int):
+        self.backend = backend
+        self.max_cached = max_cached
+        self.recent_turns = recent_turns
+        self.max_context_tokens = max_context_tokens
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+
+    def _remember(self, session: ConversationSession) -> None:
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_cached:
+            self._sessions.popitem(last=False)
+
+    async def create(self, user_id: str) -> ConversationSession:
+        session = ConversationSession(id=str(uuid.uuid4()), user_id=user_id)
+        await asyncio.to_thread(self.backend.create, session.id, user_id)
+        self._remember(session)
+        return session
+
+    async def get(self, session_id: str, user_id: str) -> ConversationSession:
+        """
+        Loads a session owned by `user_id`.
+        Raises:
+            HTTPException: 404 if the session does not exist or belongs to another user.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            last_seq = await asyncio.to_thread(self.backend.last_seq, session_id)
+            if (last_seq if last_seq is not None else -1) + 1 != session.next_seq:
+                # Another worker appended to it since it was cached
+                session = None
+        if session is None:
+            loaded = await asyncio.to_thread(self.backend.load, session_id, self.recent_turns)
+            if loaded is not None:
+                owner, rows = loaded
+                session = ConversationSession(id=session_id, user_id=owner)
+                self._set_turns(session, rows)
+        if session is None or session.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        self._remember(session)
+        return session
+
+    @staticmethod
+    def _set_turns(session: ConversationSession, rows: List[Tuple[int, str, str]]) -> None:
+        session.turns = [ChatMessage(role=role, content=content) for _, role, content in rows]
+        session.next_seq = rows[-1][0] + 1 if rows else 0
+
+    async def get_or_create(self, session_id: Optional[str], user_id: str) -> ConversationSession:
+        if session_id:
+            return await self.get(session_id, user_id)
+        return await self.create(user_id)
+
+    def history(self, session: ConversationSession) -> List[ChatMessage]:
+        """The windowed history to send to the model for the next turn."""
+        return window_history(session.turns, self.recent_turns, self.max_context_tokens)
+
+    async def append(self, session: ConversationSession, turns: List[ChatMessage]) -> None:
+        """Appends turns to the session, in memory and in SQLite."""
+        async with session.lock:
+            first = await asyncio.to_thread(
+                self.backend.append, session.id, [(turn.role, turn.content) for turn in turns]
+            )
+            if first == session.next_seq:
+                session.next_seq += len(turns)
+                session.turns.extend(turns)
+                del session.turns[:-self.recent_turns]
+                return
+            # Another worker appended in between; the cached turns are missing theirs
+            loaded = await asyncio.to_thread(self.backend.load, session.id, self.recent_turns)
+            self._set_turns(session, loaded[1])
+
+    def close(self) -> None:
+        self.backend.close()
+
+session_store = SessionStore(
+    backend=SQLiteSessionBackend(settings.SESSION_DB_PATH),
+    max_cached=settings.SESSION_CACHE_MAX_ENTRIES,
+    recent_turns=settings.SESSION_RECENT_TURNS,
+    max_context_tokens=settings.SESSION_MAX_CONTEXT_TOKENS,
+)
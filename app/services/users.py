@@ -0,0 +1,75 @@
+from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.supabase_client import supabase
+
+# Cached entries are dropped this many seconds before the access token expires,
+# so a cache hit never hands out a token that is about to be rejected.
+TOKEN_EXPIRY_SKEW_SECONDS = 60
+
+user_metadata_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    default_ttl=settings.USER_CACHE_TTL_SECONDS,
+    name="user_metadata"
+)
+
+user_lookup_flight = SingleFlight("supabase_user_lookup")
+
+# Bumped by every invalidation; a lookup that started before one read metadata that may be outdated
+# and must not cache it. Shared by all users so it stays bounded; invalidations are rare next to lookups.
+_invalidations = 0
+
+def token_expiry_from_metadata(user_metadata: Dict[str, Any]) -> Optional[datetime]:
+    """
+    Parses `google_token_expiry` from user metadata.
+    Returns:
+        A naive UTC datetime (the form google-auth expects), or None if not present.
+    """
+    value = user_metadata.get("google_token_expiry")
+    if not value:
+        return None
+    expiry = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if expiry.tzinfo is not None:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return expiry
+
+def seconds_until_token_expiry(user_metadata: Dict[str, Any]) -> Optional[float]:
+    """Seconds the cached entry may live given the stored access token expiry, or None if there is none."""
+    expiry = token_expiry_from_metadata(user_metadata)
+    if expiry is None:
+        return None
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (expiry - now).total_seconds() - TOKEN_EXPIRY_SKEW_SECONDS
+
+async def get_user_metadata(user_id: str) -> Dict[str, Any]:
+    """
+    Retrieves a user's metadata, served from the in-process cache when possible.
+    Args:
+        user_id: The Supabase user ID.
+    Returns:
+        The user's metadata dictionary.
+    """
+    cached = user_metadata_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Concurrent cache misses for the same user share one Supabase round trip
+    return await user_lookup_flight.do(user_id, lambda: _fetch_user_metadata(user_id))
+
+async def _fetch_user_metadata(user_id: str) -> Dict[str, Any]:
+    generation = _invalidations
+    response = await supabase.get_user_by_id(user_id)
+    user_metadata = response.user.user_metadata
+    if generation == _invalidations:
+        user_metadata_cache.set(user_id, user_metadata, ttl=seconds_until_token_expiry(user_metadata))
+    return user_metadata
+
+def invalidate_user_metadata(user_id: str) -> None:
+    global _invalidations
+    _invalidations += 1
+    user_metadata_cache.invalidate(user_id)
+    # Callers from now on must not join a lookup that may have read the old metadata
+    user_lookup_flight.forget(user_id)
@@ -0,0 +1,50 @@
+"""
+Per-request auth overhead of `verify_supabase_token` with and without the
+verified-JWT cache, for a client that keeps reusing the same token.
+
+Usage:
+    python -m benchmarks.auth_cache [--iterations 20000] [--output report.json]
+"""
+import time
+import argparse
+
+from benchmarks.common import configure_env, emit
+
+configure_env()
+
+from jose import jwt  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.security import verified_token_cache, verify_supabase_token  # noqa: E402
+
+def make_token(lifetime: int = 3600) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": "user-1", "aud": "authenticated", "iat": now, "exp": now + lifetime, "role": "authenticated"},
+        settings.SUPABASE_JWT_SECRET,
+        algorithm="HS256"
+    )
+
+def measure(token: str, iterations: int, use_cache: bool) -> float:
+    verified_token_cache.clear()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verify_supabase_token(token, use_cache=use_cache)
+    return (time.perf_counter() - start) / iterations
+
+def main(args):
+    token = make_token()
+    uncached = measure(token, args.iterations, use_cache=False)
+    cached = measure(token, args.iterations, use_cache=True)
+    emit({
+        "iterations": args.iterations,
+        "uncached_us_per_request": round(uncached * 1e6, 3),
+        "cached_us_per_request": round(cached * 1e6, 3),
+        "speedup": round(uncached / cached, 1) if cached else None,
+        "cache": verified_token_cache.stats(),
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    main(parser.parse_args())
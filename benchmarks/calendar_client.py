@@ -0,0 +1,80 @@
+"""
+Load-tests the shared GoogleCalendarClient against an offline fake of the
+Calendar API, reporting throughput and latency for concurrent `events.list` calls.
+
+Usage:
+    python -m benchmarks.calendar_client [--latency-ms 80] [--requests 500] [--concurrency 50]
+    python -m benchmarks.calendar_client --base-url http://127.0.0.1:9100/calendar/v3
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.common import configure_env, summarize, emit
+
+configure_env()
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from app.services.integrations.google_calendar_client import GoogleCalendarClient  # noqa: E402
+
+def fake_calendar_transport(latency: float) -> httpx.MockTransport:
+    start = datetime.now(timezone.utc)
+    items = [
+        {
+            "id": f"event-{i}",
+            "status": "confirmed",
+            "summary": f"Event {i}",
+            "start": {"dateTime": (start + timedelta(hours=i)).isoformat()},
+            "end": {"dateTime": (start + timedelta(hours=i, minutes=30)).isoformat()},
+        }
+        for i in range(10)
+    ]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"items": items, "nextSyncToken": "sync-token", "timeZone": "UTC"})
+
+    return httpx.MockTransport(handler)
+
+async def main(args):
+    transport = None if args.base_url else fake_calendar_transport(args.latency_ms / 1000)
+    client = GoogleCalendarClient(base_url=args.base_url or "http://calendar.local/calendar/v3", transport=transport)
+    credentials = Credentials(
+        token="fake-token",
+        refresh_token="fake-refresh-token",
+        expiry=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1),
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await client.list_events(credentials, "primary", {"singleEvents": True, "maxResults": 250})
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - start
+
+    emit({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "requests_per_second": round(args.requests / elapsed, 1),
+        **summarize(samples),
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Calendar API root of a running fake; defaults to an in-process fake")
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+import os
+import json
+import statistics
+from typing import Dict, List
+
+# Placeholder settings so `app.core.config.Settings()` can be built offline.
+# Must be applied before anything under `app` is imported.
+BENCHMARK_ENV = {
+    "SUPABASE_URL": "http://supabase.local",
+    "SUPABASE_KEY": "anon-key",
+    "SUPABASE_SERVICE_KEY": "service-key",
+    "SUPABASE_JWT_SECRET": "benchmark-jwt-secret",
+    "GOOGLE_CLIENT_ID": "client-id",
+    "GOOGLE_CLIENT_SECRET": "client-secret",
+    "GOOGLE_API_KEY": "api-key",
+    "GOOGLE_CALENDAR_REDIRECT_URI": "http://localhost:8000/api/v1/integrations/google-calendar/callback",
+    "FRONTEND_URL": "http://localhost:3000",
+}
+
+def configure_env(overrides: Dict[str, str] = None):
+    """Sets placeholder env vars without clobbering values that are already set."""
+    for key, value in {**BENCHMARK_ENV, **(overrides or {})}.items():
+        os.environ.setdefault(key, value)
+
+def benchmark_env(overrides: Dict[str, str] = None) -> Dict[str, str]:
+    """
+    Environment for a server subprocess: the current env with the placeholder settings
+    and `overrides` forced on top, so upstream URLs always point at the local fakes.
+    """
+    return {**os.environ, **BENCHMARK_ENV, **(overrides or {})}
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+def emit(report: Dict, output: str = None):
+    """Prints the report as JSON and optionally writes it to a file."""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,340 @@
+"""
+Local stand-ins for the Supabase Auth, Google Calendar/OAuth and Gemini APIs,
+served from one FastAPI app, with injectable latency and failures.
+
+Calendar push channels opened through `events.watch` receive a "sync" message,
+then an "exists" notification every --notify-interval-ms (0: only on demand via
+POST /_fake/calendar/notify), posted to the channel address like Google does.
+
+Routes mirror the real APIs under these roots, so the server only needs its
+URLs pointed here:
+    SUPABASE_URL                  http://HOST:PORT
+    GOOGLE_CALENDAR_API_BASE_URL  http://HOST:PORT/calendar/v3
+    GOOGLE_TOKEN_URI              http://HOST:PORT/token
+    GOOGLE_TOKEN_REVOKE_URI       http://HOST:PORT/revoke
+    GEMINI_API_BASE_URL           http://HOST:PORT/v1beta
+
+Usage:
+    python -m benchmarks.fake_upstreams [--port 9100] [--latency-ms 50] [--failure-rate 0.01]
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from jose import jwt
+
+from benchmarks.common import BENCHMARK_ENV
+
+@dataclass
+class FakeUpstreamConfig:
+    """
+    Args:
+        latency_ms: Added to every upstream response.
+        jitter_ms: Uniform random extra latency on top of `latency_ms`.
+        failure_rate: Probability (0-1) that a request fails with 503 before doing any work.
+        calendars: Selected calendars per user, including the primary one.
+        events_per_calendar: Upcoming events returned per calendar.
+        gemini_chunks: Chunks per streamed Gemini reply.
+        gemini_chunk_delay_ms: Delay between streamed chunks, after the first one.
+        notify_interval_ms: Period of change notifications posted to every open calendar channel; 0 disables.
+        jwt_secret: Secret for the access tokens issued by the fake login; must match the server's.
+    """
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    failure_rate: float = 0.0
+    calendars: int = 2
+    events_per_calendar: int = 10
+    gemini_chunks: int = 20
+    gemini_chunk_delay_ms: float = 30.0
+    notify_interval_ms: float = 0.0
+    jwt_secret: str = BENCHMARK_ENV["SUPABASE_JWT_SECRET"]
+
+def user_id_for_email(email: str) -> str:
+    """Fake users are identified by their email's local part, e.g. user-7@example.com -> user-7."""
+    return email.split("@", 1)[0]
+
+def create_fake_upstreams(config: FakeUpstreamConfig) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    # Every response a fake served, by service, so a run can report upstream traffic
+    app.state.requests = {"supabase": 0, "google": 0, "gemini": 0}
+    app.state.failures = 0
+    # Open push channels by channel ID, and notifications posted to them by response status
+    app.state.channels = {}
+    app.state.notifications = {}
+    app.state.notifier = None
+
+    def injected(service: str):
+        async def inject_faults():
+            app.state.requests[service] += 1
+            await asyncio.sleep((config.latency_ms + random.uniform(0, config.jitter_ms)) / 1000)
+            if config.failure_rate and random.random() < config.failure_rate:
+                app.state.failures += 1
+                raise HTTPException(status_code=503, detail="Injected failure")
+        return Depends(inject_faults)
+
+    supabase_faults = injected("supabase")
+    google_faults = injected("google")
+    gemini_faults = injected("gemini")
+
+    def user_json(user_id: str) -> Dict[str, Any]:
+        expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+        return {
+            "id": user_id,
+            "email": f"{user_id}@example.com",
+            "user_metadata": {
+                "google_access_token": f"google-token-{user_id}",
+                "google_refresh_token": f"google-refresh-{user_id}",
+                "google_token_expiry": expiry.isoformat(),
+                "google_calendar_linked_email": f"{user_id}@example.com",
+            },
+        }
+
+    # Supabase Auth (GoTrue)
+
+    @app.get("/auth/v1/health")
+    async def supabase_health():
+        return {"name": "GoTrue", "version": "fake"}
+
+    @app.post("/auth/v1/token", dependencies=[supabase_faults])
+    async def supabase_token(request: Request):
+        body = await request.json()
+        user_id = user_id_for_email(body.get("email", "user-0@example.com"))
+        now = int(time.time())
+        access_token = jwt.encode(
+            {"sub": user_id, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + 3600},
+            config.jwt_secret,
+            algorithm="HS256",
+        )
+        return {
+            "access_token": access_token,
+            "refresh_token": f"refresh-{user_id}",
+            "expires_in": 3600,
+            "user": user_json(user_id),
+        }
+
+    @app.get("/auth/v1/admin/users/{user_id}", dependencies=[supabase_faults])
+    async def supabase_get_user(user_id: str):
+        return user_json(user_id)
+
+    @app.put("/auth/v1/admin/users/{user_id}", dependencies=[supabase_faults])
+    async def supabase_update_user(user_id: str, request: Request):
+        user = user_json(user_id)
+        user["user_metadata"].update((await request.json()).get("user_metadata") or {})
+        return user
+
+    @app.get("/auth/v1/admin/users", dependencies=[supabase_faults])
+    async def supabase_list_users(page: int = 1, per_page: int = 50):
+        return {"users": []}
+
+    # Google OAuth token endpoint and Calendar API
+
+    @app.api_route("/token", methods=["POST", "HEAD"], dependencies=[google_faults])
+    async def google_token():
+        return {"access_token": f"google-token-{random.getrandbits(32):x}", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.post("/revoke", dependencies=[google_faults])
+    async def google_revoke():
+        return {}
+
+    @app.api_route("/calendar/v3", methods=["GET", "HEAD"])
+    async def calendar_root():
+        return {}
+
+    calendar_ids = ["primary-calendar"] + [f"calendar-{i}" for i in range(1, config.calendars)]
+
+    @app.get("/calendar/v3/users/me/calendarList", dependencies=[google_faults])
+    async def calendar_list():
+        return {
+            "items": [
+                {"id": calendar_ids[0], "primary": True, "selected": True, "timeZone": "UTC"},
+                *({"id": calendar_id, "selected": True, "timeZone": "UTC"} for calendar_id in calendar_ids[1:]),
+            ]
+        }
+
+    @app.get("/calendar/v3/calendars/{calendar_id}", dependencies=[google_faults])
+    async def calendar_get(calendar_id: str):
+        return {"id": calendar_id, "summary": calendar_id, "timeZone": "UTC"}
+
+    def events_for(calendar_id: str) -> List[Dict[str, Any]]:
+        # Anchored to the hour so repeated full syncs see the same events
+        anchor = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        return [
+            {
+                "id": f"{calendar_id}-event-{i}",
+                "status": "confirmed",
+                "summary": f"Meeting {i} ({calendar_id})",
+                "description": "Agenda: status updates, blockers and next steps. " * 3,
+                "location": "Room 4",
+                "start": {"dateTime": (anchor + timedelta(hours=2 * i + 1)).isoformat()},
+                "end": {"dateTime": (anchor + timedelta(hours=2 * i + 1, minutes=45)).isoformat()},
+            }
+            for i in range(config.events_per_calendar)
+        ]
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events", dependencies=[google_faults])
+    async def calendar_events(
+        calendar_id: str,
+        maxResults: int = 250,
+        pageToken: Optional[str] = None,
+        syncToken: Optional[str] = None,
+    ):
+        if syncToken:
+            # Nothing changed since the last sync
+            return {"items": [], "nextSyncToken": syncToken, "timeZone": "UTC"}
+        events = events_for(calendar_id)
+        offset = int(pageToken or 0)
+        page = events[offset:offset + maxResults]
+        body: Dict[str, Any] = {"items": page, "timeZone": "UTC"}
+        if offset + maxResults < len(events):
+            body["nextPageToken"] = str(offset + maxResults)
+        else:
+            body["nextSyncToken"] = f"sync-{calendar_id}"
+        return body
+
+    async def post_notification(channel: Dict[str, Any], state: str) -> None:
+        channel["message_number"] += 1
+        headers = {
+            "X-Goog-Channel-ID": channel["id"],
+            "X-Goog-Message-Number": str(channel["message_number"]),
+            "X-Goog-Resource-ID": channel["resourceId"],
+            "X-Goog-Resource-State": state,
+            "X-Goog-Resource-URI": channel["resourceUri"],
+        }
+        if channel.get("token"):
+            headers["X-Goog-Channel-Token"] = channel["token"]
+        try:
+            response = await app.state.notify_client.post(channel["address"], headers=headers)
+            outcome = str(response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        app.state.notifications[outcome] = app.state.notifications.get(outcome, 0) + 1
+
+    async def notify_all(calendar_id: Optional[str] = None) -> int:
+        channels = [
+            channel for channel in list(app.state.channels.values())
+            if calendar_id is None or channel["calendarId"] == calendar_id
+        ]
+        await asyncio.gather(*(post_notification(channel, "exists") for channel in channels))
+        return len(channels)
+
+    async def notify_periodically():
+        while True:
+            await asyncio.sleep(config.notify_interval_ms / 1000)
+            await notify_all()
+
+    @app.on_event("startup")
+    async def start_notifier():
+        app.state.notify_client = httpx.AsyncClient(timeout=10.0)
+        if config.notify_interval_ms > 0:
+            app.state.notifier = asyncio.create_task(notify_periodically())
+
+    @app.on_event("shutdown")
+    async def stop_notifier():
+        if app.state.notifier is not None:
+            app.state.notifier.cancel()
+        await app.state.notify_client.aclose()
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events/watch", dependencies=[google_faults])
+    async def calendar_watch(calendar_id: str, request: Request):
+        body = await request.json()
+        ttl = int((body.get("params") or {}).get("ttl", 604800))
+        channel = {
+            "kind": "api#channel",
+            "id": body["id"],
+            "resourceId": f"resource-{calendar_id}",
+            "resourceUri": f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
+            "token": body.get("token"),
+            "expiration": str(int((time.time() + ttl) * 1000)),
+        }
+        app.state.channels[body["id"]] = {
+            **channel, "address": body["address"], "calendarId": calendar_id, "message_number": 0
+        }
+        # Google confirms a new channel with a "sync" message right away
+        asyncio.create_task(post_notification(app.state.channels[body["id"]], "sync"))
+        return channel
+
+    @app.post("/calendar/v3/channels/stop", dependencies=[google_faults])
+    async def calendar_channel_stop(request: Request):
+        body = await request.json()
+        channel = app.state.channels.get(body.get("id"))
+        if channel is None or channel["resourceId"] != body.get("resourceId"):
+            raise HTTPException(status_code=404, detail="Channel not found")
+        del app.state.channels[body["id"]]
+        return Response(status_code=204)
+
+    @app.post("/_fake/calendar/notify")
+    async def fake_notify(calendar_id: Optional[str] = None):
+        """Posts a change notification to every open channel, or to those watching `calendar_id`."""
+        return {"notified": await notify_all(calendar_id)}
+
+    # Gemini
+
+    @app.get("/v1beta/models/{model}")
+    async def gemini_model(model: str):
+        return {"name": f"models/{model}"}
+
+    @app.post("/v1beta/models/{model_method}", dependencies=[gemini_faults])
+    async def gemini_stream(model_method: str):
+        if not model_method.endswith(":streamGenerateContent"):
+            return JSONResponse({"error": {"message": "Unsupported method"}}, status_code=404)
+
+        async def events():
+            for i in range(config.gemini_chunks):
+                if i:
+                    await asyncio.sleep(config.gemini_chunk_delay_ms / 1000)
+                payload = {"candidates": [{"content": {"role": "model", "parts": [{"text": f"Chunk {i} of the reply. "}]}}]}
+                if i == config.gemini_chunks - 1:
+                    payload["usageMetadata"] = {"candidatesTokenCount": config.gemini_chunks * 6}
+                yield f"data: {json.dumps(payload)}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return {
+            "requests": app.state.requests,
+            "failures": app.state.failures,
+            "channels": len(app.state.channels),
+            "notifications": app.state.notifications,
+        }
+
+    return app
+
+def main(args):
+    config = FakeUpstreamConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        calendars=args.calendars,
+        events_per_calendar=args.events_per_calendar,
+        gemini_chunks=args.gemini_chunks,
+        gemini_chunk_delay_ms=args.gemini_chunk_delay_ms,
+        notify_interval_ms=args.notify_interval_ms,
+    )
+    uvicorn.run(create_fake_upstreams(config), host=args.host, port=args.port, log_level="warning")
+
+def add_fake_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--calendars", type=int, default=2)
+    parser.add_argument("--events-per-calendar", type=int, default=10)
+    parser.add_argument("--gemini-chunks", type=int, default=20)
+    parser.add_argument("--gemini-chunk-delay-ms", type=float, default=30.0)
+    parser.add_argument("--notify-interval-ms", type=float, default=0.0, help="Calendar change notifications to every channel; 0 disables")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_fake_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,107 @@
+"""
+Import-time profile of the app, with a startup budget.
+
+Imports `app.main` in fresh interpreters under `python -X importtime`, reports the
+median wall time of the import, the slowest modules and the time spent per
+top-level package, and exits non-zero when the median exceeds the budget or when
+a module that must load lazily was imported with the app.
+
+Usage:
+    python -m benchmarks.import_time [--runs 5] [--budget-ms 1000] [--top 15]
+    python -m benchmarks.import_time --forbid jose,google.oauth2 --output import_time.json
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+from benchmarks.common import benchmark_env, emit
+
+# Loaded on first use or in the lifespan preload, never by importing the app
+DEFAULT_FORBIDDEN = "google_auth_oauthlib,google.oauth2,jose,jwt"
+
+CHILD = """
+import sys, json, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_s": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for each line of `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+def profile_once() -> Tuple[float, List[str], List[Tuple[str, int, int]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        env=benchmark_env(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing app.main failed:\n{result.stderr[-4000:]}")
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    return output["import_s"], output["modules"], parse_importtime(result.stderr)
+
+def forbidden_imports(modules: List[str], forbidden: List[str]) -> List[str]:
+    return sorted(
+        module for module in modules
+        if any(module == name or module.startswith(name + ".") for name in forbidden)
+    )
+
+def main(args):
+    forbidden = [name for name in args.forbid.split(",") if name]
+    durations = []
+    for _ in range(args.runs):
+        elapsed, modules, rows = profile_once()
+        durations.append(elapsed)
+
+    # Module breakdown from the last run; its shape does not change between runs
+    by_package: Dict[str, int] = {}
+    for module, self_us, _ in rows:
+        package = module.split(".", 1)[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    median_ms = statistics.median(durations) * 1000
+    leaked = forbidden_imports(modules, forbidden)
+    report = {
+        "config": {"runs": args.runs, "budget_ms": args.budget_ms, "forbidden": forbidden},
+        "import_ms": {
+            "median": round(median_ms, 1),
+            "min": round(min(durations) * 1000, 1),
+            "max": round(max(durations) * 1000, 1),
+        },
+        "modules_loaded": len(modules),
+        "slowest_modules_self_ms": {module: round(self_us / 1000, 2) for module, self_us, _ in slowest},
+        "packages_self_ms": {package: round(us / 1000, 2) for package, us in packages},
+        "forbidden_imported": leaked,
+        "within_budget": median_ms <= args.budget_ms and not leaked,
+    }
+    emit(report, args.output)
+
+    if median_ms > args.budget_ms:
+        sys.exit(f"Importing app.main took {median_ms:.0f} ms (median of {args.runs}), over the {args.budget_ms:.0f} ms budget")
+    if leaked:
+        sys.exit(f"Modules that must load lazily were imported with the app: {', '.join(leaked)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time; the median is checked")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Maximum median import time of app.main")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help=f"Comma-separated modules that must not load at import, default {DEFAULT_FORBIDDEN}")
+    parser.add_argument("--top", type=int, default=15, help="Modules and packages to list")
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Accuracy and per-message cost of the compiled intent router against the
+previous substring scan, over a labelled message set.
+
+Usage:
+    python -m benchmarks.intent_router [--iterations 2000] [--output report.json]
+"""
+import time
+import argparse
+
+from benchmarks.common import emit
+from app.services.intents import CALENDAR_INTENT, GREETING_INTENT, IntentRouter, intent_router
+
+# (message, expected top intent or None)
+LABELLED_MESSAGES = [
+    ("hi", GREETING_INTENT),
+    ("Hi there!", GREETING_INTENT),
+    ("hey zeno", GREETING_INTENT),
+    ("Hello", GREETING_INTENT),
+    ("Good morning!", GREETING_INTENT),
+    ("good   evening", GREETING_INTENT),
+    ("Greetings, assistant", GREETING_INTENT),
+    ("What's on my calendar?", CALENDAR_INTENT),
+    ("what’s on today", CALENDAR_INTENT),
+    ("what is on tomorrow", CALENDAR_INTENT),
+    ("Show me my schedule", CALENDAR_INTENT),
+    ("Any appointments this week?", CALENDAR_INTENT),
+    ("What events do I have next week?", CALENDAR_INTENT),
+    ("hi, what's my schedule today?", CALENDAR_INTENT),
+    ("How's today's plan looking?", CALENDAR_INTENT),
+    ("I think this is a good idea", None),
+    ("Which book should I read?", None),
+    ("This function throws an exception", None),
+    ("Can you help me write an email?", None),
+    ("Summarize the history of Rome", None),
+    ("They said the eventual outcome was fine", None),
+    ("Is high intensity training worth it?", None),
+    ("Chill out", None),
+    ("Give me some ideas for a birthday gift", None),
+    ("Whitespace matters in Python", None),
+]
+
+LEGACY_GREETINGS = ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"]
+LEGACY_CALENDAR = ["calendar", "schedule", "events", "what's on", "what is on", "appointments", "today", "tomorrow", "this week", "next week"]
+
+def legacy_is_match(message: str) -> bool:
+    normalized = message.lower()
+    return any(g in normalized for g in LEGACY_GREETINGS) or any(k in normalized for k in LEGACY_CALENDAR)
+
+def evaluate(router: IntentRouter) -> dict:
+    correct_intent = 0
+    correct_binary = 0
+    misses = []
+    for message, expected in LABELLED_MESSAGES:
+        top = router.top_intent(message)
+        predicted = top.intent if top else None
+        correct_intent += predicted == expected
+        correct_binary += (predicted is not None) == (expected is not None)
+        if predicted != expected:
+            misses.append({"message": message, "expected": expected, "predicted": predicted})
+    total = len(LABELLED_MESSAGES)
+    return {
+        "intent_accuracy": round(correct_intent / total, 4),
+        "trigger_accuracy": round(correct_binary / total, 4),
+        "misses": misses,
+    }
+
+def evaluate_legacy() -> dict:
+    correct = sum(legacy_is_match(m) == (e is not None) for m, e in LABELLED_MESSAGES)
+    return {"trigger_accuracy": round(correct / len(LABELLED_MESSAGES), 4)}
+
+def cost_per_message(fn, iterations: int) -> float:
+    messages = [m for m, _ in LABELLED_MESSAGES]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (iterations * len(messages))
+
+def main(args):
+    intent_router.route("warm up the compiled pattern")
+    emit({
+        "messages": len(LABELLED_MESSAGES),
+        "legacy_substring_scan": {
+            **evaluate_legacy(),
+            "microseconds_per_message": round(cost_per_message(legacy_is_match, args.iterations) * 1e6, 3),
+        },
+        "intent_router": {
+            **evaluate(intent_router),
+            "microseconds_per_message": round(cost_per_message(intent_router.route, args.iterations) * 1e6, 3),
+        },
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    main(parser.parse_args())
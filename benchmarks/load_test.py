@@ -0,0 +1,262 @@
+"""
+End-to-end load test of the real FastAPI app against local fake upstreams.
+
+Starts `benchmarks.fake_upstreams` and the app through `serve.py` as subprocesses, with
+every upstream URL pointed at the fakes, logs in a pool of users, then drives a
+weighted mix of login, integration status, calendar events and streaming chat
+requests. Reports throughput, latency percentiles and chat time-to-first-chunk
+as JSON, so runs from two versions can be diffed.
+
+Usage:
+    python -m benchmarks.load_test [--duration 30] [--concurrency 50] [--users 200]
+    python -m benchmarks.load_test --mix login=1,status=2,events=4,chat=3 --output before.json
+    python -m benchmarks.load_test --latency-ms 150 --failure-rate 0.02 --gemini-chunk-delay-ms 50
+    python -m benchmarks.load_test --push --notify-interval-ms 5000
+    python -m benchmarks.load_test --mix chat=1 --llm-schedule --output llm_schedule.json
+"""
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import benchmark_env, emit, summarize
+from benchmarks.fake_upstreams import add_fake_arguments
+
+API = "/api/v1"
+PASSWORD = "benchmark-password"
+CHAT_MESSAGES = [
+    "Hi! What's on my schedule?",
+    "Hi! What's on my calendar today?",
+    "What do I have tomorrow?",
+    "Any appointments this week?",
+    "Can you help me write a short status update?",
+    "Give me three ideas to focus better this afternoon.",
+]
+DEFAULT_MIX = "login=1,status=2,events=4,chat=3"
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    first_chunk: List[float] = field(default_factory=list)
+    status_codes: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, status: str, latency: float, ok: bool) -> None:
+        self.latencies.append(latency)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> Dict:
+        report = {
+            "requests_per_second": round(len(self.latencies) / elapsed, 1),
+            "errors": self.errors,
+            "status_codes": self.status_codes,
+            **summarize(self.latencies),
+        }
+        if self.first_chunk:
+            report["time_to_first_chunk"] = summarize(self.first_chunk)
+        return report
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("login", "status", "events", "chat"):
+            raise argparse.ArgumentTypeError(f"Unknown request type '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not become ready within {timeout}s")
+        await asyncio.sleep(0.2)
+
+def start_processes(args, session_dir: str):
+    fake_port, app_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake_args = [
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--failure-rate", str(args.failure_rate),
+        "--calendars", str(args.calendars),
+        "--events-per-calendar", str(args.events_per_calendar),
+        "--gemini-chunks", str(args.gemini_chunks),
+        "--gemini-chunk-delay-ms", str(args.gemini_chunk_delay_ms),
+        "--notify-interval-ms", str(args.notify_interval_ms),
+    ]
+    env = benchmark_env({
+        "SUPABASE_URL": fake_url,
+        "GOOGLE_CALENDAR_API_BASE_URL": f"{fake_url}/calendar/v3",
+        "GOOGLE_TOKEN_URI": f"{fake_url}/token",
+        "GOOGLE_TOKEN_REVOKE_URI": f"{fake_url}/revoke",
+        "GEMINI_API_BASE_URL": f"{fake_url}/v1beta",
+        "SESSION_DB_PATH": f"{session_dir}/sessions.db",
+        # Measure the server, not the per-user rate limiter
+        "CHAT_RATE_LIMIT_PER_MINUTE": "1000000",
+        "CHAT_RATE_LIMIT_BURST": "1000000",
+        "LOG_LEVEL": "WARNING",
+        "GOOGLE_CALENDAR_CHANNEL_DB_PATH": f"{session_dir}/calendar_channels.db",
+        "DIGEST_DB_PATH": f"{session_dir}/digests.db",
+        "RATE_LIMIT_DB_PATH": f"{session_dir}/rate_limits.db",
+        "PROCESS_LOCK_DIR": session_dir,
+    })
+    if args.llm_schedule:
+        env["SCHEDULE_RENDERER_ENABLED"] = "false"
+    if args.push:
+        # The fakes post calendar notifications straight back to the app
+        env["GOOGLE_CALENDAR_WEBHOOK_URL"] = f"http://127.0.0.1:{app_port}{API}/integrations/google-calendar/notifications"
+    fakes = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_upstreams", "--port", str(fake_port), *fake_args], env=env
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, "serve.py",
+            "--host", "127.0.0.1", "--port", str(app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--graceful-timeout", "5",
+        ],
+        env=env,
+    )
+    return fakes, server, fake_url, f"http://127.0.0.1:{app_port}"
+
+async def login(client: httpx.AsyncClient, user: int) -> httpx.Response:
+    return await client.post(f"{API}/auth/login", json={"email": f"user-{user}@example.com", "password": PASSWORD})
+
+async def run_one(kind: str, client: httpx.AsyncClient, tokens: List[str], stats: Dict[str, EndpointStats]) -> None:
+    user = random.randrange(len(tokens))
+    headers = {"Authorization": f"Bearer {tokens[user]}"}
+    start = time.perf_counter()
+    try:
+        if kind == "login":
+            response = await login(client, user)
+        elif kind == "status":
+            response = await client.get(f"{API}/integrations/status", headers=headers)
+        elif kind == "events":
+            response = await client.get(f"{API}/integrations/google-calendar/events", headers=headers)
+        else:
+            first_chunk_at = None
+            async with client.stream(
+                "POST", f"{API}/chat/", headers=headers, json={"message": random.choice(CHAT_MESSAGES)}
+            ) as response:
+                async for chunk in response.aiter_bytes():
+                    if chunk and first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+            if first_chunk_at is not None and response.is_success:
+                stats[kind].first_chunk.append(first_chunk_at - start)
+        stats[kind].record(str(response.status_code), time.perf_counter() - start, response.is_success)
+    except httpx.HTTPError as e:
+        stats[kind].record(type(e).__name__, time.perf_counter() - start, False)
+
+async def drive(args, app_url: str, fake_url: str) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=timeout) as client:
+        await wait_until_ready(client, f"{fake_url}/_fake/stats", args.startup_timeout)
+        await wait_until_ready(client, f"{app_url}/health/ready", args.startup_timeout)
+
+        # Log every user in up front; these requests are not part of the measurement
+        responses = await asyncio.gather(*(login(client, user) for user in range(args.users)))
+        tokens = [response.json()["access_token"] for response in responses if response.is_success]
+        if not tokens:
+            raise RuntimeError("No benchmark user could log in")
+
+        mix = args.mix
+        kinds, weights = list(mix), list(mix.values())
+        stats = {kind: EndpointStats() for kind in kinds}
+        deadline = time.monotonic() + args.duration
+
+        async def worker():
+            while time.monotonic() < deadline:
+                await run_one(random.choices(kinds, weights)[0], client, tokens, stats)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        upstream = (await client.get(f"{fake_url}/_fake/stats")).json()
+
+    all_latencies = [latency for endpoint in stats.values() for latency in endpoint.latencies]
+    return {
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "users": len(tokens),
+            "mix": mix,
+            "upstream_latency_ms": args.latency_ms,
+            "upstream_jitter_ms": args.jitter_ms,
+            "upstream_failure_rate": args.failure_rate,
+            "calendars": args.calendars,
+            "events_per_calendar": args.events_per_calendar,
+            "gemini_chunks": args.gemini_chunks,
+            "gemini_chunk_delay_ms": args.gemini_chunk_delay_ms,
+            "push": args.push,
+            "notify_interval_ms": args.notify_interval_ms,
+        },
+        "total": {
+            "requests_per_second": round(len(all_latencies) / elapsed, 1),
+            "errors": sum(endpoint.errors for endpoint in stats.values()),
+            **summarize(all_latencies),
+        },
+        "endpoints": {kind: endpoint.report(elapsed) for kind, endpoint in stats.items()},
+        "upstream": upstream,
+    }
+
+def stop_processes(*processes: subprocess.Popen) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def run(args) -> Dict:
+    """One load test run against freshly started fakes and app."""
+    with tempfile.TemporaryDirectory() as session_dir:
+        fakes, server, fake_url, app_url = start_processes(args, session_dir)
+        try:
+            return asyncio.run(drive(args, app_url, fake_url))
+        finally:
+            stop_processes(server, fakes)
+
+def add_load_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent client connections")
+    parser.add_argument("--users", type=int, default=200, help="Distinct users in the pool")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Request weights, default {DEFAULT_MIX}")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    parser.add_argument("--push", action="store_true", help="Enable calendar push channels, with the fakes as Google")
+    parser.add_argument("--llm-schedule", action="store_true", help="Have the model format schedule replies instead of the server")
+    add_fake_arguments(parser)
+
+def main(args):
+    emit(run(args), args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the app")
+    add_load_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""
+Measures how many concurrent Supabase admin lookups one worker can serve
+with the old blocking SDK-style calls versus the async adapter.
+
+Usage:
+    python -m benchmarks.supabase_concurrency [--latency-ms 50] [--output report.json]
+"""
+import time
+import asyncio
+import argparse
+import httpx
+
+from benchmarks.common import configure_env, summarize, emit
+
+configure_env()
+
+from app.db.supabase_client import SupabaseClient  # noqa: E402
+
+USER_BODY = {"id": "user-1", "email": "user@example.com", "user_metadata": {}}
+
+def blocking_transport(latency: float) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency)
+        return httpx.Response(200, json=USER_BODY)
+    return httpx.MockTransport(handler)
+
+def async_transport(latency: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=USER_BODY)
+    return httpx.MockTransport(handler)
+
+async def run_blocking(concurrency: int, latency: float) -> list:
+    # Mirrors the previous behaviour: a synchronous HTTP call inside an async handler
+    client = httpx.Client(transport=blocking_transport(latency))
+
+    async def timed():
+        start = time.perf_counter()
+        client.get("http://supabase.local/auth/v1/admin/users/user-1")
+        return time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*(timed() for _ in range(concurrency)))
+    finally:
+        client.close()
+
+async def run_async(concurrency: int, latency: float) -> list:
+    client = SupabaseClient(transport=async_transport(latency))
+
+    async def timed():
+        start = time.perf_counter()
+        await client.get_user_by_id("user-1")
+        return time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*(timed() for _ in range(concurrency)))
+    finally:
+        await client.aclose()
+
+async def measure(runner, concurrency: int, latency: float) -> dict:
+    start = time.perf_counter()
+    samples = await runner(concurrency, latency)
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": round(concurrency / elapsed, 1),
+        **summarize(samples),
+    }
+
+def max_sustainable(results: list, latency: float, slo_factor: float) -> int:
+    """Highest concurrency whose p95 stays within `slo_factor` x the upstream latency."""
+    best = 0
+    for result in results:
+        if result["p95_ms"] <= latency * 1000 * slo_factor:
+            best = max(best, result["concurrency"])
+    return best
+
+async def main(args):
+    latency = args.latency_ms / 1000
+    report = {"latency_ms": args.latency_ms, "slo_factor": args.slo_factor}
+    for name, runner in (("blocking_sdk", run_blocking), ("async_adapter", run_async)):
+        results = [await measure(runner, c, latency) for c in args.concurrency]
+        report[name] = {
+            "results": results,
+            "max_concurrency_within_slo": max_sustainable(results, latency, args.slo_factor),
+        }
+    emit(report, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated Supabase round-trip latency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--slo-factor", type=float, default=2.0)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""
+Throughput of the app as the number of worker processes grows.
+
+Runs `benchmarks.load_test` once per worker count, each against freshly started
+fakes and a fresh `serve.py`, and reports requests per second and latency per
+run plus the speedup over the first worker count. Upstream latency defaults to
+a few milliseconds so the app's own CPU, not waiting on the fakes, is the limit.
+
+The fakes run in a single process; if the speedup flattens while the fakes'
+process is saturated, raise --latency-ms so the app stays the bottleneck.
+
+Usage:
+    python -m benchmarks.worker_scaling [--workers 1,2,4] [--duration 20] [--concurrency 100]
+    python -m benchmarks.worker_scaling --mix events=1 --output scaling.json
+"""
+import argparse
+from copy import copy
+from typing import Dict, List
+
+from benchmarks.common import emit
+from benchmarks.load_test import add_load_arguments, run
+
+def parse_workers(value: str) -> List[int]:
+    try:
+        counts = [int(part) for part in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid worker counts '{value}'")
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError("Worker counts must be positive")
+    return counts
+
+def main(args):
+    runs: List[Dict] = []
+    for workers in args.workers:
+        run_args = copy(args)
+        run_args.workers = workers
+        report = run(run_args)
+        runs.append({
+            "workers": workers,
+            "requests_per_second": report["total"]["requests_per_second"],
+            "errors": report["total"]["errors"],
+            "p50_ms": report["total"]["p50_ms"],
+            "p99_ms": report["total"]["p99_ms"],
+        })
+
+    baseline = runs[0]["requests_per_second"] or 1.0
+    for result in runs:
+        result["speedup"] = round(result["requests_per_second"] / baseline, 2)
+
+    emit({
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "mix": args.mix,
+            "upstream_latency_ms": args.latency_ms,
+        },
+        "runs": runs,
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=parse_workers, default=parse_workers("1,2,4"), help="Comma-separated worker counts")
+    add_load_arguments(parser)
+    parser.set_defaults(duration=20.0, concurrency=100, latency_ms=2.0, jitter_ms=1.0, gemini_chunk_delay_ms=5.0)
+    main(parser.parse_args())
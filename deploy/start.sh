@@ -4,5 +4,7 @@ set -e
 # Activate the virtual environment
 source "${VENV_ROOT}/bin/activate"
 
-# Start the FastAPI app with uvicorn
-uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
\ No newline at end of file
+# Start the production server: one worker per available core (override with WEB_CONCURRENCY),
+# draining in-flight chat streams for up to GRACEFUL_SHUTDOWN_SECONDS on SIGTERM.
+# exec so the server receives the platform's SIGTERM directly.
+exec python serve.py --port "${PORT:-8000}"
@@ -0,0 +1,178 @@
+"""
+Production entry point.
+
+Runs the app under uvicorn with one worker process per available core, the
+uvloop event loop and httptools parser when installed (`uvicorn[standard]`),
+and keep-alive/backlog settings suited to running behind a load balancer.
+
+On SIGTERM each worker stops accepting connections, fails readiness and turns
+away new chats, and lets in-flight responses, including streaming chats,
+finish for up to --graceful-timeout seconds before cancelling them.
+
+Workers do not share memory: caches, the calendar event store and the chat
+stream replay buffer are per worker, and background jobs (token refresh,
+calendar channel renewal) run in one worker per host. Chat rate limits are
+shared through SQLite and the concurrency limits are split between workers.
+Metrics are merged across workers on scrape, and /debug/cache-stats lists
+each worker. Resuming a chat event stream (`Last-Event-ID`) only works on the
+worker that produced it, so route resumes stickily (e.g. by user or session
+at the load balancer); elsewhere they get 410.
+
+Usage:
+    python serve.py [--workers N] [--port 8000] [--graceful-timeout 60]
+
+Every option can also be set through the environment variable shown in --help.
+"""
+import os
+import math
+import shutil
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import importlib.util
+import multiprocessing
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from app.core.lifecycle import begin_drain
+from app.core.metrics import clear_worker_metrics
+
+# uvicorn configures this logger when the Config is built
+logger = logging.getLogger("uvicorn.error")
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring CPU affinity and a cgroup v2 quota (containers)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def _fastest(preferred: str, module: str) -> str:
+    return preferred if importlib.util.find_spec(module) is not None else "auto"
+
+class DrainingServer(uvicorn.Server):
+    """Flags the app as draining before uvicorn starts its graceful shutdown."""
+
+    def handle_exit(self, sig, frame) -> None:
+        begin_drain()
+        super().handle_exit(sig, frame)
+
+def run_worker(config: uvicorn.Config, sockets) -> None:
+    # Runs in a freshly spawned interpreter; logging is per process
+    config.configure_logging()
+    DrainingServer(config=config).run(sockets=sockets)
+
+class WorkerSupervisor:
+    """
+    Runs the server in `workers` processes sharing one listening socket, through uvicorn's public
+    Config/Server API only. Crashed workers are replaced; SIGINT or SIGTERM is forwarded to every
+    worker as SIGTERM, so each one drains, and the supervisor waits for them to finish.
+    """
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.processes = []
+        self.should_exit = threading.Event()
+        self.context = multiprocessing.get_context("spawn")
+
+    def _start_worker(self, sock):
+        process = self.context.Process(target=run_worker, args=(self.config, [sock]))
+        process.start()
+        return process
+
+    def _handle_exit(self, sig, frame) -> None:
+        self.should_exit.set()
+
+    def run(self) -> None:
+        sock = self.config.bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._handle_exit)
+        self.processes = [self._start_worker(sock) for _ in range(self.workers)]
+        while not self.should_exit.wait(0.5):
+            for index, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                if process.exitcode == STARTUP_FAILURE:
+                    # Restarting would fail the same way
+                    logger.error("Worker %d failed to start, shutting down", process.pid)
+                    self.should_exit.set()
+                else:
+                    logger.warning("Worker %d exited with code %s, restarting it", process.pid, process.exitcode)
+                    self.processes[index] = self._start_worker(sock)
+
+        for process in self.processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        # Workers cancel what is still running after their own graceful timeout
+        deadline = (self.config.timeout_graceful_shutdown or 0) + 10
+        for process in self.processes:
+            process.join(deadline)
+            if process.is_alive():
+                logger.warning("Worker %d did not stop in time, killing it", process.pid)
+                process.kill()
+                process.join()
+        sock.close()
+
+def main(args) -> None:
+    # Workers split host-wide limits (e.g. chat concurrency) by this count
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=_fastest("uvloop", "uvloop"),
+        http=_fastest("httptools", "httptools"),
+        backlog=args.backlog,
+        # Longer than the load balancer's idle timeout, so the balancer closes idle connections first
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        access_log=args.access_log,
+        log_level=args.log_level,
+    )
+    logger.info("Serving with %d worker(s), loop=%s, http=%s", args.workers, config.loop, config.http)
+    if args.workers > 1:
+        # Each worker publishes its metrics here, so /metrics on any of them covers the whole server
+        metrics_dir = os.environ.get("METRICS_MULTIPROCESS_DIR")
+        created = metrics_dir is None
+        if created:
+            metrics_dir = tempfile.mkdtemp(prefix="zeno-metrics-")
+            os.environ["METRICS_MULTIPROCESS_DIR"] = metrics_dir
+        clear_worker_metrics(metrics_dir)
+        try:
+            WorkerSupervisor(config, args.workers).run()
+        finally:
+            if created:
+                shutil.rmtree(metrics_dir, ignore_errors=True)
+    else:
+        DrainingServer(config=config).run()
+
+def _env(name: str, default):
+    return type(default)(os.environ.get(name, default))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=_env("HOST", "0.0.0.0"), help="env HOST")
+    parser.add_argument("--port", type=int, default=_env("PORT", 8000), help="env PORT")
+    parser.add_argument("--workers", type=int, default=_env("WEB_CONCURRENCY", available_cpus()), help="env WEB_CONCURRENCY; defaults to the available CPUs")
+    parser.add_argument("--backlog", type=int, default=_env("BACKLOG", 2048), help="env BACKLOG")
+    parser.add_argument("--keep-alive", type=int, default=_env("KEEP_ALIVE_SECONDS", 75), help="env KEEP_ALIVE_SECONDS")
+    parser.add_argument("--graceful-timeout", type=int, default=_env("GRACEFUL_SHUTDOWN_SECONDS", 60), help="env GRACEFUL_SHUTDOWN_SECONDS")
+    parser.add_argument("--forwarded-allow-ips", default=_env("FORWARDED_ALLOW_IPS", "127.0.0.1"), help="env FORWARDED_ALLOW_IPS")
+    parser.add_argument("--log-level", default=_env("UVICORN_LOG_LEVEL", "info"), help="env UVICORN_LOG_LEVEL")
+    parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=False)
+    main(parser.parse_args())
@@ -0,0 +1,15 @@
+import os
+
+# Settings are read when app modules are imported; tests never reach these services
+for name, value in {
+    "SUPABASE_URL": "http://supabase.test",
+    "SUPABASE_KEY": "test",
+    "SUPABASE_SERVICE_KEY": "test",
+    "SUPABASE_JWT_SECRET": "test",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_CLIENT_SECRET": "test",
+    "GOOGLE_API_KEY": "test",
+    "GOOGLE_CALENDAR_REDIRECT_URI": "http://localhost/callback",
+    "FRONTEND_URL": "http://localhost",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,155 @@
+import asyncio
+from typing import Dict, Tuple
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import AdmissionController, RateLimitBackend, refill
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Stands in for a shared store: controllers built on one instance behave like workers sharing
+    the buckets. Time only moves when a test advances `now`.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        tokens, wait = refill(*self.buckets.get(key, (float(burst), self.now)), self.now, rate, burst)
+        self.buckets[key] = (tokens, self.now)
+        return wait
+
+def make_controller(backend: RateLimitBackend, **overrides) -> AdmissionController:
+    options = dict(rate_per_minute=60, burst=2, max_concurrent=1, max_queued=1, queue_timeout=0.05)
+    options.update(overrides)
+    return AdmissionController(backend, **options)
+
+def test_refill_takes_a_token_from_a_full_bucket():
+    assert refill(2.0, 0.0, 0.0, rate=1.0, burst=2) == (1.0, 0.0)
+
+def test_refill_reports_the_wait_for_the_next_token():
+    tokens, wait = refill(0.25, 0.0, 0.0, rate=0.5, burst=2)
+    assert tokens == 0.25
+    assert wait == pytest.approx(1.5)
+
+def test_refill_is_capped_at_the_burst():
+    tokens, wait = refill(0.0, 0.0, 3600.0, rate=1.0, burst=3)
+    assert (tokens, wait) == (2.0, 0.0)
+
+def test_bucket_refills_over_time():
+    async def scenario():
+        backend = InMemoryRateLimitBackend()
+        controller = make_controller(backend, max_concurrent=10)
+        for _ in range(2):
+            (await controller.admit("alice")).release()
+        with pytest.raises(HTTPException) as rejected:
+            await controller.admit("alice")
+        assert rejected.value.status_code == 429
+        assert rejected.value.headers["Retry-After"] == "1"
+
+        backend.now += 1
+        (await controller.admit("alice")).release()
+
+    asyncio.run(scenario())
+
+def test_buckets_are_per_user_and_shared_between_controllers():
+    async def scenario():
+        backend = InMemoryRateLimitBackend()
+        first, second = make_controller(backend, max_concurrent=10), make_controller(backend, max_concurrent=10)
+        (await first.admit("alice")).release()
+        (await second.admit("alice")).release()
+        with pytest.raises(HTTPException) as rejected:
+            await first.admit("alice")
+        assert rejected.value.status_code == 429
+        (await second.admit("bob")).release()
+
+    asyncio.run(scenario())
+
+def test_rejects_when_the_queue_is_full():
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10, queue_timeout=1)
+        ticket = await controller.admit("alice")
+        queued = asyncio.create_task(controller.admit("bob"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await controller.admit("carol")
+        assert rejected.value.status_code == 503
+        assert "Retry-After" in rejected.value.headers
+
+        ticket.release()
+        (await queued).release()
+
+    asyncio.run(scenario())
+
+def test_rejects_when_the_queue_wait_times_out():
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10)
+        ticket = await controller.admit("alice")
+        with pytest.raises(HTTPException) as rejected:
+            await controller.admit("bob")
+        assert rejected.value.status_code == 503
+        ticket.release()
+
+    asyncio.run(scenario())
+
+def test_released_slot_admits_the_next_request():
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10, queue_timeout=1)
+        async with await controller.admit("alice") as ticket:
+            queued = asyncio.create_task(controller.admit("bob"))
+            await asyncio.sleep(0)
+            assert not queued.done()
+        assert ticket.released
+        (await asyncio.wait_for(queued, 1)).release()
+
+    asyncio.run(scenario())
+
+def test_slot_is_released_when_the_block_fails():
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10)
+        with pytest.raises(RuntimeError):
+            async with await controller.admit("alice"):
+                raise RuntimeError("generation failed")
+        (await controller.admit("bob")).release()
+
+    asyncio.run(scenario())
+
+def test_release_is_idempotent():
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10, max_queued=0)
+        ticket = await controller.admit("alice")
+        ticket.release()
+        ticket.release()
+        second = await controller.admit("bob")
+        # A double release must not have freed a second slot
+        with pytest.raises(HTTPException):
+            await controller.admit("carol")
+        second.release()
+
+    asyncio.run(scenario())
+
+def test_streamed_response_releases_its_slot_when_sending_fails():
+    from starlette.requests import ClientDisconnect
+
+    from app.api.chat import AdmittedStreamingResponse
+
+    async def body():
+        yield "never sent"
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def scenario():
+        controller = make_controller(InMemoryRateLimitBackend(), burst=10, max_queued=0)
+        response = AdmittedStreamingResponse(body(), await controller.admit("alice"))
+        with pytest.raises(ClientDisconnect):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        assert response.ticket.released
+        (await controller.admit("bob")).release()
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import timezone
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.chat import ChatMessage
+from app.services import chat
+from app.services.integrations import google_calendar
+from app.services.response_cache import response_cache
+from app.services.schedule_renderer import OPENING
+
+class FakeModel:
+    """Records the prompts sent to the model and answers each with a fixed reply."""
+
+    model = "fake-model"
+
+    def __init__(self):
+        self.prompts: List[str] = []
+
+    async def stream_chat(self, history, message):
+        self.prompts.append(message)
+        yield "model reply"
+
+@pytest.fixture
+def model(monkeypatch) -> FakeModel:
+    fake = FakeModel()
+    response_cache.clear()
+    monkeypatch.setattr(chat, "gemini_client", fake)
+    monkeypatch.setattr(settings, "DIGESTS_ENABLED", False)
+
+    async def credentials(user_id):
+        return SimpleNamespace(token="access", refresh_token="refresh")
+
+    async def time_zone(user_id, credentials):
+        return timezone.utc
+
+    monkeypatch.setattr(chat, "get_google_credentials", credentials)
+    monkeypatch.setattr(chat, "get_google_calendar_time_zone", time_zone)
+    return fake
+
+@pytest.fixture
+def failing_calendar(monkeypatch):
+    async def get_events(*args, **kwargs):
+        raise RuntimeError("Google is down")
+
+    monkeypatch.setattr(google_calendar.calendar_event_store, "get_events", get_events)
+
+def reply(message: str, user_id: str = "alice") -> str:
+    async def collect():
+        return "".join([chunk async for chunk in chat.generate_chat_text([ChatMessage(role="user", content=message)], user_id)])
+    return asyncio.run(collect())
+
+def test_failed_calendar_fetch_is_explained_by_the_model(model, failing_calendar):
+    assert reply("what's on my schedule?") == "model reply"
+    assert "error occurred while fetching calendar events: Google is down" in model.prompts[0]
+    assert "No events found" not in model.prompts[0]
+
+def test_failed_calendar_fetch_is_not_rendered_as_a_free_calendar(model, failing_calendar):
+    for message in ("good morning", "what's on my schedule tomorrow?", "what's on this week"):
+        # The model explains the failure; the renderer would have reported a free calendar
+        assert reply(message) == "model reply"
+    assert len(model.prompts) == 3
+
+def test_successful_calendar_fetch_is_rendered(model, monkeypatch):
+    async def get_events(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(google_calendar.calendar_event_store, "get_events", get_events)
+    text = reply("what's on my schedule tomorrow?")
+    assert text.startswith(OPENING)
+    assert "Your calendar is clear tomorrow" in text
+    assert model.prompts == []
+
+def test_reply_to_a_failed_fetch_is_not_cached(model, failing_calendar, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULE_RENDERER_ENABLED", False)
+    reply("what's on my schedule?")
+    assert len(response_cache) == 0
+
+def test_reply_to_a_successful_fetch_is_cached(model, monkeypatch):
+    async def get_events(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(google_calendar.calendar_event_store, "get_events", get_events)
+    monkeypatch.setattr(settings, "SCHEDULE_RENDERER_ENABLED", False)
+    reply("what's on my schedule?")
+    reply("what's on my schedule?")
+    assert len(response_cache) == 1
+    assert len(model.prompts) == 1
+
+def test_calendar_action_goes_to_the_model_with_the_events(model, monkeypatch):
+    async def get_events(*args, **kwargs):
+        return [{"summary": "Design review", "start": {"dateTime": "2026-10-20T10:00:00+00:00"}}]
+
+    monkeypatch.setattr(google_calendar.calendar_event_store, "get_events", get_events)
+    assert reply("help me schedule a meeting with Sam tomorrow") == "model reply"
+    assert "help me schedule a meeting with Sam tomorrow" in model.prompts[0]
+    assert "Design review" in model.prompts[0]
@@ -0,0 +1,69 @@
+import asyncio
+
+from app.core.admission import AdmissionTicket
+from app.services.chat_streams import ChatStreamRegistry
+
+def make_registry(**overrides) -> ChatStreamRegistry:
+    options = dict(
+        ttl=60, max_streams=10, heartbeat=15, resume_grace=0.1,
+        coalesce_max_chars=1, coalesce_max_delay=0.0, max_unread=4,
+    )
+    options.update(overrides)
+    return ChatStreamRegistry(**options)
+
+async def held_ticket():
+    semaphore = asyncio.Semaphore(1)
+    await semaphore.acquire()
+    return semaphore, AdmissionTicket(semaphore)
+
+def counting_chunks(count: int, pulled: list):
+    async def chunks():
+        for i in range(count):
+            pulled.append(i)
+            yield f"chunk {i}"
+            await asyncio.sleep(0)
+    return chunks()
+
+def test_generation_waits_for_the_reader():
+    async def scenario():
+        registry = make_registry()
+        pulled = []
+        semaphore, ticket = await held_ticket()
+        stream = registry.start("alice", counting_chunks(100, pulled), ticket)
+        follower = registry.follow(stream)
+        for _ in range(3):
+            await follower.__anext__()
+        await asyncio.sleep(0.05)
+        assert len(stream.events) - stream.delivered == registry.max_unread
+        assert len(pulled) < 10
+
+        rest = [event async for event in follower]
+        # 100 content events and the "done" event
+        assert 3 + len(rest) == 101
+        await asyncio.sleep(0)
+        assert not semaphore.locked()
+
+    asyncio.run(scenario())
+
+def test_stream_nobody_follows_is_abandoned_and_releases_its_slot():
+    async def scenario():
+        registry = make_registry()
+        semaphore, ticket = await held_ticket()
+        stream = registry.start("alice", counting_chunks(100, []), ticket)
+        await asyncio.sleep(0.3)
+        assert stream.task.cancelled()
+        assert not semaphore.locked()
+
+    asyncio.run(scenario())
+
+def test_resume_replays_events_after_the_last_id():
+    async def scenario():
+        registry = make_registry(max_unread=1000)
+        _, ticket = await held_ticket()
+        stream = registry.start("alice", counting_chunks(3, []), ticket)
+        events = [event async for event in registry.follow(stream)]
+        resumed = registry.resume(stream.event_id(0), "alice")
+        assert [event async for event in resumed] == events[1:]
+        assert registry.resume(stream.event_id(0), "bob") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.services.integrations import google_calendar_store
+from app.services.integrations.google_calendar_client import GoogleCalendarAPIError
+from app.services.integrations.google_calendar_store import GoogleCalendarEventStore
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+def event(event_id: str, start: datetime, minutes: int = 60, **fields) -> Dict[str, Any]:
+    return {
+        "id": event_id,
+        "summary": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat()},
+        **fields,
+    }
+
+class FakeCalendarAPI:
+    """
+    Stands in for google_calendar_client: `events.list` answers full syncs, incremental syncs
+    (by sync token) and window queries from per-calendar data set by the test.
+    """
+
+    def __init__(self, calendars: List[str]):
+        self.calendars = calendars
+        self.events: Dict[str, List[Dict[str, Any]]] = {calendar_id: [] for calendar_id in calendars}
+        # Changes returned by the next incremental sync of each calendar
+        self.changes: Dict[str, List[Dict[str, Any]]] = {calendar_id: [] for calendar_id in calendars}
+        self.expired_tokens: set = set()
+        self.failing: set = set()
+        self.requests: List[Dict[str, Any]] = []
+        self._tokens = 0
+
+    def _token(self) -> str:
+        self._tokens += 1
+        return f"token-{self._tokens}"
+
+    async def list_calendars(self, credentials, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {"items": [
+            {"id": calendar_id, "primary": index == 0, "selected": True, "timeZone": "UTC"}
+            for index, calendar_id in enumerate(self.calendars)
+        ]}
+
+    async def list_events(self, credentials, calendar_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests.append({"calendar_id": calendar_id, **params})
+        if calendar_id in self.failing:
+            raise GoogleCalendarAPIError("Backend Error", 503)
+        if "syncToken" in params:
+            if params["syncToken"] in self.expired_tokens:
+                raise GoogleCalendarAPIError("Sync token is no longer valid", 410)
+            changes, self.changes[calendar_id] = self.changes[calendar_id], []
+            return {"items": [dict(item) for item in changes], "nextSyncToken": self._token()}
+        return {"items": [dict(item) for item in self.events[calendar_id]], "nextSyncToken": self._token()}
+
+@pytest.fixture
+def api(monkeypatch) -> FakeCalendarAPI:
+    fake = FakeCalendarAPI(["primary", "team"])
+    monkeypatch.setattr(google_calendar_store, "google_calendar_client", fake)
+    return fake
+
+def make_store(**overrides) -> GoogleCalendarEventStore:
+    options = dict(max_users=10, sync_interval=0, window_days=30, calendar_list_interval=3600, push_sync_interval=0)
+    options.update(overrides)
+    return GoogleCalendarEventStore(**options)
+
+def titles(events: List[Dict[str, Any]]) -> List[str]:
+    return [item["summary"] for item in events]
+
+def test_window_outside_the_synced_range_fails_when_a_calendar_fails(api):
+    async def scenario():
+        store = make_store()
+        await store.sync("alice", object())
+        api.failing.add("team")
+        far = NOW + timedelta(days=100)
+        with pytest.raises(GoogleCalendarAPIError):
+            await store.get_events("alice", object(), time_min=far, time_max=far + timedelta(days=1))
+
+    asyncio.run(scenario())
+
+def test_expired_sync_token_triggers_a_full_resync(api):
+    async def scenario():
+        store = make_store()
+        api.events["primary"] = [event("standup", NOW + timedelta(hours=1))]
+        await store.sync("alice", object())
+        assert store.full_syncs == 2
+
+        state = store._states["alice"]
+        api.expired_tokens.add(state.calendars["primary"].sync_token)
+        api.events["primary"] = [event("standup", NOW + timedelta(hours=1)), event("review", NOW + timedelta(hours=3))]
+        assert titles(await store.get_events("alice", object())) == ["standup", "review"]
+        # Only the calendar with the expired token is listed from scratch
+        assert store.full_syncs == 3
+        assert store.incremental_syncs == 1
+        primary = [request for request in api.requests if request["calendar_id"] == "primary"]
+        assert "syncToken" in primary[-2] and "syncToken" not in primary[-1]
+
+    asyncio.run(scenario())
+
+def test_incremental_sync_applies_changes_and_drops_cancelled_events(api):
+    async def scenario():
+        store = make_store()
+        api.events["primary"] = [event("standup", NOW + timedelta(hours=1)), event("lunch", NOW + timedelta(hours=4))]
+        api.events["team"] = [event("planning", NOW + timedelta(hours=2))]
+        await store.sync("alice", object())
+
+        api.changes["primary"] = [
+            {"id": "lunch", "status": "cancelled"},
+            event("standup", NOW + timedelta(hours=1), summary="standup (moved room)"),
+        ]
+        api.changes["team"] = [event("retro", NOW + timedelta(hours=5))]
+        assert titles(await store.get_events("alice", object())) == ["standup (moved room)", "planning", "retro"]
+        assert store.incremental_syncs == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,124 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.integrations import google_calendar as google_calendar_api
+from app.services.integrations import google_calendar_watch
+from app.services.integrations.google_calendar_watch import GoogleCalendarWatcher, SQLiteChannelBackend
+
+class FakeWatchAPI:
+    """Stands in for google_calendar_client's channel calls; `on_watch` runs before `events.watch` returns."""
+
+    def __init__(self):
+        self.watched: List[Dict[str, Any]] = []
+        self.stopped: List[str] = []
+        self.on_watch = None
+
+    async def watch_events(self, credentials, calendar_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.watched.append(body)
+        if self.on_watch is not None:
+            await self.on_watch(body)
+        return {"id": body["id"], "resourceId": f"resource-{calendar_id}"}
+
+    async def stop_channel(self, credentials, channel_id: str, resource_id: str) -> None:
+        self.stopped.append(channel_id)
+
+@pytest.fixture
+def api(monkeypatch) -> FakeWatchAPI:
+    fake = FakeWatchAPI()
+    monkeypatch.setattr(google_calendar_watch, "google_calendar_client", fake)
+    return fake
+
+@pytest.fixture
+def watcher(tmp_path):
+    watcher = GoogleCalendarWatcher(
+        backend=SQLiteChannelBackend(str(tmp_path / "channels.db")),
+        webhook_url="https://example.test/api/v1/integrations/google-calendar/notifications",
+        ttl_seconds=3600, renew_before=600, renew_check=60, poll_interval=1, workers=2,
+    )
+    yield watcher
+    watcher.backend.close()
+
+@pytest.fixture
+def changed(watcher) -> List[str]:
+    users: List[str] = []
+    watcher.subscribe(users.append)
+    return users
+
+def status_of(coroutine) -> Optional[int]:
+    try:
+        asyncio.run(coroutine)
+    except HTTPException as e:
+        return e.status_code
+    return None
+
+def test_notification_marks_the_user_stale(api, watcher, changed):
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+    assert status_of(watcher.handle_notification(channel.id, channel.token, "resource-primary", "exists")) is None
+    assert changed == ["alice"]
+
+def test_sync_notification_changes_nothing(api, watcher, changed):
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+    assert status_of(watcher.handle_notification(channel.id, channel.token, "resource-primary", "sync")) is None
+    assert changed == []
+
+def test_token_mismatch_is_rejected(api, watcher, changed):
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+    assert status_of(watcher.handle_notification(channel.id, "forged", "resource-primary", "exists")) == 403
+    assert status_of(watcher.handle_notification(channel.id, None, "resource-primary", "exists")) == 403
+    assert changed == []
+
+def test_resource_mismatch_is_rejected(api, watcher, changed):
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+    assert status_of(watcher.handle_notification(channel.id, channel.token, "resource-other", "exists")) == 403
+    assert changed == []
+
+def test_unknown_and_stopped_channels_are_not_found(api, watcher):
+    assert status_of(watcher.handle_notification("missing", "token", "resource-primary", "exists")) == 404
+
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+    asyncio.run(watcher.unwatch_user("alice", object()))
+    assert api.stopped == [channel.id]
+    assert status_of(watcher.handle_notification(channel.id, channel.token, "resource-primary", "exists")) == 404
+
+def test_pending_channel_is_promoted_once_watch_returns(api, watcher):
+    early = []
+
+    async def notify_before_returning(body):
+        # Google may deliver the first notification before `events.watch` responds
+        stored = watcher.backend.get(body["id"])
+        assert stored.pending
+        early.append(await watcher.handle_notification(body["id"], body["token"], "resource-primary", "exists"))
+
+    api.on_watch = notify_before_returning
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+
+    assert early == [None]
+    stored = watcher.backend.get(channel.id)
+    assert not stored.pending
+    assert stored.resource_id == "resource-primary"
+    assert watcher.opened == 1
+    # Once confirmed, the resource ID has to match as well
+    assert status_of(watcher.handle_notification(channel.id, channel.token, "resource-other", "exists")) == 403
+
+def test_webhook_checks_the_channel_headers(api, watcher, monkeypatch, changed):
+    monkeypatch.setattr(google_calendar_api, "google_calendar_watcher", watcher)
+    app = FastAPI()
+    app.include_router(google_calendar_api.router)
+    client = TestClient(app)
+    channel = asyncio.run(watcher._open("alice", object(), "primary"))
+
+    def post(token: str):
+        return client.post("/notifications", headers={
+            "X-Goog-Channel-ID": channel.id,
+            "X-Goog-Channel-Token": token,
+            "X-Goog-Resource-ID": "resource-primary",
+            "X-Goog-Resource-State": "exists",
+        })
+
+    assert post("forged").status_code == 403
+    assert post(channel.token).status_code == 200
+    assert changed == ["alice"]
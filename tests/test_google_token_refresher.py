@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services.integrations import google_token_refresher as refresher_module
+from app.services.integrations.google_token_refresher import GoogleTokenRefresher
+
+class FakeSupabase:
+    """Stores user metadata; the first `hanging_updates` updates never finish until cancelled."""
+
+    def __init__(self, user_metadata: Dict[str, Any], hanging_updates: int = 0):
+        self.user_metadata = user_metadata
+        self.hanging_updates = hanging_updates
+        self.updates: List[Dict[str, Any]] = []
+
+    async def get_user_by_id(self, user_id: str):
+        return SimpleNamespace(user=SimpleNamespace(user_metadata=dict(self.user_metadata)))
+
+    async def update_user_by_id(self, user_id: str, attributes: Dict[str, Any]):
+        if self.hanging_updates:
+            self.hanging_updates -= 1
+            await asyncio.Event().wait()
+        self.updates.append(attributes["user_metadata"])
+        self.user_metadata.update(attributes["user_metadata"])
+
+@pytest.fixture
+def supabase(monkeypatch) -> FakeSupabase:
+    fake = FakeSupabase({"google_refresh_token": "refresh"}, hanging_updates=1)
+    monkeypatch.setattr(refresher_module, "supabase", fake)
+    return fake
+
+def make_refresher() -> GoogleTokenRefresher:
+    return GoogleTokenRefresher(lead_seconds=300, jitter_seconds=0, retry_seconds=60, workers=2, flush_seconds=60)
+
+def credentials(token: str) -> SimpleNamespace:
+    return SimpleNamespace(token=token, refresh_token="refresh", expiry=datetime(2030, 1, 1) + timedelta(hours=1))
+
+def test_stop_writes_back_a_batch_it_interrupted(supabase):
+    async def scenario():
+        refresher = make_refresher()
+        refresher.record_refreshed("alice", credentials("access-1"), "refresh")
+        # Let the spawned flush reach the hanging update
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert refresher.stats()["pending_writes"] == 0
+
+        await refresher.stop()
+        assert [update["google_access_token"] for update in supabase.updates] == ["access-1"]
+        assert refresher.stats()["pending_writes"] == 0
+        assert refresher.written == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_flush_keeps_a_newer_queued_write(supabase):
+    async def scenario():
+        refresher = make_refresher()
+        refresher.record_refreshed("alice", credentials("access-1"), "refresh")
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Refreshed again while the first write-back is in flight
+        refresher._pending_writes["alice"] = refresher_module._PendingWrite(
+            refreshed_with="refresh",
+            user_metadata={"google_access_token": "access-2", "google_refresh_token": "refresh"},
+        )
+
+        await refresher.stop()
+        assert [update["google_access_token"] for update in supabase.updates] == ["access-2"]
+
+    asyncio.run(scenario())
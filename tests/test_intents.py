@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.intents import CALENDAR_INTENT, GREETING_INTENT, IntentRouter, intent_router, is_calendar_action
+from benchmarks.intent_router import LABELLED_MESSAGES
+
+@pytest.mark.parametrize("message, expected", LABELLED_MESSAGES)
+def test_labelled_messages_route_to_their_intent(message, expected):
+    top = intent_router.top_intent(message)
+    assert (top.intent if top else None) == expected
+
+@pytest.mark.parametrize("message", ["this", "which", "Whitespace", "high", "eventually", "histories"])
+def test_triggers_do_not_match_inside_words(message):
+    assert intent_router.route(message) == []
+
+def test_calendar_outranks_greeting():
+    matches = intent_router.route("hey, anything on my calendar tomorrow?")
+    assert [m.intent for m in matches] == [CALENDAR_INTENT, GREETING_INTENT]
+    assert matches[0].triggers == ("calendar", "tomorrow")
+
+def test_registering_new_triggers_recompiles_the_pattern():
+    router = IntentRouter()
+    router.register("weather", ["forecast"])
+    assert router.top_intent("what's the forecast") is not None
+    router.register("weather", ["rain"])
+    assert router.top_intent("will it rain").triggers == ("rain",)
+
+@pytest.mark.parametrize("message, action", [
+    ("What's on my schedule today?", False),
+    ("Show me my calendar for next week", False),
+    ("good morning", False),
+    ("help me schedule a meeting with Sam tomorrow", True),
+    ("Can you move my 3pm tomorrow to Friday?", True),
+    ("Book a slot for lunch this week", True),
+    ("Cancel tomorrow's standup", True),
+])
+def test_calendar_actions_are_told_apart_from_schedule_lookups(message, action):
+    assert intent_router.top_intent(message) is not None
+    assert is_calendar_action(message) == action
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+from app.core.lifecycle import process_lock_path
+
+def test_default_lock_path_is_scoped_to_the_working_directory(tmp_path, monkeypatch):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    monkeypatch.chdir(tmp_path / "a")
+    first = process_lock_path("background-jobs")
+    assert process_lock_path("background-jobs") == first
+    monkeypatch.chdir(tmp_path / "b")
+    assert process_lock_path("background-jobs") != first
+
+def test_configured_directory_is_used_as_is(tmp_path):
+    assert process_lock_path("background-jobs", str(tmp_path)) == str(tmp_path / "zeno-background-jobs.lock")
+
+def test_one_process_per_directory_holds_the_lock(tmp_path):
+    script = (
+        "import sys, time\n"
+        "from app.core.lifecycle import acquire_process_lock\n"
+        "print(acquire_process_lock('background-jobs', sys.argv[1]), flush=True)\n"
+        "time.sleep(5)\n"
+    )
+    holder = subprocess.Popen([sys.executable, "-c", script, str(tmp_path)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "True"
+        contender = subprocess.run([sys.executable, "-c", script.replace("time.sleep(5)", "pass"), str(tmp_path)],
+                                   capture_output=True, text=True, timeout=30)
+        assert contender.stdout.strip() == "False"
+    finally:
+        holder.kill()
+        holder.wait()
@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.services.response_cache import ttl_until_next_event_boundary
+
+TZ = ZoneInfo("America/Los_Angeles")
+NOW = datetime(2026, 10, 19, 20, 0, tzinfo=TZ)
+
+def test_ttl_ends_at_the_next_event_boundary():
+    events = [{
+        "start": {"dateTime": (NOW + timedelta(minutes=5)).isoformat()},
+        "end": {"dateTime": (NOW + timedelta(minutes=35)).isoformat()},
+    }]
+    assert ttl_until_next_event_boundary(events, max_ttl=3600, now=NOW, tz=TZ) == 300
+
+def test_all_day_events_start_at_local_midnight():
+    events = [{"start": {"date": "2026-10-20"}, "end": {"date": "2026-10-21"}}]
+    # 8 PM in Los Angeles: the event starts in four hours; read as UTC it would have started already
+    assert ttl_until_next_event_boundary(events, max_ttl=86400, now=NOW, tz=TZ) == 4 * 3600
+
+def test_ttl_ends_at_local_midnight_without_events():
+    assert ttl_until_next_event_boundary([], max_ttl=86400, now=NOW, tz=TZ) == 4 * 3600
+    assert ttl_until_next_event_boundary([], max_ttl=600, now=NOW, tz=TZ) == 600
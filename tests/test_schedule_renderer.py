@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.schedule_renderer import (
+    FREE_TOMORROW,
+    MAX_TOMORROW_EVENTS,
+    NOTHING_LEFT_TODAY,
+    OPENING,
+    group_overlaps,
+    render_schedule,
+    to_scheduled_event,
+)
+
+TZ = ZoneInfo("Europe/Berlin")
+# Monday, October 19 2026, 10:30 in Berlin
+NOW = datetime(2026, 10, 19, 10, 30, tzinfo=TZ)
+
+def timed(summary: str, start: datetime, minutes: int = 60, **fields) -> dict:
+    return {
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat()},
+        **fields,
+    }
+
+def all_day(summary: str, day: datetime) -> dict:
+    return {
+        "summary": summary,
+        "start": {"date": day.date().isoformat()},
+        "end": {"date": (day + timedelta(days=1)).date().isoformat()},
+    }
+
+def at(days: int, hour: int, minute: int = 0) -> datetime:
+    return (NOW + timedelta(days=days)).replace(hour=hour, minute=minute)
+
+def test_lists_remaining_events_today_including_the_one_in_progress():
+    events = [
+        timed("Standup", at(0, 9)),
+        timed("Design review", at(0, 10), minutes=60, location="Room 4"),
+        timed("Lunch", at(0, 12, 30)),
+        timed("Planning", at(1, 9)),
+    ]
+    sections = render_schedule(events, TZ, now=NOW)
+    assert sections == [
+        OPENING,
+        "🗓️ Remaining Today – Monday, October 19\n"
+        "• [10:00 AM – 11:00 AM] Design review – Room 4\n"
+        "• [12:30 PM – 1:30 PM] Lunch",
+    ]
+
+def test_groups_overlapping_events_into_one_block():
+    events = [
+        timed("Call", at(0, 13), minutes=60),
+        timed("Interview", at(0, 13, 30), minutes=60),
+        timed("Sync", at(0, 14, 15), minutes=30),
+        timed("Review", at(0, 16)),
+    ]
+    body = render_schedule(events, TZ, now=NOW)[1]
+    assert body.splitlines()[1:] == [
+        "• [1:00 PM – 2:45 PM] 3 overlapping events",
+        "  ◦ [1:00 PM – 2:00 PM] Call",
+        "  ◦ [1:30 PM – 2:30 PM] Interview",
+        "  ◦ [2:15 PM – 2:45 PM] Sync",
+        "• [4:00 PM – 5:00 PM] Review",
+    ]
+
+def test_all_day_events_come_first():
+    events = [timed("Standup", at(0, 11)), all_day("Offsite", NOW)]
+    body = render_schedule(events, TZ, now=NOW)[1]
+    assert body.splitlines()[1:] == ["• [All day] Offsite", "• [11:00 AM – 12:00 PM] Standup"]
+
+def test_looks_ahead_to_tomorrow_when_today_is_done():
+    events = [timed("Standup", at(0, 9))] + [timed(f"Meeting {hour}", at(1, hour)) for hour in range(9, 14)]
+    sections = render_schedule(events, TZ, now=NOW)
+    assert sections[1] == NOTHING_LEFT_TODAY
+    lines = sections[2].splitlines()
+    assert lines[0] == "🔮 Coming Up Tomorrow – Tuesday, October 20"
+    assert len(lines) == 1 + MAX_TOMORROW_EVENTS + 1
+    assert lines[-1] == "…and 2 more."
+
+def test_suggests_tips_when_tomorrow_is_free_too():
+    sections = render_schedule([], TZ, now=NOW)
+    assert sections[1] == NOTHING_LEFT_TODAY
+    assert sections[2].startswith(FREE_TOMORROW)
+
+def test_today_does_not_look_past_today():
+    events = [timed("Standup", at(0, 9)), timed("Planning", at(1, 9))]
+    sections = render_schedule(events, TZ, now=NOW, triggers=("today",))
+    assert len(sections) == 2
+    assert sections[1].startswith("Your calendar is clear for the rest of today")
+    assert "Tomorrow" not in sections[1]
+
+def test_tomorrow_lists_every_event_of_tomorrow():
+    events = [timed("Lunch", at(0, 12))] + [timed(f"Meeting {hour}", at(1, hour)) for hour in range(9, 14)]
+    sections = render_schedule(events, TZ, now=NOW, triggers=("tomorrow",))
+    lines = sections[1].splitlines()
+    assert lines[0] == "🔮 Tomorrow – Tuesday, October 20"
+    assert len(lines) == 6
+    assert "Lunch" not in sections[1]
+
+def test_next_week_lists_days_with_events():
+    events = [
+        timed("Planning", at(1, 9)),
+        timed("Retro", at(7, 15)),
+        all_day("Conference", at(10, 0)),
+    ]
+    sections = render_schedule(events, TZ, now=NOW, triggers=("next week",))
+    assert [section.splitlines()[0] for section in sections[1:]] == [
+        "📅 Monday, October 26",
+        "📅 Thursday, October 29",
+    ]
+
+def test_this_week_starts_with_what_is_left_today():
+    events = [timed("Standup", at(0, 9)), timed("Lunch", at(0, 12)), timed("Review", at(3, 16))]
+    sections = render_schedule(events, TZ, now=NOW, triggers=("this week",))
+    assert [section.splitlines()[0] for section in sections[1:]] == [
+        "🗓️ Remaining Today – Monday, October 19",
+        "📅 Thursday, October 22",
+    ]
+    assert "Standup" not in sections[1]
+
+def test_free_window_suggests_tips():
+    sections = render_schedule([], TZ, now=NOW, triggers=("next week",))
+    assert sections[1].startswith("Your calendar is clear next week")
+
+def test_day_boundaries_follow_the_calendar_time_zone():
+    # 23:30 UTC on Monday is already Tuesday in Berlin
+    event = timed("Late call", datetime(2026, 10, 19, 23, 30, tzinfo=timezone.utc))
+    sections = render_schedule([event], TZ, now=NOW, triggers=("tomorrow",))
+    assert sections[1].splitlines() == ["🔮 Tomorrow – Tuesday, October 20", "• [1:30 AM – 2:30 AM] Late call"]
+
+def test_group_overlaps_chains_through_events():
+    events = [
+        to_scheduled_event(event, TZ)
+        for event in (timed("A", at(0, 9)), timed("B", at(0, 9, 45)), timed("C", at(0, 10, 30)), timed("D", at(0, 12)))
+    ]
+    assert [[event.title for event in block] for block in group_overlaps(events)] == [["A", "B", "C"], ["D"]]
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+from jose import jwt
+
+from app.core import cache, security
+from app.core.config import settings
+from app.core.security import verified_token_cache, verify_supabase_token
+
+class FakeClock:
+    """Replaces the `time` module in the cache and security modules; wall and monotonic time move independently."""
+
+    def __init__(self):
+        self.wall = float(int(time.time()))
+        self.mono = 1000.0
+
+    def time(self) -> float:
+        return self.wall
+
+    def monotonic(self) -> float:
+        return self.mono
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "time", fake)
+    monkeypatch.setattr(security, "time", fake)
+    verified_token_cache.clear()
+    yield fake
+    verified_token_cache.clear()
+
+@pytest.fixture
+def decodes(monkeypatch) -> list:
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    return calls
+
+def make_token(exp: float) -> str:
+    # jose checks `exp` against the real clock, so tokens are always issued with time to spare
+    claims = {"sub": "alice", "aud": "authenticated", "exp": int(exp)}
+    return jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+def test_cached_payload_expires_with_the_token(clock, decodes):
+    token = make_token(clock.wall + 60)
+    verify_supabase_token(token, use_cache=True)
+    verify_supabase_token(token, use_cache=True)
+    assert len(decodes) == 1
+
+    clock.mono += 59
+    verify_supabase_token(token, use_cache=True)
+    assert len(decodes) == 1
+
+    clock.mono += 1
+    verify_supabase_token(token, use_cache=True)
+    assert len(decodes) == 2
+
+def test_cached_payload_is_not_served_past_exp_on_the_wall_clock(clock, decodes):
+    token = make_token(clock.wall + 60)
+    verify_supabase_token(token, use_cache=True)
+
+    # The wall clock jumps (e.g. after a suspend) while the monotonic TTL has not run out
+    clock.wall += 60
+    verify_supabase_token(token, use_cache=True)
+    assert len(decodes) == 2
+
+def test_long_lived_tokens_are_cached_for_at_most_the_max_ttl(clock, decodes):
+    token = make_token(clock.wall + 3600)
+    verify_supabase_token(token, use_cache=True)
+
+    clock.mono += settings.JWT_CACHE_MAX_TTL_SECONDS
+    verify_supabase_token(token, use_cache=True)
+    assert len(decodes) == 2
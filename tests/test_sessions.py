@@ -0,0 +1,92 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatMessage
+from app.services.sessions import SessionStore, SQLiteSessionBackend, window_history
+
+def turn(role: str, content: str) -> ChatMessage:
+    return ChatMessage(role=role, content=content)
+
+def conversation(exchanges: int) -> List[ChatMessage]:
+    turns = []
+    for i in range(exchanges):
+        turns += [turn("user", f"question {i}"), turn("assistant", f"answer {i}")]
+    return turns
+
+def contents(turns: List[ChatMessage]) -> List[str]:
+    return [t.content for t in turns]
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    yield backend
+    backend.close()
+
+def make_store(backend: SQLiteSessionBackend, recent_turns: int = 4, max_context_tokens: int = 1000) -> SessionStore:
+    return SessionStore(backend, max_cached=10, recent_turns=recent_turns, max_context_tokens=max_context_tokens)
+
+def test_window_keeps_the_most_recent_turns():
+    assert contents(window_history(conversation(5), recent_turns=4, max_tokens=1000)) == [
+        "question 3", "answer 3", "question 4", "answer 4",
+    ]
+
+def test_window_drops_the_oldest_turns_over_the_token_budget():
+    turns = [turn("user", "a" * 400), turn("assistant", "b" * 40), turn("user", "c" * 40), turn("assistant", "d" * 40)]
+    # The first turn alone is ~100 tokens
+    assert contents(window_history(turns, recent_turns=10, max_tokens=50)) == ["c" * 40, "d" * 40]
+
+def test_window_starts_with_a_user_turn():
+    turns = conversation(3)
+    assert window_history(turns, recent_turns=3, max_tokens=1000)[0].role == "user"
+    assert contents(window_history(turns, recent_turns=3, max_tokens=1000)) == ["question 2", "answer 2"]
+
+def test_appended_turns_are_kept_in_order(backend):
+    async def scenario():
+        store = make_store(backend)
+        session = await store.create("alice")
+        for i in range(3):
+            await store.append(session, [turn("user", f"question {i}"), turn("assistant", f"answer {i}")])
+
+        assert session.next_seq == 6
+        assert contents(session.turns) == ["question 1", "answer 1", "question 2", "answer 2"]
+        assert [seq for seq, _, _ in backend.load(session.id, 10)[1]] == list(range(6))
+
+        # A fresh worker loads the same recent window from SQLite
+        reloaded = await make_store(backend).get(session.id, "alice")
+        assert contents(reloaded.turns) == contents(session.turns)
+        assert reloaded.next_seq == 6
+
+    asyncio.run(scenario())
+
+def test_turns_appended_by_another_worker_are_picked_up(backend):
+    async def scenario():
+        first, second = make_store(backend), make_store(backend)
+        session = await first.create("alice")
+        await first.append(session, [turn("user", "question 0"), turn("assistant", "answer 0")])
+
+        other = await second.get(session.id, "alice")
+        await second.append(other, [turn("user", "question 1"), turn("assistant", "answer 1")])
+
+        # The cached copy is stale and is reloaded on read
+        assert contents((await first.get(session.id, "alice")).turns) == [
+            "question 0", "answer 0", "question 1", "answer 1",
+        ]
+        # Appending to a stale copy lands after the other worker's turns
+        await first.append(session, [turn("user", "question 2"), turn("assistant", "answer 2")])
+        assert contents(session.turns) == ["question 1", "answer 1", "question 2", "answer 2"]
+        assert [content for _, _, content in backend.load(session.id, 10)[1]] == contents(conversation(3))
+
+    asyncio.run(scenario())
+
+def test_sessions_of_other_users_are_not_found(backend):
+    async def scenario():
+        store = make_store(backend)
+        session = await store.create("alice")
+        with pytest.raises(HTTPException) as error:
+            await store.get(session.id, "mallory")
+        assert error.value.status_code == 404
+
+    asyncio.run(scenario())
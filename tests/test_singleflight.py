@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+async def settle() -> None:
+    # Lets started tasks run up to their first real wait
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append("fetch")
+            await release.wait()
+            return {"id": "alice"}
+
+        waiters = [asyncio.create_task(flight.do("alice", fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert calls == ["fetch"]
+        assert all(result is results[0] for result in results)
+        assert flight.stats() == {"name": "test", "in_flight": 0, "leaders": 1, "collapsed": 4}
+
+    asyncio.run(scenario())
+
+def test_different_keys_do_not_share_calls():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fetch(key):
+            await asyncio.sleep(0)
+            return key
+
+        assert await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b"))) == ["a", "b"]
+        assert flight.leaders == 2
+
+    asyncio.run(scenario())
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        waiters = [asyncio.create_task(flight.do("alice", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert [str(result) for result in results] == ["upstream down"] * 3
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+
+def test_key_is_released_after_a_failure():
+    async def scenario():
+        flight = SingleFlight("test")
+        attempts = []
+
+        async def fetch():
+            attempts.append(len(attempts))
+            if len(attempts) == 1:
+                raise RuntimeError("transient")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await flight.do("alice", fetch)
+        assert flight.stats()["in_flight"] == 0
+        assert await flight.do("alice", fetch) == "ok"
+        assert flight.leaders == 2
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.create_task(flight.do("alice", fetch))
+        second = asyncio.create_task(flight.do("alice", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+def test_forgotten_call_is_not_joined_and_does_not_release_its_successor():
+    async def scenario():
+        flight = SingleFlight("test")
+        releases = []
+
+        async def fetch():
+            release = asyncio.Event()
+            releases.append(release)
+            await release.wait()
+            return len(releases)
+
+        first = asyncio.create_task(flight.do("alice", fetch))
+        await settle()
+        flight.forget("alice")
+        second = asyncio.create_task(flight.do("alice", fetch))
+        await settle()
+        assert len(releases) == 2
+
+        releases[0].set()
+        await first
+        # The forgotten call finishing leaves its successor joinable
+        third = asyncio.create_task(flight.do("alice", fetch))
+        await settle()
+        assert len(releases) == 2 and flight.collapsed == 1
+
+        releases[1].set()
+        assert await second == await third == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services import users
+from app.services.users import get_user_metadata, invalidate_user_metadata, user_metadata_cache
+
+class FakeSupabase:
+    """Serves the current metadata; each lookup reads it right away and answers once released."""
+
+    def __init__(self):
+        self.user_metadata: Dict[str, Any] = {"google_refresh_token": "old"}
+        self.lookups: List[asyncio.Event] = []
+
+    async def get_user_by_id(self, user_id: str):
+        user_metadata = dict(self.user_metadata)
+        release = asyncio.Event()
+        self.lookups.append(release)
+        await release.wait()
+        return SimpleNamespace(user=SimpleNamespace(user_metadata=user_metadata))
+
+async def settle() -> None:
+    # Lets started tasks run up to their first real wait
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+@pytest.fixture
+def supabase(monkeypatch) -> FakeSupabase:
+    fake = FakeSupabase()
+    monkeypatch.setattr(users, "supabase", fake)
+    user_metadata_cache.clear()
+    yield fake
+    user_metadata_cache.clear()
+
+def test_lookup_finishing_after_invalidation_is_not_cached(supabase):
+    async def scenario():
+        before = asyncio.create_task(get_user_metadata("alice"))
+        await settle()
+
+        # The account is relinked while the lookup is in flight
+        supabase.user_metadata = {"google_refresh_token": "new"}
+        invalidate_user_metadata("alice")
+        after = asyncio.create_task(get_user_metadata("alice"))
+        await settle()
+
+        # The stale lookup finishes last
+        supabase.lookups[1].set()
+        assert (await after)["google_refresh_token"] == "new"
+        supabase.lookups[0].set()
+        assert (await before)["google_refresh_token"] == "old"
+
+        assert len(supabase.lookups) == 2
+        assert user_metadata_cache.get("alice")["google_refresh_token"] == "new"
+
+    asyncio.run(scenario())
+
+def test_stale_lookup_is_not_cached_when_it_finishes_first(supabase):
+    async def scenario():
+        before = asyncio.create_task(get_user_metadata("alice"))
+        await settle()
+        invalidate_user_metadata("alice")
+        supabase.lookups[0].set()
+        await before
+        assert user_metadata_cache.get("alice") is None
+
+    asyncio.run(scenario())
+
+def test_concurrent_lookups_share_one_call(supabase):
+    async def scenario():
+        lookups = [asyncio.create_task(get_user_metadata("alice")) for _ in range(3)]
+        await settle()
+        supabase.lookups[0].set()
+        await asyncio.gather(*lookups)
+        assert len(supabase.lookups) == 1
+        assert user_metadata_cache.get("alice") is not None
+
+    asyncio.run(scenario())